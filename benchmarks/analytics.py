@@ -0,0 +1,145 @@
+"""
+Usage: python benchmarks/analytics.py [number of items] [number of indexed items]
+
+Times loading a receipt index into a SalesHistory, and the sales reports of
+pos_core.analytics over synthetic line items.
+"""
+
+# Imports
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.analytics import SECONDS_PER_DAY, SECONDS_PER_HOUR, SalesHistory
+from pos_core.receipt_index import ReceiptIndex
+
+ITEMS_PER_RECEIPT = 5
+
+
+def synthetic_history(count, products=50_000, seed=1):
+    """
+    Returns a SalesHistory with random items spread over three years.
+
+    Args:
+     - count (int): The number of items.
+     - products (int): The number of distinct products.
+     - seed (int): The random seed.
+
+    Returns:
+     - SalesHistory: The synthetic history.
+    """
+    generator = np.random.default_rng(seed)
+    start = time.time() - 3 * 365 * SECONDS_PER_DAY
+    return SalesHistory(
+        [str(100000 + code) for code in range(products)],
+        generator.integers(0, products, count),
+        generator.integers(1, 20, count),
+        generator.uniform(0.5, 100, count).round(2),
+        generator.uniform(start, time.time(), count),
+        generator.random(count) < 0.03,
+    )
+
+
+def synthetic_index(path, count, products=50_000, seed=1):
+    """
+    Writes a receipt index of random receipts spread over three years. The
+    rows are inserted directly, as parsing receipt texts would take far
+    longer than loading them.
+
+    Args:
+     - path (str): The index file.
+     - count (int): The number of items.
+     - products (int): The number of distinct products.
+     - seed (int): The random seed.
+    """
+    generator = np.random.default_rng(seed)
+    receipts = max(count // ITEMS_PER_RECEIPT, 1)
+    timestamps = np.sort(
+        generator.uniform(
+            time.time() - 3 * 365 * SECONDS_PER_DAY, time.time(), receipts
+        )
+    )
+    returns = generator.random(receipts) < 0.03
+    product = generator.integers(0, products, count)
+    quantity = generator.integers(1, 20, count)
+    price = generator.uniform(0.5, 100, count).round(2)
+
+    index = ReceiptIndex(path)
+    with index.connection as connection:
+        connection.executemany(
+            "INSERT INTO receipts (receipt_id, number, timestamp, kind, total)"
+            " VALUES (?, ?, ?, ?, 0)",
+            (
+                (
+                    row + 1,
+                    row + 1,
+                    timestamps[row],
+                    "return" if returns[row] else "purchase",
+                )
+                for row in range(receipts)
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO receipt_items"
+            " (receipt_id, product_id, name, price, quantity, timestamp)"
+            " VALUES (?, ?, '', ?, ?, ?)",
+            (
+                (
+                    row // ITEMS_PER_RECEIPT + 1,
+                    str(100000 + int(product[row])),
+                    float(price[row]),
+                    int(quantity[row]),
+                    timestamps[row // ITEMS_PER_RECEIPT],
+                )
+                for row in range(count)
+            ),
+        )
+    index.connection.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    indexed = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "index.db")
+        # Built in another process, so its memory doesn't count as the load's
+        builder = multiprocessing.Process(target=synthetic_index, args=(path, indexed))
+        builder.start()
+        builder.join()
+        index = ReceiptIndex(path)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        SalesHistory.from_index(index)
+        elapsed = time.perf_counter() - start
+        # ru_maxrss is in kB on Linux
+        growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024
+        print(f"{indexed} indexed items")
+        print(f"{'from_index':20} {elapsed:8.3f} s, peak memory +{growth:.0f} MB")
+        index.connection.close()
+
+    history = synthetic_history(count)
+    print(f"\n{count} items")
+
+    reports = {
+        "per_product": history.per_product,
+        "per_period (hour)": lambda: history.per_period(SECONDS_PER_HOUR),
+        "per_period (day)": lambda: history.per_period(SECONDS_PER_DAY),
+        "hour_of_day": history.hour_of_day,
+        "top_sellers": lambda: history.top_sellers(10),
+    }
+    for label, report in reports.items():
+        start = time.perf_counter()
+        report()
+        print(f"{label:20} {time.perf_counter() - start:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Usage: python benchmarks/barcode_scanner.py [scans per second] [seconds]
+
+Drives a simulated keyboard-wedge scanner into the register as fast as asked
+and reports the sustained scan rate and the number of text box updates, once
+with one cart update per scan and once with ScanReader batching the scans per
+frame. Runs headless: a small after() loop stands in for the Tk event loop.
+"""
+
+# Imports
+import heapq
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.inventory import InventoryCache
+from pos_core.register import ShoppingCart
+from pos_core.scanner import ScanReader
+from pos_core.storage import open_storage
+from pos_core.tasks import TaskRunner
+
+PRODUCTS = 10_000
+# Products in one shop's basket, so codes repeat like a real scan stream
+BASKET = 40
+KEY_MS = 0.5
+
+
+class EventLoop:
+    """
+    A single-threaded stand-in for the Tk event loop with an after() method.
+    """
+
+    def __init__(self):
+        self.timers = []
+        self.counter = 0
+
+    def after(self, milliseconds, callback):
+        self.counter += 1
+        heapq.heappush(
+            self.timers,
+            (time.perf_counter() + milliseconds / 1000, self.counter, callback),
+        )
+
+    def run_until(self, done):
+        while not done():
+            due, _, callback = heapq.heappop(self.timers)
+            time.sleep(max(0.0, due - time.perf_counter()))
+            callback()
+
+
+def run(cache, rate, seconds, batched):
+    """
+    Scans at the given rate and waits until every scan is in the cart.
+
+    Returns:
+     - tuple: Scans per second, text box updates, the shortest time between
+       two updates in milliseconds.
+    """
+    loop = EventLoop()
+    runner = TaskRunner(loop, poll_interval=1)
+    cart = ShoppingCart(cache)
+    random.seed(1)
+    basket = [str(100000 + random.randrange(PRODUCTS)) for _ in range(BASKET)]
+    total = int(rate * seconds)
+    scanned = [0]
+    added = [0]
+    updates = []
+
+    def update_text_box(count):
+        added[0] += count
+        updates.append(time.perf_counter())
+        reader.done()
+
+    def add_task(scans):
+        for product_id, quantity in scans.items():
+            cart.add_item(product_id, quantity)
+        return sum(scans.values())
+
+    def add_scans(scans):
+        runner.submit(add_task, scans, on_done=update_text_box, key=cart)
+
+    reader = ScanReader(loop, add_scans)
+
+    def scanner():
+        # The scanner types the code and Enter a fraction of a millisecond apart
+        code = random.choice(basket)
+        now = time.perf_counter() * 1000
+        for position, char in enumerate(code + "\r"):
+            timestamp = now + position * KEY_MS
+            if batched:
+                reader.key(char, timestamp)
+        if not batched:
+            add_scans({code: 1})
+        scanned[0] += 1
+        if scanned[0] < total:
+            loop.after(1000 / rate, scanner)
+
+    start = time.perf_counter()
+    loop.after(0, scanner)
+    loop.run_until(lambda: added[0] == total)
+    elapsed = time.perf_counter() - start
+    runner.shutdown()
+    assert sum(line.quantity for line in cart.items.values()) == total
+
+    gaps = [(later - earlier) * 1000 for earlier, later in zip(updates, updates[1:])]
+    return total / elapsed, len(updates), min(gaps)
+
+
+def main():
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 4
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "inventory.txt")
+        with open(filename, "w") as file:
+            for i in range(PRODUCTS):
+                file.write(f"Product {i},{100000 + i},1.5,1000000000\n")
+        cache = InventoryCache(open_storage(filename))
+        cache.get()
+        print(f"{rate:.0f} scans/s for {seconds:.0f} s asked")
+        for label, batched in [("one update per scan", False), ("ScanReader", True)]:
+            achieved, updates, gap = run(cache, rate, seconds, batched)
+            print(
+                f"{label:>19}: {achieved:8.0f} scans/s  {updates:6} text box updates"
+                f"  at least {gap:6.2f} ms apart"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Usage: python benchmarks/binary_snapshot.py [number of SKUs]
+
+Compares loading the inventory by parsing the text file against loading its
+binary snapshot, and looking products up in the loaded inventory against
+looking them up in the mmap'd binary snapshot without loading it.
+"""
+
+# Imports
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.binary_snapshot import BinarySnapshot, write_binary_snapshot
+from pos_core.inventory import InventoryCache
+from pos_core.storage import TextStorage
+
+LOOKUPS = 10_000
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:44} {(time.perf_counter() - start) * 1000:10.1f} ms")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "inventory.txt")
+        with open(filename, "w") as file:
+            for i in range(count):
+                file.write(
+                    f"Product {i} {'ABCDEFG'[i % 7]}aft,{100000 + i},"
+                    f"{(i % 997) / 10 + 0.5},{i % 250}\n"
+                )
+        storage = TextStorage(filename)
+        print(f"{count} SKUs")
+
+        def load():
+            with storage.lock():
+                return storage.load()
+
+        # Parse only, as the inventory loaded before binary snapshots
+        storage.write_binary_snapshot = lambda *args: None
+        inventory = timed("load by parsing the text", load)
+        del storage.write_binary_snapshot
+        with open(filename, "rb") as file:
+            content = file.read()
+        timed(
+            "write the binary snapshot",
+            lambda: write_binary_snapshot(
+                storage.binary_snapshot, inventory, len(content), zlib.crc32(content)
+            ),
+        )
+        inventory = timed("load the binary snapshot", load)
+        print(
+            f"{'text / binary file size':44}"
+            f" {os.path.getsize(filename) / 1e6:6.1f} / "
+            f"{os.path.getsize(storage.binary_snapshot) / 1e6:.1f} MB"
+        )
+        timed("startup: cold InventoryCache.get()", InventoryCache(storage).get)
+
+        random.seed(1)
+        wanted = [str(100000 + random.randrange(count)) for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+        for product_id in wanted:
+            inventory[product_id].price
+        per_lookup = (time.perf_counter() - start) / LOOKUPS
+        print(f"{'lookup in the loaded inventory':44} {per_lookup * 1e6:10.2f} us")
+
+        with timed(
+            "open the binary snapshot with mmap",
+            lambda: BinarySnapshot(storage.binary_snapshot),
+        ) as snapshot:
+            start = time.perf_counter()
+            for product_id in wanted:
+                snapshot[product_id].price
+            per_lookup = (time.perf_counter() - start) / LOOKUPS
+            print(f"{'lookup in the mmap snapshot':44} {per_lookup * 1e6:10.2f} us")
+            assert snapshot[wanted[0]].name == inventory[wanted[0]].name
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Usage: python benchmarks/catalogue_import.py [catalogue rows]
+
+Imports a supplier catalogue, half price updates and half new products with
+one row in a hundred invalid, into a text inventory of the same size. Reports
+the rows per second against adding the products one at a time with
+add_product, and the memory the import needs on top of the inventory for the
+catalogue and for one twice as large.
+"""
+
+# Imports
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.catalogue import export_catalogue, import_catalogue
+from pos_core.inventory import InventoryCache
+from pos_core.register import add_product
+from pos_core.storage import open_storage
+
+ONE_AT_A_TIME_ROWS = 500
+
+
+def write_files(folder, rows):
+    """
+    Writes an inventory of rows products and a catalogue of rows rows.
+
+    Returns:
+     - tuple: The inventory and catalogue paths.
+    """
+    inventory = os.path.join(folder, f"inventory_{rows}.txt")
+    with open(inventory, "w") as file:
+        for i in range(rows):
+            file.write(f"Product {i},{100000 + i},1.5,10\n")
+    catalogue = os.path.join(folder, f"catalogue_{rows}.csv")
+    with open(catalogue, "w") as file:
+        file.write("product_id,name,price,quantity\n")
+        for i in range(rows):
+            price = "n/a" if i % 100 == 99 else f"{i % 997 / 10 + 0.5}"
+            file.write(f"{100000 + rows // 2 + i},Supplier item {i},{price},{i % 50}\n")
+    return inventory, catalogue
+
+
+def transient_memory(inventory, catalogue):
+    """
+    Returns the peak memory of an import above what the inventory keeps
+    afterwards, in MB.
+    """
+    cache = InventoryCache(open_storage(inventory))
+    cache.get()
+    tracemalloc.start()
+    import_catalogue(catalogue, cache=cache)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (peak - retained) / 1e6
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as folder:
+        inventory, catalogue = write_files(folder, rows)
+        cache = InventoryCache(open_storage(inventory))
+        cache.get()
+        start = time.perf_counter()
+        report = import_catalogue(catalogue, os.path.join(folder, "errors.csv"), cache)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{rows} rows: {report.imported} imported, {report.added} new,"
+            f" {report.rejected} rejected"
+        )
+        print(f"import_catalogue:      {rows / elapsed:10.0f} rows/s")
+
+        start = time.perf_counter()
+        for i in range(ONE_AT_A_TIME_ROWS):
+            add_product(f"Supplier item {i}", str(100000 + i), "2.5", "5", cache)
+        elapsed = time.perf_counter() - start
+        print(f"add_product per row:   {ONE_AT_A_TIME_ROWS / elapsed:10.0f} rows/s")
+
+        start = time.perf_counter()
+        count = export_catalogue(os.path.join(folder, "export.csv"), cache)
+        print(
+            f"export_catalogue:      {count / (time.perf_counter() - start):10.0f} rows/s"
+        )
+
+        for size in (rows, rows * 2):
+            inventory, catalogue = write_files(folder, size)
+            print(
+                f"import memory above the inventory, {size} rows:"
+                f" {transient_memory(inventory, catalogue):7.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Usage: python benchmarks/core_import.py [runs]
+
+Times the cold start of a back-office script: a fresh interpreter importing
+pos_core, next to one importing main_code with the GUI frames, which is what
+a script had to import before pos_core existed. Run it with the bytecode
+cache writable, or every run compiles pos_core again.
+"""
+
+# Imports
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+FOLDER = os.path.join(os.path.dirname(__file__), os.pardir)
+
+STATEMENTS = [
+    ("interpreter only", "pass"),
+    ("import pos_core", "import pos_core"),
+    ("import main_code (GUI)", "import main_code"),
+]
+
+
+def start_ms(statement):
+    """
+    Returns how long a fresh interpreter took to run a statement, in
+    milliseconds, or None if it failed.
+    """
+    start = time.perf_counter()
+    finished = subprocess.run(
+        [sys.executable, "-c", statement], cwd=FOLDER, capture_output=True
+    )
+    if finished.returncode:
+        return None
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"{runs} runs")
+    for label, statement in STATEMENTS:
+        times = [start_ms(statement) for _ in range(runs)]
+        if None in times:
+            print(f"{label:34} {'failed':>9} (is customtkinter installed?)")
+        else:
+            print(f"{label:34} {statistics.median(times):9.1f} ms median")
+
+
+if __name__ == "__main__":
+    main()
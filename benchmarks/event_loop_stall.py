@@ -0,0 +1,122 @@
+"""
+Usage: python benchmarks/event_loop_stall.py [products] [carts]
+
+Measures how long the GUI thread is blocked per button press when the register
+operations run on it directly, and when they are handed to a TaskRunner.
+Runs headless: a small after() loop stands in for the Tk event loop.
+"""
+
+# Imports
+import heapq
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core import receipts
+from pos_core.inventory import InventoryCache
+from pos_core.receipt_index import ReceiptIndex
+from pos_core.receipts import ReceiptJournal
+from pos_core.register import ShoppingCart
+from pos_core.storage import open_storage
+from pos_core.tasks import TaskRunner
+
+
+class EventLoop:
+    """
+    A single-threaded stand-in for the Tk event loop with an after() method.
+    """
+
+    def __init__(self):
+        self.timers = []
+        self.counter = 0
+
+    def after(self, milliseconds, callback):
+        self.counter += 1
+        heapq.heappush(
+            self.timers,
+            (time.perf_counter() + milliseconds / 1000, self.counter, callback),
+        )
+
+    def run_until(self, done):
+        while not done():
+            due, _, callback = heapq.heappop(self.timers)
+            time.sleep(max(0.0, due - time.perf_counter()))
+            callback()
+
+
+def press(handler, blocked):
+    """
+    Runs a button handler on the loop and records how long it blocked.
+    """
+    start = time.perf_counter()
+    handler()
+    blocked.append((time.perf_counter() - start) * 1000)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(products, carts, in_background):
+    """
+    Checks out carts of five items and returns the blocking time per press.
+
+    Args:
+     - products (int): The number of products in the inventory.
+     - carts (int): The number of carts to check out.
+     - in_background (bool): Hand the operations to a TaskRunner.
+
+    Returns:
+     - list: Milliseconds the GUI thread was blocked by each press.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "inventory.txt")
+        with open(filename, "w") as file:
+            for i in range(products):
+                file.write(f"Product {i},{100000 + i},1.5,1000000\n")
+        receipts.receipt_journal = ReceiptJournal(os.path.join(folder, "receipts"))
+        receipts.receipt_index = ReceiptIndex(os.path.join(folder, "index.db"))
+        cache = InventoryCache(open_storage(filename))
+        cache.get()
+
+        loop = EventLoop()
+        runner = TaskRunner(loop, poll_interval=1)
+        cart = ShoppingCart(cache)
+        finished = []
+        blocked = []
+
+        def call(function, *args):
+            if in_background:
+                runner.submit(function, *args, on_done=finished.append, key=cart)
+            else:
+                finished.append(function(*args))
+
+        for number in range(carts):
+            for item in range(5):
+                product_id = str(100000 + (number * 5 + item) % products)
+                press(lambda: call(cart.add_item, product_id, 1), blocked)
+            press(lambda: call(cart.checkout), blocked)
+
+        loop.run_until(lambda: len(finished) == carts * 6)
+        runner.shutdown()
+    return blocked
+
+
+def main():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    carts = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    for label, in_background in [("on GUI thread", False), ("TaskRunner", True)]:
+        blocked = run(products, carts, in_background)
+        print(
+            f"{label:>14}: p50 {percentile(blocked, 0.5):8.3f} ms"
+            f"  p99 {percentile(blocked, 0.99):8.3f} ms"
+            f"  worst {max(blocked):8.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Usage: python benchmarks/gui_startup.py [runs]
+
+Starts the GUI several times and reports how long it took from starting
+starter.py to the New Customer frame taking input, as printed with
+POS_MEASURE_STARTUP=1. Needs customtkinter and a display, and runs in the
+folder holding the inventory.
+"""
+
+# Imports
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+STARTER = os.path.join(os.path.dirname(__file__), os.pardir, "starter.py")
+
+
+def startup_ms():
+    """
+    Starts the GUI, waits for its startup time and closes it.
+
+    Returns:
+     - tuple: The startup time measured by the GUI and the time until the
+       line was read, including starting the interpreter, in milliseconds.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, STARTER],
+        env={**os.environ, "POS_MEASURE_STARTUP": "1"},
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        for line in process.stdout:
+            if line.startswith("Startup:"):
+                total = (time.perf_counter() - start) * 1000
+                return float(line.split()[1]), total
+        raise RuntimeError("the GUI exited without printing its startup time")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    measured = []
+    totals = []
+    for _ in range(runs):
+        gui, total = startup_ms()
+        measured.append(gui)
+        totals.append(total)
+    print(f"{runs} runs")
+    print(
+        f"{'startup, from starter.py':34} {statistics.median(measured):9.1f} ms median"
+    )
+    print(
+        f"{'startup, from process start':34} {statistics.median(totals):9.1f} ms median"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Usage: python benchmarks/hot_paths.py [--skus 1000,100000,1000000]
+           [--cart-lines 1,10,100,500] [--budget 1.0] [--output results.json]
+           [--compare baseline.json] [--tolerance 0.25]
+
+Times read_file, save_file, create_receipt, save_receipt, ShoppingCart.add_item
+and ShoppingCart.checkout on synthetic inventories and carts, without a display.
+Reports throughput, p50/p99 latency and peak memory per case and writes them as
+JSON. With --compare, cases whose p50 got slower than the baseline by more than
+the tolerance are listed and the exit status is 1.
+"""
+
+# Imports
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core import receipts
+from pos_core.inventory import InventoryCache
+from pos_core.products import Product
+from pos_core.receipt_index import ReceiptIndex
+from pos_core.receipts import ReceiptJournal, create_receipt, save_receipt
+from pos_core.register import ShoppingCart
+from pos_core.storage import open_storage, read_file, save_file
+
+FIRST_ID = 100000
+INITIAL_STOCK = 1_000_000_000
+MIN_RUNS = 3
+MAX_RUNS = 1000
+# Slowdowns smaller than this are timer noise, whatever the tolerance
+NOISE_MS = 0.05
+
+
+def write_inventory(filename, count):
+    """
+    Writes a synthetic inventory file.
+
+    Args:
+     - filename (str): The file to write.
+     - count (int): The number of SKUs.
+    """
+    with open(filename, "w") as file:
+        for i in range(count):
+            file.write(
+                f"Product {i},{FIRST_ID + i},{(i % 997) / 10 + 0.5},{INITIAL_STOCK}\n"
+            )
+
+
+def random_ids(generator, skus, lines):
+    """
+    Returns distinct random product IDs for a cart.
+
+    Args:
+     - generator (random.Random): The random source.
+     - skus (int): The number of SKUs in the inventory.
+     - lines (int): The number of cart lines.
+
+    Returns:
+     - list: The product IDs.
+    """
+    return [str(FIRST_ID + i) for i in generator.sample(range(skus), min(lines, skus))]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(operation, function, setup=None, budget=1.0, **case):
+    """
+    Times an operation until the time budget is used up, then runs it once
+    more under tracemalloc for its peak memory.
+
+    Args:
+     - operation (str): The name of the operation.
+     - function (callable): The operation, called with the arguments from setup.
+     - setup (callable): Returns the arguments for one call; not timed.
+     - budget (float): Seconds to spend timing the operation.
+     - case: The parameters of the case, stored with the result.
+
+    Returns:
+     - dict: The result of the case.
+    """
+    setup = setup or (lambda: ())
+    timings = []
+    spent = 0.0
+    gc.collect()
+    while len(timings) < MIN_RUNS or (spent < budget and len(timings) < MAX_RUNS):
+        arguments = setup()
+        start = time.perf_counter()
+        function(*arguments)
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        spent += elapsed
+
+    arguments = setup()
+    tracemalloc.start()
+    function(*arguments)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = dict(
+        operation=operation,
+        **case,
+        runs=len(timings),
+        throughput_per_s=len(timings) / spent,
+        p50_ms=percentile(timings, 0.5) * 1000,
+        p99_ms=percentile(timings, 0.99) * 1000,
+        peak_memory_bytes=peak,
+    )
+    print(
+        f"{operation:>14} {case.get('skus', ''):>8} SKUs {case.get('cart_lines', ''):>4} lines"
+        f" {result['throughput_per_s']:10.1f}/s p50 {result['p50_ms']:9.3f} ms"
+        f" p99 {result['p99_ms']:9.3f} ms peak {peak / 1024:10.1f} KiB"
+    )
+    return result
+
+
+def run_size(folder, skus, cart_sizes, budget):
+    """
+    Runs every case for one inventory size.
+
+    Args:
+     - folder (str): A scratch folder.
+     - skus (int): The number of SKUs.
+     - cart_sizes (list): The cart line counts to try.
+     - budget (float): Seconds to spend timing each case.
+
+    Returns:
+     - list: The results.
+    """
+    generator = random.Random(skus)
+    filename = os.path.join(folder, f"inventory_{skus}.txt")
+    copy = os.path.join(folder, f"copy_{skus}.txt")
+    write_inventory(filename, skus)
+    results = [measure("read_file", read_file, lambda: (filename,), budget, skus=skus)]
+
+    # Bound as a default, so deleting the name frees the inventory afterwards
+    inventory = read_file(filename)
+    results.append(
+        measure(
+            "save_file",
+            save_file,
+            lambda inventory=inventory: (copy, inventory),
+            budget,
+            skus=skus,
+        )
+    )
+    del inventory
+
+    cache = InventoryCache(open_storage(filename))
+    cache.get()
+    results.append(
+        measure(
+            "add_item",
+            lambda cart, product_id: cart.add_item(product_id, 1),
+            lambda: (
+                ShoppingCart(cache),
+                str(FIRST_ID + generator.randrange(skus)),
+            ),
+            budget,
+            skus=skus,
+        )
+    )
+
+    for lines in cart_sizes:
+
+        def filled_cart():
+            cart = ShoppingCart(cache)
+            for product_id in random_ids(generator, skus, lines):
+                cart.add_item(product_id, 1)
+            return (cart,)
+
+        def cart_items():
+            return (
+                {
+                    product_id: Product(f"Product {product_id}", product_id, 1.5, 2)
+                    for product_id in random_ids(generator, skus, lines)
+                },
+            )
+
+        results.append(
+            measure(
+                "create_receipt",
+                create_receipt,
+                cart_items,
+                budget,
+                skus=skus,
+                cart_lines=lines,
+            )
+        )
+        results.append(
+            measure(
+                "save_receipt",
+                save_receipt,
+                lambda: ("purchase", create_receipt(cart_items()[0])),
+                budget,
+                skus=skus,
+                cart_lines=lines,
+            )
+        )
+        results.append(
+            measure(
+                "checkout",
+                ShoppingCart.checkout,
+                filled_cart,
+                budget,
+                skus=skus,
+                cart_lines=lines,
+            )
+        )
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lists the cases that got slower than in a baseline run.
+
+    Args:
+     - results (list): The results of this run.
+     - baseline (dict): A previous run, as written by this script.
+     - tolerance (float): The allowed slowdown of the p50, 0.25 for 25 %.
+
+    Returns:
+     - list: (case, baseline p50, p50) tuples of the regressed cases.
+    """
+
+    def key(result):
+        return (result["operation"], result.get("skus"), result.get("cart_lines"))
+
+    previous = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if old is None or result["p50_ms"] - old["p50_ms"] < NOISE_MS:
+            continue
+        if result["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            regressions.append((key(result), old["p50_ms"], result["p50_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the register hot paths")
+    parser.add_argument("--skus", default="1000,100000,1000000")
+    parser.add_argument("--cart-lines", default="1,10,100,500")
+    parser.add_argument("--budget", type=float, default=1.0)
+    parser.add_argument("--output", default="hot_paths.json")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    arguments = parser.parse_args()
+
+    sizes = [int(size) for size in arguments.skus.split(",")]
+    cart_sizes = [int(lines) for lines in arguments.cart_lines.split(",")]
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        receipts.receipt_journal = ReceiptJournal(os.path.join(folder, "receipts"))
+        receipts.receipt_index = ReceiptIndex(os.path.join(folder, "index.db"))
+        for skus in sizes:
+            results.extend(run_size(folder, skus, cart_sizes, arguments.budget))
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "budget_s": arguments.budget,
+        "results": results,
+    }
+    with open(arguments.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {arguments.output}")
+
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            regressions = compare(results, json.load(file), arguments.tolerance)
+        for case, old, new in regressions:
+            print(f"Regression in {case}: p50 {old:.3f} ms -> {new:.3f} ms")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Usage: python benchmarks/inventory_browser.py [number of SKUs]
+
+Times what the inventory browser does on a worker thread when the cashier
+opens the inventory, flips pages, changes the sort order, types a filter and
+browses again after a sale.
+"""
+
+# Imports
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.browser import InventoryBrowser
+from pos_core.inventory import InventoryCache
+from pos_core.storage import open_storage
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:34} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "inventory.txt")
+        with open(filename, "w") as file:
+            for i in range(count):
+                file.write(
+                    f"Product {i} {'ABCDEFG'[i % 7]}aft,{100000 + i},"
+                    f"{(i % 997) / 10 + 0.5},{i % 250}\n"
+                )
+        cache = InventoryCache(open_storage(filename))
+        timed("load inventory", cache.get)
+        browser = InventoryBrowser(cache)
+
+        print(f"{count} SKUs")
+        timed("open, sorted by name", lambda: browser.page(0))
+        timed("next page", lambda: browser.page(1))
+        timed("page in the middle", lambda: browser.page(browser.page_count() // 2))
+        for sort_key in ["id", "price", "stock"]:
+            browser.set_sort(sort_key)
+            timed(f"sort by {sort_key}", lambda: browser.page(0))
+        browser.set_sort("name")
+        for query in ["1", "12", "123", "1234", "caft"]:
+            browser.set_filter(query)
+            timed(f"filter {query!r}", lambda: browser.page(0))
+        browser.set_filter("")
+        cache.adjust_quantities({"100000": -1})
+        timed("after a sale, sorted by name", lambda: browser.page(0))
+        browser.set_sort("stock")
+        timed("after a sale, sorted by stock", lambda: browser.page(0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Usage: python benchmarks/inventory_memory.py [number of SKUs]
+
+Reports the memory per SKU and the load time of the inventory representations.
+"""
+
+# Imports
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.products import Product, ProductStore
+from pos_core.storage import TextStorage, parse_inventory
+
+
+class DictProduct:
+    """
+    The product as it was stored before ProductStore, with a per-instance __dict__.
+    """
+
+    def __init__(self, name, product_id, price, quantity):
+        self.name = name
+        self.product_id = product_id
+        self.price = float(price)
+        self.quantity = int(quantity)
+
+
+def synthetic_lines(count):
+    """
+    Returns inventory lines for the given number of SKUs.
+
+    Args:
+     - count (int): The number of SKUs.
+
+    Returns:
+     - list: The lines in the inventory file format.
+    """
+    return [
+        f"Product {i},{100000 + i},{(i % 997) / 10 + 0.5},{i % 250}"
+        for i in range(count)
+    ]
+
+
+def measure(build, lines):
+    """
+    Builds an inventory from the lines and measures it, including the
+    strings and numbers parsed from each line. The build is timed on its own,
+    as tracing the allocations slows some builds far more than others.
+
+    Args:
+     - build (function): Builds the inventory from the inventory lines.
+     - lines (list): The inventory lines.
+
+    Returns:
+     - tuple: The bytes allocated by the inventory and the build time.
+    """
+    start = time.perf_counter()
+    inventory = build(lines)
+    elapsed = time.perf_counter() - start
+    del inventory
+
+    tracemalloc.start()
+    inventory = build(lines)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del inventory
+    return allocated, elapsed
+
+
+def build_dict(product_class, lines):
+    inventory = {}
+    for line in lines:
+        attributes = line.split(",")
+        inventory[attributes[1]] = product_class(*attributes)
+    return inventory
+
+
+def build_store(lines):
+    store = ProductStore()
+    store.reserve(len(lines))
+    for line in lines:
+        name, product_id, price, quantity = line.split(",")
+        store.put(name, product_id, price, quantity)
+    return store
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    lines = synthetic_lines(count)
+
+    builders = {
+        "dict of Product with __dict__": lambda lines: build_dict(DictProduct, lines),
+        "dict of slotted Product": lambda lines: build_dict(Product, lines),
+        "ProductStore, put() by put()": build_store,
+        "ProductStore, parse_inventory": lambda lines: parse_inventory(
+            "\n".join(lines)
+        ),
+    }
+    print(f"{count} SKUs")
+    for label, build in builders.items():
+        allocated, elapsed = measure(build, lines)
+        print(f"{label:32} {allocated / count:8.1f} bytes/SKU {elapsed:8.3f} s")
+
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "inventory.txt")
+        with open(filename, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        start = time.perf_counter()
+        TextStorage(filename).load()
+        print(f"{'TextStorage.load':32} {time.perf_counter() - start:23.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Usage: python benchmarks/member_lookup.py [number of members]
+
+Times loyalty card lookups at the till in a members database of millions of
+cards: cards not looked up before, hot cards served from the LRU cache and
+unknown cards, next to loading members.txt into a dictionary.
+"""
+
+# Imports
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.members import MemberStore
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:34} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+def per_lookup(label, store, cards):
+    start = time.perf_counter()
+    for card in cards:
+        store.find(card)
+    elapsed = time.perf_counter() - start
+    print(f"{label:34} {elapsed / len(cards) * 1e6:9.1f} us per lookup")
+
+
+def load_dict(path):
+    members = {}
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            card_number, name, points = line.rstrip("\n").split(",")
+            members[card_number] = (name, int(points))
+    return members
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as folder:
+        text = os.path.join(folder, "members.txt")
+        with open(text, "w") as file:
+            for i in range(count):
+                file.write(f"{7000000000 + i},Member {i},{i % 5000}\n")
+        print(f"{count} members")
+
+        store = MemberStore(os.path.join(folder, "members.db"), source=None)
+        timed("import members.txt", lambda: store.import_text(text))
+        store = MemberStore(store.path, source=None)
+        timed("open the database", lambda: store.find("0"))
+
+        cold = [str(7000000000 + random.randrange(count)) for _ in range(20_000)]
+        per_lookup("cards not seen before", store, cold)
+        hot = cold[:1000]
+        per_lookup("hot cards, cached", store, hot * 20)
+        per_lookup("unknown cards", store, [f"x{i}" for i in range(20_000)])
+        store.add_points(hot[0], 10, None)
+        per_lookup("hot cards after a points change", store, hot * 20)
+
+        tracemalloc.start()
+        members = timed("load members.txt into a dict", lambda: load_dict(text))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{'dict peak memory':34} {peak / 2**20:9.1f} MB")
+        del members
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Usage: python benchmarks/metrics_overhead.py [products] [carts]
+
+Reports the cost of one timed() call, runs the same add_item and checkout
+workload with the metrics turned off and on and reports the slowdown, then
+prints the recorded metrics.
+"""
+
+# Imports
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core import receipts
+from pos_core.inventory import InventoryCache
+from pos_core.metrics import metrics
+from pos_core.receipt_index import ReceiptIndex
+from pos_core.receipts import ReceiptJournal
+from pos_core.register import ShoppingCart
+from pos_core.storage import open_storage
+
+ROUNDS = 5
+
+
+def workload(cache, products, carts):
+    """
+    Fills and checks out carts of ten lines.
+
+    Returns:
+     - tuple: Seconds spent in add_item and in checkout.
+    """
+    adding = checking_out = 0.0
+    for number in range(carts):
+        cart = ShoppingCart(cache)
+        start = time.perf_counter()
+        for line in range(10):
+            cart.add_item(str(100000 + (number * 10 + line) % products), 1)
+        middle = time.perf_counter()
+        cart.checkout()
+        adding += middle - start
+        checking_out += time.perf_counter() - middle
+    return adding, checking_out
+
+
+def main():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    carts = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    def plain():
+        pass
+
+    timed = metrics.timed("no-op")(plain)
+    calls = 200_000
+    cost = timeit.timeit(timed, number=calls) - timeit.timeit(plain, number=calls)
+    print(f"timed() costs {cost / calls * 1e6:.2f} us per call\n")
+    metrics.reset()
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "inventory.txt")
+        with open(filename, "w") as file:
+            for i in range(products):
+                file.write(f"Product {i},{100000 + i},1.5,1000000000\n")
+        receipts.receipt_journal = ReceiptJournal(os.path.join(folder, "receipts"))
+        receipts.receipt_index = ReceiptIndex(os.path.join(folder, "index.db"))
+        cache = InventoryCache(open_storage(filename))
+        cache.get()
+
+        # Alternate the two settings so drift in disk speed hits both alike
+        totals = {False: [0.0, 0.0], True: [0.0, 0.0]}
+        for _ in range(ROUNDS):
+            for enabled in (False, True):
+                metrics.enabled = enabled
+                adding, checking_out = workload(cache, products, carts)
+                totals[enabled][0] += adding
+                totals[enabled][1] += checking_out
+
+    for index, operation in enumerate(["add_item", "checkout"]):
+        off, on = totals[False][index], totals[True][index]
+        print(
+            f"{operation:>9}: off {off / ROUNDS * 1000:9.2f} ms"
+            f"  on {on / ROUNDS * 1000:9.2f} ms  overhead {on / off - 1:+7.2%}"
+        )
+    print()
+    print(metrics.summary())
+
+
+if __name__ == "__main__":
+    main()
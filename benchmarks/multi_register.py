@@ -0,0 +1,145 @@
+"""
+Usage: python benchmarks/multi_register.py [lanes] [checkouts per lane] [--sqlite]
+
+Runs several register processes checking out against one shared inventory,
+then checks that no stock update or receipt was lost. Also reports how long
+each checkout holds the inventory and receipt locks, as only one register
+holds each lock at a time: however many lanes run, they check out at most
+one sale per hold time of the busiest lock.
+"""
+
+# Imports
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.inventory import InventoryCache
+from pos_core.metrics import metrics
+from pos_core.receipts import ReceiptJournal
+from pos_core.register import ShoppingCart
+from pos_core.storage import open_storage, read_file
+
+PRODUCTS = 2000
+INITIAL_STOCK = 1_000_000
+
+
+def run_lane(folder, filename, lane, checkouts, sold):
+    """
+    Checks out random carts and reports the quantities sold and the time
+    the locks were held.
+
+    Args:
+     - folder (str): The shared working folder.
+     - filename (str): The shared inventory file.
+     - lane (int): The lane number, used as random seed.
+     - checkouts (int): The number of carts to check out.
+     - sold (multiprocessing.Queue): Receives the quantities sold per product
+       and the seconds each lock was held.
+    """
+    os.chdir(folder)
+    generator = random.Random(lane)
+    cache = InventoryCache(open_storage(filename))
+    quantities = {}
+    for _ in range(checkouts):
+        cart = ShoppingCart(cache)
+        for _ in range(generator.randint(1, 5)):
+            product_id = str(100000 + generator.randrange(PRODUCTS))
+            quantity = generator.randint(1, 3)
+            cart.add_item(product_id, quantity)
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        cart.checkout()
+    with metrics.lock:
+        metrics.collect()
+        held = {
+            operation: histogram.total
+            for operation, histogram in metrics.latencies.items()
+            if operation.startswith("lock_")
+        }
+    sold.put((quantities, held))
+
+
+def run(lanes, checkouts, sqlite=False):
+    """
+    Runs the lanes against a fresh inventory and checks the final stock.
+
+    Args:
+     - lanes (int): The number of register processes.
+     - checkouts (int): The number of carts per lane.
+     - sqlite (bool): Use the SQLite backend instead of the text file.
+
+    Returns:
+     - tuple: The checkouts per second over all lanes, and the seconds per
+       checkout each lock was held, keyed by lock.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "inventory.db" if sqlite else "inventory.txt")
+        with open(os.path.join(folder, "inventory.txt"), "w") as file:
+            for i in range(PRODUCTS):
+                file.write(f"Product {i},{100000 + i},1.5,{INITIAL_STOCK}\n")
+        if sqlite:
+            open_storage(filename).save(
+                read_file(os.path.join(folder, "inventory.txt"))
+            )
+
+        sold = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=run_lane, args=(folder, filename, lane, checkouts, sold)
+            )
+            for lane in range(lanes)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        totals = {}
+        held = {}
+        for _ in processes:
+            quantities, lane_held = sold.get()
+            for product_id, quantity in quantities.items():
+                totals[product_id] = totals.get(product_id, 0) + quantity
+            for operation, seconds in lane_held.items():
+                held[operation] = held.get(operation, 0) + seconds
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0, f"lane exited with {process.exitcode}"
+        elapsed = time.perf_counter() - start
+
+        inventory = read_file(filename)
+        for product_id, product in inventory.items():
+            expected = INITIAL_STOCK - totals.get(product_id, 0)
+            assert (
+                product.quantity == expected
+            ), f"{product_id}: {product.quantity} in stock, expected {expected}"
+        journal = ReceiptJournal(os.path.join(folder, "receipts"))
+        assert len(journal) == lanes * checkouts, "receipts were lost"
+        assert {journal.fetch(n).number for n in range(1, len(journal) + 1)} == set(
+            range(1, lanes * checkouts + 1)
+        )
+    return lanes * checkouts / elapsed, {
+        operation: seconds / (lanes * checkouts) for operation, seconds in held.items()
+    }
+
+
+def main():
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--")]
+    sqlite = "--sqlite" in sys.argv
+    checkouts = int(arguments[1]) if len(arguments) > 1 else 200
+    lane_counts = [int(arguments[0])] if arguments else [1, 2, 4, 8]
+    print(f"{os.cpu_count()} CPUs")
+    for lanes in lane_counts:
+        throughput, held = run(lanes, checkouts, sqlite)
+        print(f"{lanes} lanes: {throughput:8.1f} checkouts/s, final stock correct")
+        for operation, seconds in sorted(held.items()):
+            print(
+                f"    {operation:24} held {seconds * 1000:6.3f} ms per checkout,"
+                f" at most {1 / seconds:8.1f} checkouts/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Usage: python benchmarks/name_search.py [number of SKUs]
+
+Times the product name search as the cashier types a name letter by letter,
+with a typo and with two words, and how long the index takes to build and to
+follow a renamed product.
+"""
+
+# Imports
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.inventory import InventoryCache
+from pos_core.products import Product
+from pos_core.search import NameIndex
+from pos_core.storage import open_storage
+
+FRUIT = ["Apple", "Banana", "Broccoli", "Carrot", "PeanutButter", "Orange Juice"]
+SYLLABLES = [consonant + vowel for consonant in "bdfgklmnprstvz" for vowel in "aeiou"]
+
+
+def brand(number):
+    """
+    Returns a made-up brand word of three syllables, one of 100,000, so the
+    index holds as many distinct words as a real catalogue.
+    """
+    number %= 100_000
+    syllables = []
+    for _ in range(3):
+        number, syllable = divmod(number, len(SYLLABLES))
+        syllables.append(SYLLABLES[syllable])
+    return "".join(syllables).capitalize()
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:34} {(time.perf_counter() - start) * 1000:9.3f} ms")
+    return result
+
+
+def searched(index, query, repeat=50):
+    """
+    Prints the median and the slowest of repeated searches for a query.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index.search(query)
+        times.append((time.perf_counter() - start) * 1000)
+    label = f"search {query!r}"
+    print(f"{label:34} {statistics.median(times):9.3f} ms, slowest {max(times):.3f}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "inventory.txt")
+        with open(filename, "w") as file:
+            for i in range(count):
+                file.write(
+                    f"{brand(i * 7919)} {FRUIT[i % len(FRUIT)]} {i % 1000}g,"
+                    f"{100000 + i},{(i % 997) / 10 + 0.5},{i % 250}\n"
+                )
+        cache = InventoryCache(open_storage(filename))
+        timed("load inventory", cache.get)
+        index = NameIndex(cache)
+
+        print(f"{count} SKUs")
+        timed("build index", index.rebuild)
+        for end in range(1, len("broccoli") + 1):
+            searched(index, "broccoli"[:end])
+        # Typos, which fall back to the trigram index
+        searched(index, "brocoli")
+        searched(index, "surdou")
+        searched(index, "orange ju")
+        searched(index, "1234")
+        timed(
+            "rename a product",
+            lambda: cache.put_product(Product("Mango Chutney", "100000", 30.0, 5)),
+        )
+        # The first change also starts the journal, which checksums the inventory
+        timed(
+            "rename another product",
+            lambda: cache.put_product(Product("Lime Pickle", "100001", 30.0, 5)),
+        )
+        print(index.search("chutney"))
+
+
+if __name__ == "__main__":
+    main()
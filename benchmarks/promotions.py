@@ -0,0 +1,141 @@
+"""
+Usage: python benchmarks/promotions.py [number of promotions ...]
+
+Times pricing a cart as it is filled with hundreds of lines against thousands
+of active promotions: the promotions engine, which evaluates only the
+promotions on the changed product, against evaluating every promotion over
+the whole cart after each change. The engine's total is checked against
+pricing the final cart from scratch.
+"""
+
+# Imports
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.products import Product
+from pos_core.promotions import Bundle, CartPricing, MultiBuy, PercentOff, Promotions
+from pos_core.receipts import ReceiptBuilder
+
+PRODUCTS = 100_000
+NOW = datetime(2024, 6, 3, 16, 0)
+
+
+def make_promotions(count):
+    random.seed(count)
+    rules = []
+    for i in range(count):
+        product_ids = [
+            str(100000 + random.randrange(PRODUCTS // 10))
+            for _ in range(random.randint(2, 40))
+        ]
+        kind = i % 3
+        if kind == 0:
+            rules.append(MultiBuy(f"m{i}", f"Multi-buy {i}", product_ids, 3, 20))
+        elif kind == 1:
+            rules.append(Bundle(f"b{i}", f"Bundle {i}", product_ids[:3], 15))
+        else:
+            rules.append(
+                PercentOff(
+                    f"p{i}", f"Offer {i}", product_ids, 10, start="15:00", end="17:00"
+                )
+            )
+    return Promotions(rules)
+
+
+def changes(lines):
+    """
+    Adds lines one at a time, then adds to and removes from random lines.
+    """
+    random.seed(lines)
+    product_ids = [str(100000 + random.randrange(PRODUCTS // 10)) for _ in range(lines)]
+    for product_id in product_ids:
+        yield product_id, 1
+    for _ in range(lines):
+        yield random.choice(product_ids), random.choice((1, -1))
+
+
+def apply(items, receipt, product_id, change):
+    line = items.get(product_id)
+    if line is None:
+        if change < 0:
+            return False
+        line = items[product_id] = Product(f"Product {product_id}", product_id, 9.5, 0)
+    line.add_quantity(change)
+    if line.quantity <= 0:
+        del items[product_id]
+        receipt.remove_line(product_id)
+    else:
+        receipt.set_line(line)
+    return True
+
+
+def incremental(promotions, lines):
+    items = {}
+    receipt = ReceiptBuilder()
+    pricing = CartPricing(promotions, receipt)
+    count = 0
+    start = time.perf_counter()
+    for product_id, change in changes(lines):
+        if apply(items, receipt, product_id, change):
+            pricing.update(items, product_id, NOW)
+            count += 1
+    return (time.perf_counter() - start) / count, receipt.total, items
+
+
+def from_scratch(promotions, items):
+    receipt = ReceiptBuilder()
+    for line in items.values():
+        receipt.set_line(line)
+    CartPricing(promotions, receipt).price(items, NOW)
+    return receipt.total
+
+
+def every_rule(promotions, lines):
+    items = {}
+    receipt = ReceiptBuilder()
+    count = 0
+    start = time.perf_counter()
+    for product_id, change in changes(lines):
+        if not apply(items, receipt, product_id, change):
+            continue
+        for promotion in promotions.rules.values():
+            cart_lines = [
+                items[product_id]
+                for product_id in promotion.product_ids
+                if product_id in items
+            ]
+            amount = 0
+            if cart_lines and promotion.active(NOW):
+                amount = promotion.discount(cart_lines)
+            if amount:
+                receipt.set_discount(promotion.promotion_id, promotion.name, amount)
+            else:
+                receipt.remove_discount(promotion.promotion_id)
+        count += 1
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    counts = [int(count) for count in sys.argv[1:]] or [1000, 5000]
+    print(
+        f"{'promotions':>10} {'lines':>6} {'engine us':>12} {'every rule us':>14} {'same total':>11}"
+    )
+    for count in counts:
+        promotions = make_promotions(count)
+        for lines in [100, 500]:
+            engine, engine_total, items = incremental(promotions, lines)
+            naive = every_rule(promotions, lines)
+            same = engine_total == from_scratch(promotions, items)
+            print(
+                f"{count:>10} {lines:>6} {engine * 1e6:>12.1f} {naive * 1e6:>14.1f}"
+                f" {str(same):>11}"
+            )
+
+
+if __name__ == "__main__":
+    main()
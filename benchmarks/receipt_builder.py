@@ -0,0 +1,63 @@
+"""
+Usage: python benchmarks/receipt_builder.py [cart lines]
+
+Compares the time the customer waits for the receipt text at checkout: the
+old string += loop over the whole cart against rendering the ReceiptBuilder
+the cart kept up to date. Also checks that both give the same text.
+"""
+
+# Imports
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.products import Product
+from pos_core.receipts import ReceiptBuilder
+
+
+def concatenated_receipt(shopping_cart, return_receipt=False):
+    """
+    The receipt as create_receipt built it before ReceiptBuilder.
+    """
+    total_price = 0
+    receipt = "\n\nReceipt\n-------\nItems:\n"
+    for item in shopping_cart.values():
+        receipt += (
+            f"{item.name} ({item.product_id}): {item.price} kr, {item.quantity} st\n"
+        )
+        total_price += round(item.price * item.quantity)
+    if return_receipt:
+        receipt += f"Money returned: {total_price} kr"
+    else:
+        receipt += f"Total price: {total_price} kr"
+    return receipt
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    items = {
+        str(100000 + i): Product(
+            f"Catering item {i}", str(100000 + i), 12.95, i % 7 + 1
+        )
+        for i in range(lines)
+    }
+    builder = ReceiptBuilder()
+    start = timeit.default_timer()
+    for item in items.values():
+        builder.set_line(item)
+    per_line = (timeit.default_timer() - start) / lines
+    assert builder.render() == concatenated_receipt(items)
+
+    calls = 200
+    old = timeit.timeit(lambda: concatenated_receipt(items), number=calls) / calls
+    new = timeit.timeit(builder.render, number=calls) / calls
+    print(f"{lines} lines")
+    print(f"string +=, whole cart at checkout: {old * 1000:8.3f} ms")
+    print(f"ReceiptBuilder.render at checkout: {new * 1000:8.3f} ms")
+    print(f"ReceiptBuilder.set_line per added item: {per_line * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
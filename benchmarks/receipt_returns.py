@@ -0,0 +1,113 @@
+"""
+Usage: python benchmarks/receipt_returns.py [number of receipts]
+
+Times opening a return at the till in a journal holding years of receipts:
+reading the purchase by its number and the quantities already returned from
+it through the receipt index, next to finding the returns by reading every
+receipt.
+"""
+
+# Imports
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pos_core.products import Product
+from pos_core.receipt_index import ReceiptIndex, parse_receipt
+from pos_core.receipts import ReceiptBuilder, ReceiptJournal
+
+START = 1_600_000_000
+YEARS = 3
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:34} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+def make_receipts(count):
+    """
+    Returns (kind, receipt, timestamp) entries spread over the years, one
+    return for every tenth purchase.
+    """
+    random.seed(count)
+    step = YEARS * 365 * 86400 / count
+    entries = []
+    for i in range(count):
+        builder = ReceiptBuilder()
+        for _ in range(random.randint(1, 8)):
+            product_id = str(1000 + random.randrange(5000))
+            builder.set_line(Product(f"Product {product_id}", product_id, 9.5, 2))
+        if i % 10 == 9:
+            original = i - 5
+            receipt = builder.render(return_receipt=True)
+            receipt += f"\nOriginal receipt: {original}"
+            entries.append(("return", receipt, START + i * step))
+        else:
+            entries.append(("purchase", builder.render(), START + i * step))
+    return entries
+
+
+def build(folder, count):
+    journal = ReceiptJournal(folder)
+    index = ReceiptIndex(os.path.join(folder, "index.db"))
+    entries = make_receipts(count)
+    for chunk in range(0, count, 10_000):
+        batch = entries[chunk : chunk + 10_000]
+        numbers = journal.append_many(batch)
+        index.add_many(
+            [
+                (number, kind, timestamp, receipt, None)
+                for number, (kind, receipt, timestamp) in zip(numbers, batch)
+            ]
+        )
+    return journal, index
+
+
+def indexed(journal, index, number):
+    parsed = parse_receipt(journal.fetch(number).receipt)
+    return parsed.items, index.returned_quantities(number)
+
+
+def scanned(journal, number):
+    parsed = parse_receipt(journal.fetch(number).receipt)
+    returned = {}
+    for stored in journal:
+        other = parse_receipt(stored.receipt)
+        if other.original == number:
+            for item in other.items:
+                returned[item.product_id] = (
+                    returned.get(item.product_id, 0) + item.quantity
+                )
+    return parsed.items, returned
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as folder:
+        journal, index = timed(f"write {count} receipts", lambda: build(folder, count))
+        numbers = [random.randrange(1, count) for _ in range(2000)]
+
+        start = time.perf_counter()
+        for number in numbers:
+            indexed(journal, index, number)
+        elapsed = (time.perf_counter() - start) / len(numbers)
+        print(f"{'receipt and index':34} {elapsed * 1e6:9.1f} us per return")
+
+        sample = numbers[:3]
+        start = time.perf_counter()
+        for number in sample:
+            result = scanned(journal, number)
+            assert result == indexed(journal, index, number)
+        elapsed = (time.perf_counter() - start) / len(sample)
+        print(f"{'reading every receipt':34} {elapsed * 1e6:9.1f} us per return")
+
+
+if __name__ == "__main__":
+    main()
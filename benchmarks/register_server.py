@@ -0,0 +1,157 @@
+"""
+Usage: python benchmarks/register_server.py [clients ...]
+
+Starts a register server on a synthetic inventory and runs many simulated
+registers against it at once, each adding three products to a cart and
+checking out, over and over. Prints checkouts per second and the p50/p99
+latency of lookups and checkouts, with group commit and with every write
+committed on its own (--max-batch 1).
+"""
+
+# Imports
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+PRODUCTS = 10_000
+SECONDS = 3.0
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class Register:
+    """
+    One simulated register on its own connection.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.requests = 0
+
+    async def request(self, operation, *args):
+        self.requests += 1
+        message = {"id": self.requests, "op": operation, "args": args}
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        response = json.loads(await self.reader.readline())
+        if "error" in response:
+            raise RuntimeError(response)
+        return response["result"]
+
+
+async def sell(register, number, deadline, lookups, checkouts):
+    sale = 0
+    while time.perf_counter() < deadline:
+        sale += 1
+        cart = {}
+        for line in range(3):
+            product_id = str(100000 + (number * 7 + sale * 3 + line) % PRODUCTS)
+            start = time.perf_counter()
+            await register.request("get_product", product_id)
+            lookups.append(time.perf_counter() - start)
+            cart[product_id] = cart.get(product_id, 0) + 1
+        start = time.perf_counter()
+        await register.request("checkout", cart)
+        checkouts.append(time.perf_counter() - start)
+
+
+async def run(address, clients):
+    host, port = address.rsplit(":", 1)
+    registers = [
+        Register(*await asyncio.open_connection(host, int(port)))
+        for _ in range(clients)
+    ]
+    before = await registers[0].request("stats")
+    lookups = []
+    checkouts = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            sell(register, number, start + SECONDS, lookups, checkouts)
+            for number, register in enumerate(registers)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    after = await registers[0].request("stats")
+    for register in registers:
+        register.writer.close()
+    batches = after["batches"] - before["batches"]
+    return {
+        "checkouts/s": len(checkouts) / elapsed,
+        "lookup p50 ms": percentile(lookups, 0.5) * 1000,
+        "lookup p99 ms": percentile(lookups, 0.99) * 1000,
+        "checkout p50 ms": percentile(checkouts, 0.5) * 1000,
+        "checkout p99 ms": percentile(checkouts, 0.99) * 1000,
+        "writes/batch": (after["committed"] - before["committed"]) / max(batches, 1),
+    }
+
+
+def start_server(folder, max_batch):
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "pos_core.server",
+            "--port",
+            "0",
+            "--max-batch",
+            str(max_batch),
+        ],
+        cwd=folder,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = process.stdout.readline()
+    if not line.startswith("Serving"):
+        process.kill()
+        raise RuntimeError("the register server didn't start")
+    return process, line.split()[-1]
+
+
+def main():
+    client_counts = [int(count) for count in sys.argv[1:]] or [1, 10, 50, 200]
+    for max_batch, label in [(256, "group commit"), (1, "one write per commit")]:
+        print(label)
+        print(
+            f"{'clients':>8} "
+            + " ".join(
+                f"{column:>16}"
+                for column in [
+                    "checkouts/s",
+                    "lookup p50 ms",
+                    "lookup p99 ms",
+                    "checkout p50 ms",
+                    "checkout p99 ms",
+                    "writes/batch",
+                ]
+            )
+        )
+        for clients in client_counts:
+            with tempfile.TemporaryDirectory() as folder:
+                with open(os.path.join(folder, "inventory.txt"), "w") as file:
+                    for i in range(PRODUCTS):
+                        file.write(f"Product {i},{100000 + i},{i % 97 + 0.5},1000000\n")
+                process, address = start_server(folder, max_batch)
+                try:
+                    result = asyncio.run(run(address, clients))
+                finally:
+                    process.terminate()
+                    process.wait()
+            print(
+                f"{clients:>8} "
+                + " ".join(f"{value:>16.1f}" for value in result.values())
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
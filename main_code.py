@@ -5,66 +5,23 @@ Date: 12-12-2023
 """
 
 # Imports
-import os
-from datetime import datetime
-
 import customtkinter as ctk
 
-# Constants:
-INVENTORY_FILE = "inventory.txt"
-MEMBERS_FILE = "members.txt"
-
-
-class Product:
-    """
-    A class representing a product with basic information.
-
-    Attributes:
-     - name (str): The name of the product.
-     - product_id (int): The unique identifier for the product.
-     - price (float): The price of the product.
-     - quantity (int): The quantity of the product available.
-
-    Methods:
-        __init__(self, name, product_id, price, quantity):
-            Initializes a new Product instance.
-
-        __repr__(self):
-            Returns a string representation of the product.
-
-        add_quantity(self, quantity):
-            Adds the specified quantity to the product's existing quantity.
-
-        remove_quantity(self, quantity):
-            Removes the specified quantity from the product's existing quantity.
-    """
-
-    def __init__(self, name, product_id, price, quantity):
-        self.name = name
-        self.product_id = product_id
-        self.price = float(price)
-        self.quantity = int(quantity)
-
-    def __repr__(self):
-        return f"{self.name} ({self.product_id}): {self.price} kr, {self.quantity} st"
-
-    def add_quantity(self, quantity):
-        """
-        Adds the specified quantity to the product's existing quantity.
-
-        Args:
-         - quantity (int): The quantity to be added.
-        """
-        self.quantity += quantity
+from pos_core import *
+from pos_core import register
+from pos_core.browser import InventoryBrowser
+from pos_core.catalogue import error_report_path, export_catalogue, import_catalogue
+from pos_core.constants import SERVER_ADDRESS
+from pos_core.metrics import metrics
+from pos_core.tasks import TaskRunner
 
-    def remove_quantity(self, quantity):
-        """
-        Removes the specified quantity from the product's existing quantity.
+# Set POS_SERVER=host:port to sell through a register server
+if SERVER_ADDRESS:
+    register = RegisterClient(SERVER_ADDRESS)
 
-        Args:
-         - quantity (int): The quantity to be removed.
-        """
-        self.quantity -= quantity
+# Searching, browsing and catalogues read the local inventory, which the
+# register server owns in client mode
+LOCAL_ONLY = "\nNot available when selling through a register server\n"
 
 
 class Menu(ctk.CTkFrame):
@@ -81,6 +38,9 @@ class Menu(ctk.CTkFrame):
         create_layout(self):
             Sets up the layout for the menu frame.
 
+        toggle_diagnostics(self):
+            Opens or closes the hidden diagnostics panel, bound to F12.
+
         end_program(self):
             Destroys the main application window, ending the program.
     """
@@ -88,9 +48,11 @@ class Menu(ctk.CTkFrame):
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
         self.place(x=0, y=0, relwidth=0.31, relheight=1)
+        self.diagnostics = None
 
         self.create_widgets()
         self.create_layout()
+        self.master.bind("<F12>", lambda event: self.toggle_diagnostics())
 
     def create_widgets(self):
         """
@@ -201,6 +163,16 @@ class Menu(ctk.CTkFrame):
             fill="both",
         )
 
+    def toggle_diagnostics(self):
+        """
+        Opens the diagnostics panel, or closes it if it is open.
+        """
+        if self.diagnostics is not None and self.diagnostics.winfo_exists():
+            self.diagnostics.destroy()
+            self.diagnostics = None
+        else:
+            self.diagnostics = Diagnostics_panel(self.master)
+
     def end_program(self):
         """
         Destroys the main application window, ending the program.
@@ -208,36 +180,107 @@ class Menu(ctk.CTkFrame):
         self.master.destroy()
 
 
+class Diagnostics_panel(ctk.CTkToplevel):
+    """
+    A window showing the latency and I/O metrics of the register, refreshed
+    every second. Opened with F12.
+
+    Attributes:
+     - text_box (CTkTextbox): The metrics table.
+
+    Methods:
+        refresh(self):
+            Shows the current metrics and schedules the next refresh.
+    """
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.title("Diagnostics")
+        self.geometry("560x420")
+        self.text_box = ctk.CTkTextbox(self, font=("Courier", 12))
+        self.text_box.pack(fill="both", expand=True, padx=10, pady=10)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Shows the current metrics and schedules the next refresh.
+        """
+        if SERVER_ADDRESS:
+            cache = f"kept by the register server at {SERVER_ADDRESS}"
+        else:
+            cache = ", ".join(
+                f"{name} {count}" for name, count in inventory_cache.stats().items()
+            )
+        self.text_box.delete("1.0", "end")
+        self.text_box.insert(
+            "end", f"{metrics.summary()}\n\nInventory cache: {cache}\n"
+        )
+        self.refresh_id = self.after(1000, self.refresh)
+
+    def destroy(self):
+        """
+        Stops refreshing and closes the window.
+        """
+        self.after_cancel(self.refresh_id)
+        super().destroy()
+
+
 class Main(ctk.CTkFrame):
     """
     A class representing the main frame of the Cash Register application.
 
+    Frames are built the first time they are shown, so only the New Customer
+    frame is built at startup. Once it is on screen the inventory and the
+    product search index are loaded on a worker thread, ready for the first
+    scan, unless a register server keeps the inventory.
+
+    Attributes:
+    - tasks (TaskRunner): Runs the blocking operations of the frames off the
+      GUI thread.
+    - frame_classes (dict): The class of each frame, by frame name.
+    - frames (dict): The frames built so far, by frame name.
+
     Methods:
         __init__(self, master, **kwargs):
             Initializes a new Main instance.
 
         switch_frame(self, frame_name):
             Switches the current frame in the application to the specified frame.
+
+        preload(self):
+            Loads the inventory and the search index in the background.
     """
 
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
         self.place(relx=0.3, y=0, relwidth=0.7, relheight=1)
 
+        self.frame_classes = {
+            "New Customer": New_customer_frame,
+            "Return Item": Return_item_frame,
+            "Update Inventory": Update_inventory_frame,
+        }
         self.frames = {}
         self.current_frame = None
+        self.tasks = TaskRunner(self)
 
-        # Create frames
-        for frame_class in [
-            New_customer_frame,
-            Return_item_frame,
-            Update_inventory_frame,
-        ]:
-            frame_instance = frame_class(self, fg_color="#2D313C")
-            self.frames[frame_instance.frame_name] = frame_instance
-
-        # Show the initial frame
+        # Show the initial frame, then load the inventory once it is drawn
         self.switch_frame("New Customer")
+        self.after_idle(self.preload)
+
+    def preload(self):
+        """
+        Loads the inventory and builds the product search index on a worker
+        thread. Searches queue behind it instead of building the index again.
+        """
+        if SERVER_ADDRESS:
+            return
+        self.tasks.submit(
+            name_index.prepare,
+            # The frames report the error when they need the inventory
+            on_error=lambda error: None,
+            key="search",
+        )
 
     def switch_frame(self, frame_name):
         """
@@ -261,6 +304,11 @@ class Main(ctk.CTkFrame):
         if self.current_frame:
             self.current_frame.place_forget()
 
+        # Build the new frame the first time it is shown
+        if frame_name not in self.frames:
+            frame_class = self.frame_classes[frame_name]
+            self.frames[frame_name] = frame_class(self, fg_color="#2D313C")
+
         # Show the new frame
         self.frames[frame_name].place(relwidth=1, relheight=1)
         self.current_frame = self.frames[frame_name]
@@ -272,23 +320,33 @@ class New_customer_frame(ctk.CTkFrame):
 
     Attributes:
     - frame_name (str): The name of the frame.
-    - shopping_cart (dict): A dictionary representing the shopping cart.
+    - shopping_cart (ShoppingCart): The shopping cart of the customer.
+    - scanner (ScanReader): Reads the barcode scanner in scan mode.
+    - cart_view (Cart_view): Shows the lines of the shopping cart.
 
     Methods:
     - create_widgets(): Creates the widgets for the frame.
     - create_layout(): Creates the layout for the frame.
     - add_item(product_id, quantity): Adds an item to the shopping cart.
+    - add_scanned(scans): Adds a batch of scanned items to the shopping cart.
     - remove_item(product_id, quantity): Removes an item from the shopping cart.
     - checkout(): Performs the checkout process.
-    - update_text_box(text): Updates the text box with the given text.
+    - attach_member(card_number): Lets a loyalty member earn the cart's points.
+    - toggle_scan_mode(): Switches between typing and scanning product IDs.
+    - suggest(): Looks up products by the name typed in the product ID entry.
+    - update_text_box(text): Shows a message in the text box.
     """
 
+    # Number of rows in the autocomplete dropdown
+    SUGGESTIONS = 6
+
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
         self.frame_name = "New Customer"
         self.create_widgets()
         self.create_layout()
-        self.shopping_cart = {}
+        self.shopping_cart = register.ShoppingCart()
+        self.scanner = ScanReader(self, self.add_scanned)
 
     def create_widgets(self):
         """
@@ -302,15 +360,40 @@ class New_customer_frame(ctk.CTkFrame):
             height=50,
         )
 
+        # Scan mode, for keyboard-wedge barcode scanners
+        self.scan_switch = ctk.CTkSwitch(
+            master=self,
+            text="Scan mode",
+            command=self.toggle_scan_mode,
+        )
+
         # Product ID
         self.product_id_entry = ctk.CTkEntry(
-            master=self, placeholder_text="Enter Product ID"
+            master=self, placeholder_text="Enter Product ID or name"
+        )
+        self.product_id_entry.bind("<KeyRelease>", self.on_product_key)
+
+        # Autocomplete dropdown, shown under the product ID entry
+        self.suggestion_frame = ctk.CTkFrame(
+            master=self, fg_color="gray20", corner_radius=5
         )
+        self.suggestion_buttons = [
+            ctk.CTkButton(
+                master=self.suggestion_frame,
+                text="",
+                font=("Inter", 11),
+                anchor="w",
+                height=24,
+                fg_color="transparent",
+                hover_color="#465372",
+            )
+            for _ in range(self.SUGGESTIONS)
+        ]
 
-        # Quantity combo box
+        # Quantity combo box, larger quantities are typed in
         self.quantity_combo_box = ctk.CTkComboBox(
             master=self,
-            values=[str(i) for i in range(1, 101)],
+            values=[str(i) for i in range(1, 11)],
         )
 
         # Add button
@@ -347,12 +430,32 @@ class New_customer_frame(ctk.CTkFrame):
             ),
         )
 
-        self.text_box = ctk.CTkTextbox(
+        # Shopping cart, one row per line, and the running total
+        self.cart_view = Cart_view(
             self,
             corner_radius=10,
             width=400,
             height=150,
         )
+        self.total_label = ctk.CTkLabel(
+            self, text="Total: 0 kr", font=("Inter", 16, "bold")
+        )
+
+        # Loyalty member card, attached with Enter
+        self.member_entry = ctk.CTkEntry(
+            master=self, placeholder_text="Member card", width=160
+        )
+        self.member_entry.bind(
+            "<Return>", lambda event: self.attach_member(self.member_entry.get())
+        )
+
+        # Messages and the receipt after checkout
+        self.text_box = ctk.CTkTextbox(
+            self,
+            corner_radius=10,
+            width=400,
+            height=80,
+        )
 
         # Checkout button
         self.checkout_button = ctk.CTkButton(
@@ -390,6 +493,7 @@ class New_customer_frame(ctk.CTkFrame):
         self.grid_rowconfigure(5, weight=1)
 
         self.title_label.grid(row=0, column=0, columnspan=2, pady=10, sticky="n")
+        self.scan_switch.grid(row=0, column=1, padx=10, pady=10, sticky="ne")
         self.product_id_entry.grid(row=1, column=0, padx=10, pady=10, sticky="ne")
         self.quantity_combo_box.grid(row=1, column=1, padx=10, pady=10, sticky="nw")
         self.add_button.grid(
@@ -404,45 +508,77 @@ class New_customer_frame(ctk.CTkFrame):
         self.clear_shopping_cart_button.grid(
             row=4, column=0, columnspan=2, padx=10, pady=0, sticky="s"
         )
-        self.text_box.grid(row=5, columnspan=2, padx=30, pady=30, sticky="nsew")
+        self.cart_view.grid(row=5, columnspan=2, padx=30, pady=(30, 5), sticky="nsew")
+        self.member_entry.grid(row=6, column=0, padx=30, sticky="w")
+        self.total_label.grid(row=6, column=1, padx=30, sticky="e")
+        self.text_box.grid(row=7, columnspan=2, padx=30, pady=(5, 30), sticky="nsew")
 
     def add_item(self, product_id, quantity):
         """
         Adds an item to the shopping cart based on the given product ID and quantity.
 
+        The inventory lookup runs in the background and the result is shown in
+        the text box once it is done.
+
         Args:
             product_id (str): The ID of the product to be added.
             quantity (int): The quantity of the product to be added.
         """
+        self.run_in_background(self.add_item_task, product_id, quantity)
+
+    def add_item_task(self, product_id, quantity):
+        """
+        Adds an item to the shopping cart on a worker thread.
+
+        Returns:
+         - str: The message for the text box.
+        """
         try:
-            quantity = abs(int(quantity))
-        except ValueError:
-            self.update_text_box(f"\nInvalid quantity")
-            return
-        inventory = read_file(INVENTORY_FILE)
-        if product_id in inventory:
-            available_quantity = int(inventory[product_id].quantity)
-            if available_quantity < int(quantity):
-                self.update_text_box(
-                    f"\nNot enough quantity, only {available_quantity} left\n"
-                )
-            elif product_id in self.shopping_cart:
-                self.shopping_cart[product_id].add_quantity(quantity)
-                self.update_text_box(
-                    f"\n{quantity}st {self.shopping_cart[product_id].name} added to shopping cart"
+            quantity = parse_quantity(quantity)
+            in_cart = product_id in self.shopping_cart
+            line = self.shopping_cart.add_item(product_id, quantity)
+        except InvalidQuantityError:
+            return f"\nInvalid quantity"
+        except ProductNotFoundError:
+            return f"\nProduct not found\n"
+        except InsufficientStockError as error:
+            return f"\nNot enough quantity, only {error.available} left\n"
+        if in_cart:
+            return f"\n{quantity}st {line.name} added to shopping cart"
+        return f"\n{line} added to shopping cart"
+
+    def add_scanned(self, scans):
+        """
+        Adds a batch of scanned items to the shopping cart, one of each
+        product per scan, and shows the result with one text box update.
+
+        Args:
+         - scans (dict): The number of scans of each product ID.
+        """
+        self.run_in_background(self.add_scanned_task, scans, on_shown=self.scanner.done)
+
+    def add_scanned_task(self, scans):
+        """
+        Adds scanned items to the shopping cart on a worker thread.
+
+        Returns:
+         - str: The message for the text box, one line per product.
+        """
+        messages = []
+        for product_id, quantity in scans.items():
+            try:
+                line = self.shopping_cart.add_item(product_id, quantity)
+            except ProductNotFoundError:
+                messages.append(f"\nProduct {product_id} not found")
+            except InsufficientStockError as error:
+                messages.append(
+                    f"\nNot enough quantity of {product_id}, only {error.available} left"
                 )
             else:
-                self.shopping_cart[product_id] = Product(
-                    inventory[product_id].name,
-                    inventory[product_id].product_id,
-                    inventory[product_id].price,
-                    quantity,
+                messages.append(
+                    f"\n{quantity}st {line.name} scanned, {line.quantity} in cart"
                 )
-                self.update_text_box(
-                    f"\n{self.shopping_cart[product_id]} added to shopping cart"
-                )
-        else:
-            self.update_text_box(f"\nProduct not found\n")
+        return "".join(messages)
 
     def remove_item(self, product_id, quantity):
         """
@@ -452,89 +588,319 @@ class New_customer_frame(ctk.CTkFrame):
             product_id (int): The ID of the product to be removed.
             quantity (int): The quantity of the product to be removed.
         """
+        self.run_in_background(self.remove_item_task, product_id, quantity)
+
+    def remove_item_task(self, product_id, quantity):
+        """
+        Removes an item from the shopping cart on a worker thread, in order with
+        the other operations on the cart.
+
+        Returns:
+         - str: The message for the text box.
+        """
         try:
-            quantity = abs(int(quantity))
-        except ValueError:
-            self.update_text_box(f"\nInvalid quantity\n")
-            return
-        if (
-            product_id in self.shopping_cart
-            and quantity <= self.shopping_cart[product_id].quantity
-        ):
-            if quantity == self.shopping_cart[product_id].quantity:
-                self.update_text_box(
-                    f"\nRemoved {self.shopping_cart[product_id]} from shopping cart"
-                )
-                del self.shopping_cart[product_id]
-            else:
-                self.shopping_cart[product_id].remove_quantity(quantity)
-                self.update_text_box(
-                    f"\nRemoved {quantity} {self.shopping_cart[product_id].name} from shopping cart, {self.shopping_cart[product_id].quantity} remains"
-                )
-        else:
-            self.update_text_box(
-                f"\nProduct not in shopping cart or not enough quantity"
-            )
+            quantity = parse_quantity(quantity)
+            line = self.shopping_cart.remove_item(product_id, quantity)
+        except InvalidQuantityError:
+            return f"\nInvalid quantity\n"
+        except NotInCartError:
+            return f"\nProduct not in shopping cart or not enough quantity"
+        if product_id not in self.shopping_cart:
+            return f"\nRemoved {line} from shopping cart"
+        return f"\nRemoved {quantity} {line.name} from shopping cart, {line.quantity} remains"
 
     def checkout(self):
         """
         Performs the checkout process for the shopping cart.
 
-        Reads the inventory file, creates a receipt, saves the receipt, updates the text box,
-        removes the purchased products from the inventory, and saves the updated inventory file.
+        Saves the receipt, removes the purchased products from the inventory and
+        empties the shopping cart in the background, then shows the receipt in
+        the text box.
 
         If the shopping cart is empty, it updates the text box with a message indicating that
         the shopping cart is empty.
         """
-        inventory = read_file(INVENTORY_FILE)
-        if len(self.shopping_cart) > 0:
-            checkout_receipt = create_receipt(self.shopping_cart)
-            try:
-                save_receipt("purchase", checkout_receipt)
-                self.update_text_box(f"{checkout_receipt} \n\nReceipt saved!\n\n")
-            except FileNotFoundError:
-                self.update_text_box(f"\n\nReceipt not saved\n\n")
-            for product in self.shopping_cart.values():
-                inventory[product.product_id].remove_quantity(product.quantity)
-            save_file(INVENTORY_FILE, inventory)
-        else:
-            self.update_text_box(f"\n\nShopping cart is empty\n")
+        self.run_in_background(self.checkout_task)
+
+    def checkout_task(self):
+        """
+        Checks out the shopping cart on a worker thread.
+
+        Returns:
+         - str: The message for the text box.
+        """
+        member = self.shopping_cart.member
+        try:
+            checkout_receipt = self.shopping_cart.checkout()
+        except EmptyCartError:
+            return f"\n\nShopping cart is empty\n"
+        except ProductNotFoundError as error:
+            return f"\n\nProduct {error.args[0]} no longer exists\n"
+        except InsufficientStockError as error:
+            return f"\n\nNot enough quantity, only {error.available} left\n"
+        except ReceiptSaveError as error:
+            return f"\n\nThe cart was kept, {error}\n"
+        message = f"{checkout_receipt} \n\nReceipt saved!\n\n"
+        if member is not None:
+            member = member_store.find(member.card_number) or member
+            message += f"{member.name} now has {member.points} points\n"
+        return message
+
+    def attach_member(self, card_number):
+        """
+        Looks up a loyalty card in the background and lets the member earn
+        the points of the cart at checkout.
+
+        Args:
+            card_number (str): The number on the member's card.
+        """
+        self.run_in_background(self.attach_member_task, card_number)
+
+    def attach_member_task(self, card_number):
+        """
+        Attaches a member to the shopping cart on a worker thread.
+
+        Returns:
+         - str: The message for the text box.
+        """
+        try:
+            member = self.shopping_cart.attach_member(card_number)
+        except MemberNotFoundError:
+            return f"\nNo member with card {card_number}\n"
+        return f"\nMember {member.name}, {member.points} points\n"
 
     def clear_shopping_cart(self):
         """
-        Clears the shopping cart.
+        Clears the shopping cart, after any operation on it that is still running.
         """
-        self.shopping_cart.clear()
-        self.text_box.delete("1.0", "end")
+
+        def clear():
+            self.shopping_cart.clear()
+            return ""
+
+        self.run_in_background(clear)
+
+    def run_in_background(self, function, *args, on_shown=None):
+        """
+        Runs a cart operation on a worker thread, in order with the other
+        operations on the cart, then updates the changed lines of the cart
+        view and shows the message the operation returns.
+
+        Args:
+         - function (callable): The operation, returning a message.
+         - args: The arguments for the operation.
+         - on_shown (callable): Called without arguments once the result is
+           shown.
+        """
+        cart = self.shopping_cart
+
+        def task():
+            # Read the changes on the worker, in order with the cart operations
+            message = function(*args)
+            return message, cart.receipt.take_changes(), cart.total
+
+        def show(result):
+            message, changes, total = result
+            self.cart_view.update_lines(changes)
+            self.total_label.configure(text=f"Total: {total} kr")
+            self.update_text_box(message)
+            if on_shown is not None:
+                on_shown()
+
+        def show_error(error):
+            self.update_text_box(f"\nError: {error}\n")
+            if on_shown is not None:
+                on_shown()
+
+        self.master.tasks.submit(task, on_done=show, on_error=show_error, key=cart)
+
+    def toggle_scan_mode(self):
+        """
+        Switches between typing product IDs and scanning them. In scan mode
+        the keystrokes of the scanner go to the scanner reader instead of the
+        product ID entry, and every scan adds one item to the cart.
+        """
+        self.product_id_entry.delete(0, "end")
+        self.hide_suggestions()
+        if self.scan_switch.get():
+            self.product_id_entry.bind("<Key>", self.on_scan_key)
+            self.product_id_entry.focus_set()
+        else:
+            self.product_id_entry.unbind("<Key>")
+
+    def on_scan_key(self, event):
+        """
+        Passes a keystroke to the scanner reader in scan mode.
+        """
+        self.scanner.key(event.char, event.time)
+        # Keep the scanned characters out of the entry
+        return "break"
+
+    def on_product_key(self, event):
+        """
+        Updates the autocomplete dropdown as the product ID entry changes.
+        """
+        if self.scan_switch.get():
+            return
+        if event.keysym in ("Escape", "Return"):
+            self.hide_suggestions()
+        else:
+            self.suggest()
+
+    def suggest(self):
+        """
+        Looks up the products whose name or ID starts like the text typed in
+        the product ID entry and lists them in the dropdown.
+        """
+        query = self.product_id_entry.get()
+        if SERVER_ADDRESS or not query.strip():
+            self.hide_suggestions()
+            return
+        self.master.tasks.submit(
+            name_index.search,
+            query,
+            self.SUGGESTIONS,
+            on_done=lambda results: self.show_suggestions(query, results),
+            on_error=lambda error: self.hide_suggestions(),
+            key="search",
+        )
+
+    def show_suggestions(self, query, results):
+        """
+        Fills the dropdown with search results.
+
+        Args:
+         - query (str): The text the results were found for.
+         - results (list): (product_id, name) tuples.
+        """
+        if query != self.product_id_entry.get():
+            # The cashier kept typing; a newer search is on its way
+            return
+        if not results:
+            self.hide_suggestions()
+            return
+        for button, (product_id, name) in zip(self.suggestion_buttons, results):
+            button.configure(
+                text=f"{name} ({product_id})",
+                command=lambda product_id=product_id: self.pick_suggestion(product_id),
+            )
+            button.pack(fill="x", padx=2, pady=1)
+        for button in self.suggestion_buttons[len(results) :]:
+            button.pack_forget()
+        self.suggestion_frame.place(
+            in_=self.product_id_entry, relx=0, rely=1, relwidth=1.5
+        )
+        self.suggestion_frame.lift()
+
+    def pick_suggestion(self, product_id):
+        """
+        Puts the chosen product's ID in the product ID entry.
+
+        Args:
+         - product_id (str): The ID of the chosen product.
+        """
+        self.product_id_entry.delete(0, "end")
+        self.product_id_entry.insert(0, product_id)
+        self.hide_suggestions()
+
+    def hide_suggestions(self):
+        """
+        Hides the autocomplete dropdown.
+        """
+        self.suggestion_frame.place_forget()
 
     def update_text_box(self, text):
         """
-        Updates the text box with the given text.
+        Shows a message in the text box, replacing the previous one. The cart
+        itself is shown by the cart view.
 
         Args:
-        - text (str): The text to be inserted into the text box.
+        - text (str): The message to show.
         """
-        self.text_box.insert("end", text)
+        self.text_box.delete("1.0", "end")
+        self.text_box.insert("end", text.strip("\n"))
+
+
+class Cart_view(ctk.CTkScrollableFrame):
+    """
+    A live view of the shopping cart with one row per cart line.
+
+    A row is created when a product is added to the cart, updated in place
+    when its quantity changes and destroyed when it is removed, so changing
+    one line costs the same however long the cart is.
+
+    Attributes:
+    - rows (dict): The line and price labels of every cart line, keyed by
+      product ID, and of every discount, keyed by ("discount", promotion ID).
+
+    Methods:
+    - update_lines(changes): Updates the rows of changed cart lines.
+    """
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.grid_columnconfigure(0, weight=1)
+        self.rows = {}
+        self.next_row = 0
+
+    def update_lines(self, changes):
+        """
+        Updates the rows of changed cart lines.
+
+        Args:
+        - changes (dict): The receipt line and rounded price of every changed
+          cart line or discount, or None for a removed one, as returned by
+          ReceiptBuilder.take_changes().
+        """
+        for key, line in changes.items():
+            row = self.rows.get(key)
+            if line is None:
+                if row is not None:
+                    for label in self.rows.pop(key):
+                        label.destroy()
+                continue
+            text, price = line
+            if row is None:
+                # New lines go last, like on the receipt
+                row = (
+                    ctk.CTkLabel(self, anchor="w", font=("Inter", 12)),
+                    ctk.CTkLabel(self, anchor="e", font=("Inter", 12)),
+                )
+                row[0].grid(row=self.next_row, column=0, padx=5, sticky="ew")
+                row[1].grid(row=self.next_row, column=1, padx=5, sticky="e")
+                self.next_row += 1
+                self.rows[key] = row
+            row[0].configure(text=text.rstrip("\n"))
+            row[1].configure(text=f"{price} kr")
 
 
 class Return_item_frame(ctk.CTkFrame):
     """
-    A class representing the frame for returning an item.
+    A class representing the frame for returning items from a purchase.
+
+    A return starts from the number on the purchase receipt. The items are
+    checked against the purchase as they are added, and the return is
+    forgotten once its receipt is saved.
 
     Attributes:
         frame_name (str): The name of the frame.
+        session (ReturnSession): The return in progress, or None.
 
     Methods:
         __init__(self, master, **kwargs): Initializes the Return_item_frame.
         create_widgets(self): Creates the widgets for the frame.
         create_layout(self): Creates the layout for the frame.
-        return_item(self, product_id, quantity, shopping_cart={}): Returns an item.
+        start_return(self, receipt_number): Opens a purchase to return items from.
+        add_item(self, product_id, quantity): Adds an item to the return.
+        confirm_return(self): Saves the return receipt, taking the points of
+            the items back from the member who bought them.
         update_text_box(self, text): Updates the text box with the given text.
     """
 
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
         self.frame_name = "Return Item"
+        self.session = None
         self.create_widgets()
         self.create_layout()
 
@@ -545,6 +911,19 @@ class Return_item_frame(ctk.CTkFrame):
         self.title_label = ctk.CTkLabel(
             self, text="Return Item", font=("Inter", 24, "bold")
         )
+        self.receipt_entry = ctk.CTkEntry(
+            master=self, placeholder_text="Enter Receipt number"
+        )
+        self.open_receipt_button = ctk.CTkButton(
+            master=self,
+            text="Open receipt",
+            font=("Inter", 14),
+            border_width=2,
+            border_color="#465372",
+            hover_color="#465372",
+            fg_color="transparent",
+            command=lambda: self.start_return(self.receipt_entry.get()),
+        )
         self.product_id_entry = ctk.CTkEntry(
             master=self, placeholder_text="Enter Product ID"
         )
@@ -552,9 +931,21 @@ class Return_item_frame(ctk.CTkFrame):
             master=self,
             values=[str(i) for i in range(1, 11)],
         )
+        self.add_item_button = ctk.CTkButton(
+            master=self,
+            text="Add to return",
+            font=("Inter", 14),
+            border_width=2,
+            border_color="#465372",
+            hover_color="#465372",
+            fg_color="transparent",
+            command=lambda: self.add_item(
+                self.product_id_entry.get(), self.quantity_combo_box.get()
+            ),
+        )
         self.confirm_button = ctk.CTkButton(
             master=self,
-            text="Confirm",
+            text="Confirm return",
             font=("Inter", 18),
             width=250,
             height=60,
@@ -563,9 +954,7 @@ class Return_item_frame(ctk.CTkFrame):
             hover_color="#5988F4",
             corner_radius=10,
             fg_color="transparent",
-            command=lambda: self.return_item(
-                self.product_id_entry.get(), self.quantity_combo_box.get()
-            ),
+            command=lambda: self.confirm_return(),
         )
         self.clear_text_box_button = ctk.CTkButton(
             master=self,
@@ -586,47 +975,118 @@ class Return_item_frame(ctk.CTkFrame):
         Creates the layout for the Return Item interface.
         """
         self.grid_columnconfigure((0, 1), weight=1)
-        self.grid_rowconfigure(4, weight=1)
+        self.grid_rowconfigure(6, weight=1)
 
         self.title_label.grid(row=0, column=0, columnspan=2, pady=10, sticky="n")
-        self.product_id_entry.grid(row=1, column=0, padx=10, pady=10, sticky="ne")
-        self.quantity_combo_box.grid(row=1, column=1, padx=10, pady=10, sticky="nw")
+        self.receipt_entry.grid(row=1, column=0, padx=10, pady=10, sticky="ne")
+        self.open_receipt_button.grid(row=1, column=1, padx=10, pady=10, sticky="nw")
+        self.product_id_entry.grid(row=2, column=0, padx=10, pady=10, sticky="ne")
+        self.quantity_combo_box.grid(row=2, column=1, padx=10, pady=10, sticky="nw")
+        self.add_item_button.grid(row=3, column=0, columnspan=2, padx=10, pady=0)
         self.confirm_button.grid(
-            row=2, column=0, columnspan=2, padx=40, pady=20, sticky="nswe"
+            row=4, column=0, columnspan=2, padx=40, pady=20, sticky="nswe"
         )
         self.clear_text_box_button.grid(
-            row=3, column=0, columnspan=2, padx=10, pady=0, sticky="s"
+            row=5, column=0, columnspan=2, padx=10, pady=0, sticky="s"
+        )
+        self.text_box.grid(row=6, columnspan=2, padx=30, pady=30, sticky="nsew")
+
+    def start_return(self, receipt_number):
+        """
+        Opens a purchase to return items from, dropping any return that was
+        not confirmed.
+
+        Args:
+            receipt_number (str): The number on the purchase receipt.
+        """
+        self.master.tasks.submit(
+            register.ReturnSession,
+            receipt_number.strip(),
+            on_done=self.show_purchase,
+            on_error=self.show_error,
+            key=self.frame_name,
         )
-        self.text_box.grid(row=4, columnspan=2, padx=30, pady=30, sticky="nsew")
 
-    def return_item(self, product_id, quantity, shopping_cart={}):
+    def show_purchase(self, session):
+        """
+        Keeps the opened return and lists what can be returned.
+
+        Args:
+            session (ReturnSession): The new return.
+        """
+        self.session = session
+        lines = [f"\nReceipt {session.purchase.number}:\n"]
+        for product_id, item in session.purchase.items.items():
+            lines.append(
+                f"{item.name} ({product_id}): {item.price} kr, bought {item.quantity},"
+                f" returnable {session.returnable(product_id)}\n"
+            )
+        self.update_text_box("".join(lines))
+
+    def add_item(self, product_id, quantity):
         """
-        Returns an item based on the given product ID and quantity.
+        Adds an item to the return in progress.
 
         Args:
             product_id (str): The ID of the product to be returned.
             quantity (str): The quantity of the product to be returned.
-            shopping_cart (dict): The shopping cart dictionary.
         """
-        inventory = read_file(INVENTORY_FILE)
-        if product_id in inventory:
-            try:
-                inventory[product_id].add_quantity(int(quantity))
-                shopping_cart[product_id] = Product(
-                    inventory[product_id].name,
-                    inventory[product_id].product_id,
-                    inventory[product_id].price,
-                    quantity,
-                )
-                return_receipt = create_receipt(shopping_cart, return_receipt=True)
-                save_receipt("return", return_receipt)
-                save_file(INVENTORY_FILE, inventory)
-                self.update_text_box(f"{return_receipt} \n\nReceipt saved!\n")
-            except ValueError:
-                self.update_text_box(f"\nInvalid quantity\n")
+        if self.session is None:
+            self.update_text_box("\nOpen a receipt first\n")
+            return
+        try:
+            line = self.session.add_item(product_id.strip(), quantity)
+        except RegisterError as error:
+            self.show_error(error)
+            return
+        self.update_text_box(
+            f"Returning {line.name} ({line.product_id}), {line.quantity} st:"
+            f" {self.session.receipt.total} kr in total\n"
+        )
+
+    def confirm_return(self):
+        """
+        Saves the return receipt on a worker thread and closes the return.
+        """
+        if self.session is None or not self.session.items:
+            self.update_text_box("\nNothing to return\n")
+            return
+        session, self.session = self.session, None
+
+        def failed(error):
+            # The items stay in the session when the receipt isn't saved
+            if isinstance(error, ReceiptSaveError) and self.session is None:
+                self.session = session
+            self.show_error(error)
+
+        self.master.tasks.submit(
+            session.finish,
+            on_done=lambda receipt: self.update_text_box(
+                f"{receipt} \n\nReceipt saved!\n"
+            ),
+            on_error=failed,
+            key=self.frame_name,
+        )
+
+    def show_error(self, error):
+        """
+        Shows why a return step failed.
+
+        Args:
+            error (Exception): The error.
+        """
+        if isinstance(error, ReceiptNotFoundError):
+            self.update_text_box("\nReceipt not found\n")
+        elif isinstance(error, NotReturnableError):
+            self.update_text_box(
+                f"\nOnly {error.returnable} of {error.product_id} can be returned\n"
+            )
+        elif isinstance(error, ProductNotFoundError):
+            self.update_text_box("\nProduct not found\n")
+        elif isinstance(error, InvalidQuantityError):
+            self.update_text_box("\nInvalid quantity\n")
         else:
-            self.update_text_box(f"\nProduct not found\n")
-        return
+            self.update_text_box(f"\nError: {error}\n")
 
     def update_text_box(self, text):
         """
@@ -650,31 +1110,31 @@ class Update_inventory_frame(ctk.CTkFrame):
 
     Attributes:
     - frame_name: The name of the frame.
+    - browser (InventoryBrowser): The sorted and filtered inventory pages, or
+      None when selling through a register server.
+    - page_number (int): The inventory page shown in the text box.
+    - filter_job: The pending after() call applying the filter, if any.
 
     Methods:
     - __init__(self, master, **kwargs): Initializes the Update_inventory_frame.
     - create_widgets(self): Creates the widgets for the frame.
     - create_layout(self): Creates the layout for the frame.
-    - view_inventory(self): Displays the inventory in the text box.
+    - view_inventory(self): Displays the first inventory page in the text box.
+    - show_page(self, number): Displays an inventory page in the text box.
     - add_product(self, name, product_id, price, quantity): Adds a product to the inventory.
     - update_product(self, product_id, price, quantity): Updates a product in the inventory.
     - delete_product(self, product_id): Deletes a product from the inventory.
+    - import_from_file(self): Imports a supplier catalogue CSV.
+    - export_to_file(self): Exports the inventory as a catalogue CSV.
     - update_text_box(self, text): Updates the text box with the given text.
     """
 
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
         self.frame_name = "Update Inventory"
-        self.create_widgets()
-        self.create_layout()
-
-    # Rest of the code...
-
-
-class Update_inventory_frame(ctk.CTkFrame):
-    def __init__(self, master, **kwargs):
-        super().__init__(master, **kwargs)
-        self.frame_name = "Update Inventory"
+        self.browser = None if SERVER_ADDRESS else InventoryBrowser()
+        self.page_number = 0
+        self.filter_job = None
         self.create_widgets()
         self.create_layout()
 
@@ -700,10 +1160,14 @@ class Update_inventory_frame(ctk.CTkFrame):
         self.tab_view.add("Add Product")
         self.tab_view.add("Update Product")
         self.tab_view.add("Delete Product")
+        self.tab_view.add("Browse")
+        self.tab_view.add("Catalogue")
 
         self.add_product_tab = self.tab_view.tab("Add Product")
         self.update_product_tab = self.tab_view.tab("Update Product")
         self.delete_product_tab = self.tab_view.tab("Delete Product")
+        self.browse_tab = self.tab_view.tab("Browse")
+        self.catalogue_tab = self.tab_view.tab("Catalogue")
 
         # Buttons in Add Product tab
         self.add_product_tab.name_entry = ctk.CTkEntry(
@@ -797,6 +1261,79 @@ class Update_inventory_frame(ctk.CTkFrame):
             ),
         )
 
+        # Widgets in Browse tab
+        self.browse_tab.filter_entry = ctk.CTkEntry(
+            master=self.browse_tab,
+            placeholder_text="Filter by name or ID",
+        )
+        self.browse_tab.filter_entry.bind(
+            "<KeyRelease>", lambda event: self.schedule_filter()
+        )
+        self.browse_tab.sort_menu = ctk.CTkOptionMenu(
+            master=self.browse_tab,
+            values=["Name", "ID", "Price", "Stock"],
+            fg_color="gray25",
+            button_color="#465372",
+            command=lambda value: self.show_page(0),
+        )
+        self.browse_tab.descending_switch = ctk.CTkSwitch(
+            master=self.browse_tab,
+            text="Descending",
+            command=lambda: self.show_page(0),
+        )
+        self.browse_tab.previous_button = ctk.CTkButton(
+            master=self.browse_tab,
+            text="<",
+            width=40,
+            fg_color="transparent",
+            border_width=2,
+            border_color="#465372",
+            hover_color="#465372",
+            command=lambda: self.show_page(self.page_number - 1),
+        )
+        self.browse_tab.page_label = ctk.CTkLabel(
+            master=self.browse_tab,
+            text="",
+        )
+        self.browse_tab.next_button = ctk.CTkButton(
+            master=self.browse_tab,
+            text=">",
+            width=40,
+            fg_color="transparent",
+            border_width=2,
+            border_color="#465372",
+            hover_color="#465372",
+            command=lambda: self.show_page(self.page_number + 1),
+        )
+
+        # Buttons in Catalogue tab
+        self.catalogue_tab.import_button = ctk.CTkButton(
+            master=self.catalogue_tab,
+            text="Import CSV",
+            font=("Inter", 18),
+            fg_color="transparent",
+            width=180,
+            height=60,
+            border_width=2,
+            border_color="#5988F4",
+            hover_color="#5988F4",
+            corner_radius=10,
+            command=lambda: self.import_from_file(),
+        )
+        self.catalogue_tab.export_button = ctk.CTkButton(
+            master=self.catalogue_tab,
+            text="Export CSV",
+            font=("Inter", 18),
+            fg_color="transparent",
+            width=180,
+            height=60,
+            border_width=2,
+            border_color="#465372",
+            hover_color="#465372",
+            corner_radius=10,
+            command=lambda: self.export_to_file(),
+        )
+
         # Text box
         self.text_box = ctk.CTkTextbox(
             self,
@@ -878,6 +1415,20 @@ class Update_inventory_frame(ctk.CTkFrame):
         self.delete_product_tab.product_id_entry.pack(padx=10, pady=10)
         self.delete_product_tab.confirm_button.pack(padx=40, pady=10, fill="both")
 
+        # Browse tab
+        self.browse_tab.filter_entry.grid(
+            row=0, column=0, columnspan=2, padx=10, pady=10, sticky="ew"
+        )
+        self.browse_tab.sort_menu.grid(row=0, column=2, padx=10, pady=10)
+        self.browse_tab.descending_switch.grid(row=0, column=3, padx=10, pady=10)
+        self.browse_tab.previous_button.grid(row=1, column=0, padx=10, sticky="e")
+        self.browse_tab.page_label.grid(row=1, column=1, columnspan=2)
+        self.browse_tab.next_button.grid(row=1, column=3, padx=10, sticky="w")
+
+        # Catalogue tab
+        self.catalogue_tab.import_button.grid(row=0, column=0, padx=10, pady=10)
+        self.catalogue_tab.export_button.grid(row=0, column=1, padx=10, pady=10)
+
         # textbox and view inventory button
         self.view_inventory_button.grid(row=2, column=0, padx=10, pady=0, sticky="se")
         self.clear_text_box_button.grid(row=2, column=1, padx=10, pady=0, sticky="sw")
@@ -889,12 +1440,77 @@ class Update_inventory_frame(ctk.CTkFrame):
         """
         Displays the inventory of the cash register.
 
-        Reads the inventory from a file and displays it in the text box.
+        Shows the first page of the inventory, sorted and filtered as set in
+        the Browse tab, in the text box.
+        """
+        self.show_page(0)
+
+    def show_page(self, number):
+        """
+        Displays a page of the inventory in the text box.
+
+        The page is sorted and filtered on a worker thread and only its rows
+        are inserted, however large the inventory is.
+
+        Args:
+         - number (int): The page number, from 0.
+        """
+        if self.browser is None:
+            self.update_text_box(LOCAL_ONLY)
+            return
+        self.master.tasks.submit(
+            self.page_task,
+            number,
+            self.browse_tab.filter_entry.get(),
+            self.browse_tab.sort_menu.get().lower(),
+            bool(self.browse_tab.descending_switch.get()),
+            on_done=self.render_page,
+            on_error=lambda error: self.update_text_box(f"\nError: {error}\n"),
+            key=self.frame_name,
+        )
+
+    def page_task(self, number, query, sort_key, descending):
+        """
+        Sorts and filters the inventory and formats a page on a worker thread.
+
+        Returns:
+         - tuple: The page number shown, the number of pages and the text.
+        """
+        self.browser.set_filter(query)
+        self.browser.set_sort(sort_key, descending)
+        page_count = self.browser.page_count()
+        number = min(max(number, 0), page_count - 1)
+        return (
+            number,
+            page_count,
+            f"\nInventory ({len(self.browser)} products):\n"
+            + "".join(f"{product} \n\n" for product in self.browser.page(number)),
+        )
+
+    def render_page(self, page):
+        """
+        Replaces the text box contents with a page of the inventory.
+
+        Args:
+         - page (tuple): The result of page_task.
+        """
+        self.page_number, page_count, text = page
+        self.text_box.delete("1.0", "end")
+        self.text_box.insert("end", text)
+        self.browse_tab.page_label.configure(
+            text=f"Page {self.page_number + 1} of {page_count}"
+        )
+
+    def schedule_filter(self):
         """
-        inventory = read_file(INVENTORY_FILE)
-        self.update_text_box(f"\nInventory:\n")
-        for product in inventory:
-            self.update_text_box(f"{inventory[product]} \n\n")
+        Shows the first matching page once the cashier stops typing for a
+        moment, instead of filtering on every key press.
+        """
+        if self.browser is None:
+            return
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+        self.filter_job = self.after(200, lambda: self.show_page(0))
 
     def add_product(self, name, product_id, price, quantity):
         """
@@ -906,16 +1522,20 @@ class Update_inventory_frame(ctk.CTkFrame):
          - price (float): The price of the product.
          - quantity (int): The quantity of the product.
         """
-        inventory = read_file(INVENTORY_FILE)
+        self.run_in_background(self.add_product_task, name, product_id, price, quantity)
+
+    def add_product_task(self, name, product_id, price, quantity):
+        """
+        Adds a product to the inventory on a worker thread.
+
+        Returns:
+         - str: The message for the text box.
+        """
         try:
-            price = abs(float(price))
-            quantity = abs(int(quantity))
-            inventory[product_id] = Product(name, product_id, price, quantity)
-            self.update_text_box(f"\n{inventory[product_id]} \n\nInventory updated!")
-            save_file(INVENTORY_FILE, inventory)
+            product = register.add_product(name, product_id, price, quantity)
         except ValueError:
-            self.update_text_box(f"\nInvalid value, please enter a number")
-            pass
+            return f"\nInvalid value, please enter a number"
+        return f"\n{product} \n\nInventory updated!"
 
     def update_product(self, product_id, price, quantity):
         """
@@ -926,22 +1546,22 @@ class Update_inventory_frame(ctk.CTkFrame):
          - price (float): The new price of the product.
          - quantity (int): The new quantity of the product.
         """
-        inventory = read_file(INVENTORY_FILE)
-        if product_id in inventory:
-            try:
-                name = inventory[product_id].name
-                price = abs(float(price))
-                quantity = abs(int(quantity))
-                inventory[product_id] = Product(name, product_id, price, quantity)
-                self.update_text_box(
-                    f"\n{inventory[product_id]} \n\nInventory updated!"
-                )
-                save_file(INVENTORY_FILE, inventory)
-            except ValueError:
-                self.update_text_box(f"\nInvalid value, please enter a number")
-        else:
-            self.update_text_box(f"\nProduct not found")
-            pass
+        self.run_in_background(self.update_product_task, product_id, price, quantity)
+
+    def update_product_task(self, product_id, price, quantity):
+        """
+        Updates a product in the inventory on a worker thread.
+
+        Returns:
+         - str: The message for the text box.
+        """
+        try:
+            product = register.update_product(product_id, price, quantity)
+        except ProductNotFoundError:
+            return f"\nProduct not found"
+        except ValueError:
+            return f"\nInvalid value, please enter a number"
+        return f"\n{product} \n\nInventory updated!"
 
     def delete_product(self, product_id):
         """
@@ -950,113 +1570,113 @@ class Update_inventory_frame(ctk.CTkFrame):
         Args:
             product_id (int): The ID of the product to be deleted.
         """
-        inventory = read_file(INVENTORY_FILE)
-        if product_id in inventory:
-            self.update_text_box(
-                f"\n{inventory[product_id]} deleted! \n\nInventory updated!"
-            )
-            del inventory[product_id]
-            save_file(INVENTORY_FILE, inventory)
-        else:
-            self.update_text_box(f"\nProduct not found")
-        pass
+        self.run_in_background(self.delete_product_task, product_id)
 
-    def update_text_box(self, text):
+    def delete_product_task(self, product_id):
         """
-        Updates the text box with the given text.
+        Deletes a product from the inventory on a worker thread.
 
-        Args:
-         - text (str): The text to be inserted into the text box.
+        Returns:
+         - str: The message for the text box.
         """
-        self.text_box.insert("end", text)
+        try:
+            product = register.delete_product(product_id)
+        except ProductNotFoundError:
+            return f"\nProduct not found"
+        return f"\n{product} deleted! \n\nInventory updated!"
 
-    def clear_text_box(self):
+    def import_from_file(self):
         """
-        Clears the text box.
+        Asks for a supplier catalogue CSV and imports it in the background.
+        Rejected rows are written to an error report next to the catalogue.
         """
-        self.text_box.delete("1.0", "end")
-
-
-def read_file(filename):
-    """
-    Reads data from a file and returns a dictionary.
-
-    Args:
-     - filename (str): The name of the file to read.
-     - entity_class (class): The class of the entity to create.
-
-    Returns:
-     - dict: A dictionary containing entity instances.
-    """
-    data = {}
-    try:
-        with open(filename, "r") as file:
-            for line in file:
-                attributes = line.strip().split(",")
-                product_id = attributes[1]  # Assuming the ID is at index 1
-                data[product_id] = Product(*attributes)
-    except FileNotFoundError:
-        print(f"\nFile {filename} not found\nProgram stopped!\n")
-        exit()
-
-    return data
+        if SERVER_ADDRESS:
+            self.update_text_box(LOCAL_ONLY)
+            return
+        path = ctk.filedialog.askopenfilename(
+            title="Import catalogue",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        self.update_text_box(f"\nImporting {path}...")
+        self.run_in_background(self.import_task, path)
 
+    def import_task(self, path):
+        """
+        Imports a catalogue on a worker thread.
 
-def save_file(filename, dictionary):
-    """
-    Saves data to a file.
+        Returns:
+         - str: The message for the text box.
+        """
+        report_path = error_report_path(path)
+        report = import_catalogue(path, report_path)
+        message = (
+            f"\nImported {report.imported} of {report.rows} rows,"
+            f" {report.added} new products"
+        )
+        if report.rejected:
+            message += f"\nRejected {report.rejected} rows, see {report_path}"
+            message += "".join(
+                f"\n  line {line}: {reason}" for line, reason in report.errors
+            )
+        return message + "\n\nInventory updated!"
 
-    Args:
-     - filename (str): The name of the file to save.
-     - dictionary (dict): A dictionary containing entity instances.
-    """
-    with open(filename, "w") as file:
-        for item in dictionary.values():
-            file.write(f"{item.name},{item.product_id},{item.price},{item.quantity}\n")
+    def export_to_file(self):
+        """
+        Asks where to save the inventory as a catalogue CSV and writes it in
+        the background.
+        """
+        if SERVER_ADDRESS:
+            self.update_text_box(LOCAL_ONLY)
+            return
+        path = ctk.filedialog.asksaveasfilename(
+            title="Export catalogue",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv")],
+        )
+        if not path:
+            return
+        self.run_in_background(self.export_task, path)
 
+    def export_task(self, path):
+        """
+        Exports the inventory on a worker thread.
 
-def create_receipt(shopping_cart, return_receipt=False):
-    """
-    Creates a receipt for the items in the shopping cart.
+        Returns:
+         - str: The message for the text box.
+        """
+        count = export_catalogue(path)
+        return f"\nExported {count} products to {path}"
 
-    Args:
-     - shopping_cart (dict): A dictionary representing the shopping cart.
-     - return_receipt (bool): If True, indicates a return receipt.
+    def run_in_background(self, function, *args):
+        """
+        Runs an inventory operation on a worker thread, in order with the other
+        inventory edits, and shows the message it returns.
 
-    Returns:
-     - str: The receipt as a string.
-    """
-    total_price = 0
-    receipt = "\n\nReceipt\n-------\nItems:\n"
-    for item in shopping_cart.values():
-        receipt += (
-            f"{item.name} ({item.product_id}): {item.price} kr, {item.quantity} st\n"
+        Args:
+         - function (callable): The operation, returning a message.
+         - args: The arguments for the operation.
+        """
+        self.master.tasks.submit(
+            function,
+            *args,
+            on_done=self.update_text_box,
+            on_error=lambda error: self.update_text_box(f"\nError: {error}\n"),
+            key=self.frame_name,
         )
-        total_price += round(item.price * item.quantity)
-    if return_receipt:
-        receipt += f"Money returned: {total_price} kr"
-    else:
-        receipt += f"Total price: {total_price} kr"
-    return receipt
 
+    def update_text_box(self, text):
+        """
+        Updates the text box with the given text.
 
-def save_receipt(filename, receipt):
-    """
-    Save the receipt to a file with the given filename.
+        Args:
+         - text (str): The text to be inserted into the text box.
+        """
+        self.text_box.insert("end", text)
 
-    Args:
-     - filename (str): The name of the file to save the receipt to.
-     - receipt (str): The content of the receipt to be saved.
-    """
-    folder = "receipts"
-    if not os.path.exists(folder):
-        os.makedirs(folder)
-
-    current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename_with_datetime = f"{filename}_{current_datetime}.txt"
-    try:
-        with open(os.path.join(folder, filename_with_datetime), "w") as file:
-            file.write(receipt)
-    except Exception as e:
-        print(f"\nError: {e}\nReceipt not saved\n")
-        exit()
+    def clear_text_box(self):
+        """
+        Clears the text box.
+        """
+        self.text_box.delete("1.0", "end")
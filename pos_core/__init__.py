@@ -0,0 +1,60 @@
+"""
+Usage: headless POS core, import this instead of main_code to work without a GUI
+"""
+
+from pos_core.binary_snapshot import BinarySnapshot
+from pos_core.browser import InventoryBrowser
+from pos_core.client import RegisterClient, RemoteCart
+from pos_core.constants import INVENTORY_FILE, MEMBERS_FILE
+from pos_core.errors import (
+    EmptyCartError,
+    InsufficientStockError,
+    InvalidQuantityError,
+    MemberNotFoundError,
+    NotInCartError,
+    NotReturnableError,
+    ProductNotFoundError,
+    ReceiptNotFoundError,
+    ReceiptSaveError,
+    RegisterError,
+    RemoteError,
+)
+from pos_core.inventory import InventoryCache, inventory_cache
+from pos_core.members import Member, MemberStore, member_store
+from pos_core.metrics import Metrics, metrics
+from pos_core.products import Product
+from pos_core.receipt_index import ReceiptIndex, parse_receipt, receipt_index
+from pos_core.receipts import (
+    ReceiptBuilder,
+    ReceiptJournal,
+    create_receipt,
+    receipt_journal,
+    save_receipt,
+    save_receipts,
+)
+from pos_core.register import (
+    CheckoutResult,
+    Purchase,
+    ReturnSession,
+    ShoppingCart,
+    add_product,
+    checkout_many,
+    delete_product,
+    list_products,
+    parse_quantity,
+    purchase_of,
+    return_receipt,
+    update_product,
+)
+from pos_core.scanner import ScanReader
+from pos_core.search import NameIndex, name_index
+from pos_core.storage import (
+    InventoryStorage,
+    SQLiteStorage,
+    TextStorage,
+    compact_file,
+    migrate_inventory,
+    open_storage,
+    read_file,
+    save_file,
+)
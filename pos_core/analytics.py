@@ -0,0 +1,356 @@
+"""
+Usage: python -m pos_core.analytics [--index receipts/index.db] [--top 10] [--days 14]
+
+Sales reports over the receipt history, computed with NumPy. Requires numpy,
+which the rest of pos_core does not need.
+"""
+
+# Imports
+import argparse
+from datetime import datetime, timezone
+from itertools import chain, islice
+
+import numpy as np
+
+from pos_core.constants import ANALYTICS_CHUNK_ROWS
+from pos_core.receipt_index import ReceiptIndex, receipt_index
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+# A row of receipt_items as read from the index
+ITEM_ROW = np.dtype(
+    [
+        ("product_id", object),
+        ("quantity", np.int64),
+        ("price", np.float64),
+        ("timestamp", np.float64),
+        ("receipt_id", np.int64),
+    ]
+)
+
+
+def utc_offset(timestamp):
+    """
+    Returns the local UTC offset in force at a POSIX timestamp, in seconds.
+    """
+    moment = datetime.fromtimestamp(timestamp, timezone.utc).astimezone()
+    return moment.utcoffset().total_seconds()
+
+
+def local_timestamps(timestamp):
+    """
+    Converts POSIX timestamps to local POSIX seconds, each with the UTC offset
+    in force at its own time, so hours and days stay right across daylight
+    saving time changes.
+
+    The offset is looked up once per hour of the range, and item by item
+    only in the hours it changes in.
+
+    Args:
+     - timestamp (ndarray): The POSIX timestamps.
+
+    Returns:
+     - ndarray: The local timestamps.
+    """
+    if len(timestamp) == 0:
+        return timestamp
+    hour = (timestamp // SECONDS_PER_HOUR).astype(np.int64)
+    first = hour.min()
+    hour -= first
+    offsets = np.array(
+        [
+            utc_offset(float(start))
+            for start in range(
+                first * SECONDS_PER_HOUR,
+                (first + hour.max() + 2) * SECONDS_PER_HOUR,
+                SECONDS_PER_HOUR,
+            )
+        ]
+    )
+    local = timestamp + offsets[hour]
+    changing = np.isin(hour, np.flatnonzero(offsets[1:] != offsets[:-1]))
+    local[changing] = [moment + utc_offset(moment) for moment in timestamp[changing]]
+    return local
+
+
+class SalesHistory:
+    """
+    Every purchased and returned item as parallel NumPy columns.
+
+    Product IDs are stored as integer codes into product_ids, so all group-by
+    aggregates are np.bincount calls over the columns.
+
+    Attributes:
+     - product_ids (ndarray): The product ID of every code.
+     - product (ndarray): The product code of every item.
+     - quantity (ndarray): The quantity of every item.
+     - price (ndarray): The unit price of every item.
+     - timestamp (ndarray): When every item was sold or returned, in local
+       POSIX seconds.
+     - is_return (ndarray): True for items on return receipts.
+
+    Methods:
+        from_index(cls, index=receipt_index):
+            Loads the history from the receipt index.
+
+        per_product(self):
+            Returns sold, returned and net volume and revenue per product.
+
+        per_period(self, seconds):
+            Returns net volume and revenue per period of the given length.
+
+        hour_of_day(self):
+            Returns net volume and revenue per hour of the day.
+
+        top_sellers(self, count=10, by="revenue"):
+            Returns the best selling products.
+    """
+
+    def __init__(self, product_ids, product, quantity, price, timestamp, is_return):
+        self.product_ids = np.asarray(product_ids)
+        self.product = np.asarray(product, dtype=np.int64)
+        self.quantity = np.asarray(quantity, dtype=np.int64)
+        self.price = np.asarray(price, dtype=np.float64)
+        self.timestamp = np.asarray(timestamp, dtype=np.float64)
+        self.is_return = np.asarray(is_return, dtype=bool)
+
+    def __len__(self):
+        return len(self.product)
+
+    @classmethod
+    def from_index(cls, index=receipt_index):
+        """
+        Loads the history from the receipt index.
+
+        The items are read ANALYTICS_CHUNK_ROWS rows at a time straight into
+        preallocated columns, so no Python object is kept per item.
+
+        Args:
+         - index (ReceiptIndex): The index to load.
+
+        Returns:
+         - SalesHistory: The items of every indexed receipt.
+        """
+        with index.lock:
+            connection = index.connection
+            # One read transaction, so the queries see the same receipts
+            connection.execute("BEGIN")
+            try:
+                product_ids = [
+                    product_id
+                    for (product_id,) in connection.execute(
+                        "SELECT DISTINCT product_id FROM receipt_items"
+                    )
+                ]
+                codes = {
+                    product_id: code for code, product_id in enumerate(product_ids)
+                }
+                (count,) = connection.execute(
+                    "SELECT COUNT(*) FROM receipt_items"
+                ).fetchone()
+                (last_receipt,) = connection.execute(
+                    "SELECT COALESCE(MAX(receipt_id), 0) FROM receipts"
+                ).fetchone()
+                is_return_receipt = np.zeros(last_receipt + 1, dtype=bool)
+                is_return_receipt[
+                    np.fromiter(
+                        chain.from_iterable(
+                            connection.execute(
+                                "SELECT receipt_id FROM receipts WHERE kind = 'return'"
+                            )
+                        ),
+                        dtype=np.int64,
+                    )
+                ] = True
+
+                product = np.empty(count, dtype=np.int64)
+                quantity = np.empty(count, dtype=np.int64)
+                price = np.empty(count, dtype=np.float64)
+                timestamp = np.empty(count, dtype=np.float64)
+                is_return = np.empty(count, dtype=bool)
+                cursor = connection.execute(
+                    "SELECT product_id, quantity, price, timestamp, receipt_id"
+                    " FROM receipt_items"
+                )
+                start = 0
+                while start < count:
+                    rows = np.fromiter(
+                        islice(cursor, ANALYTICS_CHUNK_ROWS), dtype=ITEM_ROW
+                    )
+                    if not len(rows):
+                        break
+                    end = start + len(rows)
+                    product[start:end] = np.fromiter(
+                        map(codes.__getitem__, rows["product_id"]),
+                        dtype=np.int64,
+                        count=len(rows),
+                    )
+                    quantity[start:end] = rows["quantity"]
+                    price[start:end] = rows["price"]
+                    timestamp[start:end] = rows["timestamp"]
+                    is_return[start:end] = is_return_receipt[rows["receipt_id"]]
+                    start = end
+            finally:
+                connection.execute("COMMIT")
+        return cls(
+            product_ids,
+            product,
+            quantity,
+            price,
+            local_timestamps(timestamp),
+            is_return,
+        )
+
+    def signed_quantity(self):
+        """
+        Returns the quantities with returned items counted negative.
+        """
+        return np.where(self.is_return, -self.quantity, self.quantity)
+
+    def per_product(self):
+        """
+        Returns sold, returned and net volume and revenue per product.
+
+        Returns:
+         - dict: Arrays indexed by product code, plus "returns_ratio", the
+           returned volume divided by the sold volume.
+        """
+        count = len(self.product_ids)
+        revenue = self.price * self.quantity
+        sold = ~self.is_return
+        report = {
+            "sold": np.bincount(
+                self.product[sold], weights=self.quantity[sold], minlength=count
+            ),
+            "returned": np.bincount(
+                self.product[self.is_return],
+                weights=self.quantity[self.is_return],
+                minlength=count,
+            ),
+            "sold_revenue": np.bincount(
+                self.product[sold], weights=revenue[sold], minlength=count
+            ),
+            "returned_revenue": np.bincount(
+                self.product[self.is_return],
+                weights=revenue[self.is_return],
+                minlength=count,
+            ),
+        }
+        report["volume"] = report["sold"] - report["returned"]
+        report["revenue"] = report["sold_revenue"] - report["returned_revenue"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            report["returns_ratio"] = np.where(
+                report["sold"] > 0, report["returned"] / report["sold"], 0.0
+            )
+        return report
+
+    def per_period(self, seconds):
+        """
+        Returns net volume and revenue per period of the given length.
+
+        Args:
+         - seconds (int): The length of a period, SECONDS_PER_HOUR or
+           SECONDS_PER_DAY for calendar hours and days.
+
+        Returns:
+         - tuple: The start of each period with sales, and the net volume and
+           revenue of each.
+        """
+        if len(self) == 0:
+            return np.array([]), np.array([]), np.array([])
+        period = (self.timestamp // seconds).astype(np.int64)
+        first = period.min()
+        period -= first
+        quantity = self.signed_quantity()
+        has_sales = np.bincount(period) > 0
+        volume = np.bincount(period, weights=quantity)[has_sales]
+        revenue = np.bincount(period, weights=quantity * self.price)[has_sales]
+        periods = np.flatnonzero(has_sales) + first
+        return periods * seconds, volume, revenue
+
+    def hour_of_day(self):
+        """
+        Returns net volume and revenue per hour of the day.
+
+        Returns:
+         - tuple: The volume and the revenue, each an array of 24 values.
+        """
+        hour = (self.timestamp // SECONDS_PER_HOUR).astype(np.int64) % 24
+        quantity = self.signed_quantity()
+        return (
+            np.bincount(hour, weights=quantity, minlength=24),
+            np.bincount(hour, weights=quantity * self.price, minlength=24),
+        )
+
+    def top_sellers(self, count=10, by="revenue"):
+        """
+        Returns the best selling products.
+
+        Args:
+         - count (int): The number of products to return.
+         - by (str): "revenue" or "volume".
+
+        Returns:
+         - list: (product_id, value) tuples, best first.
+        """
+        values = self.per_product()[by]
+        count = min(count, len(values))
+        if count == 0:
+            return []
+        best = np.argpartition(-values, count - 1)[:count]
+        best = best[np.argsort(-values[best])]
+        return [(self.product_ids[code], values[code]) for code in best]
+
+
+def print_report(history, top=10, days=14):
+    """
+    Prints the top sellers, return ratios and the recent daily and hourly sales.
+
+    Args:
+     - history (SalesHistory): The sales to report on.
+     - top (int): The number of products in the top lists.
+     - days (int): The number of most recent days to list.
+    """
+    print(f"{len(history)} items sold or returned\n")
+
+    print(f"Top {top} by revenue:")
+    for product_id, revenue in history.top_sellers(top, by="revenue"):
+        print(f"  {product_id:>10} {revenue:12.2f} kr")
+
+    print(f"\nTop {top} by volume:")
+    for product_id, volume in history.top_sellers(top, by="volume"):
+        print(f"  {product_id:>10} {volume:12.0f} st")
+
+    report = history.per_product()
+    ratios = report["returns_ratio"]
+    print("\nHighest returns ratio:")
+    for code in np.argsort(-ratios)[:top]:
+        if ratios[code] > 0:
+            print(f"  {history.product_ids[code]:>10} {ratios[code]:12.1%}")
+
+    print(f"\nLast {days} days:")
+    starts, volume, revenue = history.per_period(SECONDS_PER_DAY)
+    for start, day_volume, day_revenue in list(zip(starts, volume, revenue))[-days:]:
+        day = datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%d")
+        print(f"  {day} {day_volume:10.0f} st {day_revenue:12.2f} kr")
+
+    print("\nBy hour of day:")
+    volume, revenue = history.hour_of_day()
+    for hour in range(24):
+        if volume[hour] or revenue[hour]:
+            print(f"  {hour:02}:00 {volume[hour]:10.0f} st {revenue[hour]:12.2f} kr")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print sales reports")
+    parser.add_argument("--index", default=receipt_index.path)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--days", type=int, default=14)
+    arguments = parser.parse_args()
+
+    history = SalesHistory.from_index(ReceiptIndex(arguments.index))
+    print_report(history, arguments.top, arguments.days)
+
+
+if __name__ == "__main__":
+    main()
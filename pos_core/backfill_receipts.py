@@ -0,0 +1,25 @@
+"""
+Usage: python -m pos_core.backfill_receipts [folder]
+
+Adds existing text receipts and journal receipts to the receipt index.
+"""
+
+# Imports
+import argparse
+
+from pos_core.constants import RECEIPTS_FOLDER
+from pos_core.receipt_index import receipt_index
+from pos_core.receipts import ReceiptJournal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index existing receipts")
+    parser.add_argument("folder", nargs="?", default=RECEIPTS_FOLDER)
+    arguments = parser.parse_args()
+
+    count = receipt_index.backfill(arguments.folder, ReceiptJournal(arguments.folder))
+    print(f"Read {count} receipts from {arguments.folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Usage: binary snapshots of the text inventory, loaded without parsing and
+queried by product ID through mmap
+"""
+
+# Imports
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from itertools import accumulate
+
+from pos_core.metrics import metrics
+from pos_core.products import Product, ProductStore
+
+MAGIC = b"POSBIN\x00\x01"
+# Magic, text inventory size and checksum, products, names and IDs table sizes
+HEADER = struct.Struct("<8sQI4xQQQ")
+# Price, quantity, name offset and length, ID offset and length
+RECORD = struct.Struct("<dqIIII")
+RECORD_WORDS = RECORD.size // 4
+ROW = struct.Struct("<I")
+
+
+class Layout:
+    """
+    Where the sections of a binary snapshot start.
+
+    A snapshot is the header, one fixed-width RECORD per product in inventory
+    order, the row numbers sorted by product ID, the UTF-8 names and the
+    product IDs joined by newlines. Record offsets point into the names and
+    the IDs.
+
+    Attributes:
+     - size (int): The size of the text inventory the snapshot was made of.
+     - checksum (int): The CRC-32 of the text inventory.
+     - count (int): The number of products.
+     - records (int): The offset of the first record.
+     - order (int): The offset of the sorted row numbers.
+     - names (int): The offset of the names.
+     - ids (int): The offset of the product IDs.
+     - end (int): The size of the snapshot.
+    """
+
+    def __init__(self, size, checksum, count, names_size, ids_size):
+        self.size = size
+        self.checksum = checksum
+        self.count = count
+        self.records = HEADER.size
+        self.order = self.records + count * RECORD.size
+        self.names = self.order + count * ROW.size
+        self.ids = self.names + names_size
+        self.end = self.ids + ids_size
+
+    @classmethod
+    def read(cls, buffer):
+        """
+        Reads the layout from the start of a snapshot.
+
+        Returns:
+         - Layout: The layout, or None if the buffer is not a complete
+           snapshot.
+        """
+        if len(buffer) < HEADER.size:
+            return None
+        magic, size, checksum, count, names_size, ids_size = HEADER.unpack_from(buffer)
+        layout = cls(size, checksum, count, names_size, ids_size)
+        if magic != MAGIC or layout.end != len(buffer):
+            return None
+        return layout
+
+
+def little_endian(column):
+    """
+    Returns a typed array in the snapshot's little-endian byte order.
+    """
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+@metrics.timed("inventory_binary_write")
+def write_binary_snapshot(path, inventory, size, checksum):
+    """
+    Writes a binary snapshot of an inventory, to a temporary file moved into
+    place.
+
+    Args:
+     - path (str): The snapshot file.
+     - inventory (dict): The products, as loaded from the text inventory.
+     - size (int): The size of the text inventory in bytes.
+     - checksum (int): The CRC-32 of the text inventory.
+    """
+    if isinstance(inventory, ProductStore) and not inventory.holes:
+        ids = inventory.row_ids()
+        # Drop the newline after the last ID
+        id_table = inventory.id_bytes[:-1]
+        id_offsets = inventory.id_starts
+        name_lengths = inventory.name_lengths
+        if not inventory.unused_name_bytes:
+            # No renamed products left their old names behind
+            names = inventory.names
+            name_offsets = array("I", inventory.name_offsets)
+        else:
+            names = b"".join(inventory.name_bytes(row) for row in range(len(ids)))
+            name_offsets = array("I", accumulate(name_lengths, initial=0))[:-1]
+        prices = inventory.prices
+        quantities = inventory.quantities
+    else:
+        products = list(inventory.values())
+        ids = [product.product_id for product in products]
+        id_table = "\n".join(ids).encode()
+        # Each ID is followed by a newline
+        id_offsets = array(
+            "I",
+            accumulate((len(product_id.encode()) + 1 for product_id in ids), initial=0),
+        )
+        encoded = [product.name.encode() for product in products]
+        names = b"".join(encoded)
+        name_lengths = array("I", map(len, encoded))
+        name_offsets = array("I", accumulate(name_lengths, initial=0))[:-1]
+        prices = array("d", (product.price for product in products))
+        quantities = array("q", (product.quantity for product in products))
+
+    count = len(ids)
+    id_lengths = array(
+        "I", (end - start - 1 for start, end in zip(id_offsets, id_offsets[1:]))
+    )
+    order = array("I", sorted(range(count), key=ids.__getitem__))
+
+    # Fill the records one column at a time through strided views
+    records = bytearray(count * RECORD.size)
+    view = memoryview(records)
+    view.cast("d")[0 :: RECORD_WORDS // 2] = little_endian(prices)
+    view.cast("q")[1 :: RECORD_WORDS // 2] = little_endian(quantities)
+    words = view.cast("I")
+    for position, column in enumerate(
+        [name_offsets, name_lengths, id_offsets[:-1], id_lengths], start=4
+    ):
+        words[position::RECORD_WORDS] = little_endian(column)
+
+    header = HEADER.pack(MAGIC, size, checksum, count, len(names), len(id_table))
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(header)
+        file.write(records)
+        file.write(little_endian(order))
+        file.write(names)
+        file.write(id_table)
+        written = file.tell()
+    os.replace(temporary_path, path)
+    metrics.written("inventory_binary", written)
+
+
+def column(records, typecode, position, step):
+    """
+    Copies one field of every record into a typed array.
+    """
+    values = array(typecode)
+    values.frombytes(records.cast(typecode)[position::step].tobytes())
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def load_binary_snapshot(path, size, checksum):
+    """
+    Loads the products of a binary snapshot into a ProductStore, if the
+    snapshot was made of the text inventory with the given size and checksum.
+
+    Args:
+     - path (str): The snapshot file.
+     - size (int): The size of the text inventory in bytes.
+     - checksum (int): The CRC-32 of the text inventory.
+
+    Returns:
+     - ProductStore: The products, or None if the snapshot is missing,
+       damaged or was made of another version of the text inventory.
+    """
+    try:
+        with open(path, "rb") as file:
+            content = file.read()
+    except FileNotFoundError:
+        return None
+    metrics.read("inventory_binary", len(content))
+    layout = Layout.read(content)
+    if layout is None or (layout.size, layout.checksum) != (size, checksum):
+        return None
+
+    buffer = memoryview(content)
+    records = buffer[layout.records : layout.order]
+    # The store keeps a newline after every ID, the last one included
+    id_bytes = bytearray(buffer[layout.ids : layout.end])
+    id_starts = column(records, "I", 6, RECORD_WORDS)
+    if layout.count:
+        id_bytes += b"\n"
+    id_starts.append(len(id_bytes))
+    return ProductStore.from_columns(
+        id_bytes,
+        id_starts,
+        bytearray(buffer[layout.names : layout.ids]),
+        column(records, "I", 4, RECORD_WORDS),
+        column(records, "I", 5, RECORD_WORDS),
+        column(records, "d", 0, RECORD_WORDS // 2),
+        column(records, "q", 1, RECORD_WORDS // 2),
+    )
+
+
+class BinarySnapshot(Mapping):
+    """
+    A read-only view of a binary snapshot through mmap.
+
+    Nothing is parsed up front: looking up a product ID is a binary search
+    over the sorted row numbers, reading a few records from the mapped file.
+
+    Attributes:
+     - path (str): The snapshot file.
+     - layout (Layout): Where the sections of the snapshot start.
+
+    Methods:
+        find(self, product_id):
+            Returns the row of a product ID.
+
+        close(self):
+            Unmaps the snapshot.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.layout = Layout.read(self.map)
+        if self.layout is None:
+            self.map.close()
+            raise ValueError(f"{path} is not a binary inventory snapshot")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, row):
+        return RECORD.unpack_from(self.map, self.layout.records + row * RECORD.size)
+
+    def id_at(self, row):
+        _, _, _, _, offset, length = self.record(row)
+        start = self.layout.ids + offset
+        return self.map[start : start + length]
+
+    def find(self, product_id):
+        """
+        Returns the row of a product ID.
+
+        Args:
+         - product_id (str): The product ID.
+
+        Returns:
+         - int: The row, or None if the product is not in the snapshot.
+        """
+        wanted = product_id.encode()
+        low, high = 0, self.layout.count
+        while low < high:
+            middle = (low + high) // 2
+            (row,) = ROW.unpack_from(self.map, self.layout.order + middle * ROW.size)
+            found = self.id_at(row)
+            if found == wanted:
+                return row
+            if found < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def __getitem__(self, product_id):
+        row = self.find(product_id)
+        if row is None:
+            raise KeyError(product_id)
+        price, quantity, name_offset, name_length, _, _ = self.record(row)
+        start = self.layout.names + name_offset
+        name = self.map[start : start + name_length].decode()
+        return Product(name, product_id, price, quantity)
+
+    def __contains__(self, product_id):
+        return self.find(product_id) is not None
+
+    def __iter__(self):
+        for row in range(self.layout.count):
+            yield self.id_at(row).decode()
+
+    def __len__(self):
+        return self.layout.count
+
+    def close(self):
+        """
+        Unmaps the snapshot.
+        """
+        self.map.close()
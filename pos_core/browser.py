@@ -0,0 +1,269 @@
+"""
+Usage: sorted, filtered and paginated views of the inventory for the GUI
+"""
+
+# Imports
+from array import array
+
+from pos_core.inventory import inventory_cache
+from pos_core.products import Product, ProductStore
+
+SORT_KEYS = ("name", "id", "price", "stock")
+
+
+class InventoryBrowser:
+    """
+    A sorted and filtered view of the inventory that hands out one page at a
+    time, so the GUI only ever renders the rows on screen.
+
+    The browser keeps its own columns of the inventory: the names, a
+    lower-case search key per product and the prices and stock. The columns
+    are rebuilt when the inventory changes; when a ProductStore only had
+    prices or stock changed, as after a sale, just those two columns are
+    copied again. The order for each sort key is computed once per rebuild.
+    A filter that extends the previous one only searches the previous
+    matches, so typing a query narrows the view quickly.
+
+    Attributes:
+     - cache (InventoryCache): The inventory to browse.
+     - page_size (int): The number of products per page.
+     - sort_key (str): One of SORT_KEYS.
+     - descending (bool): Whether the sort order is reversed.
+     - query (str): The filter, matched case-insensitively against the name
+       and the product ID.
+
+    Methods:
+        set_filter(self, query):
+            Shows only the products whose name or ID contains the query.
+
+        set_sort(self, sort_key, descending=False):
+            Changes the sort order.
+
+        page(self, number):
+            Returns the products on a page.
+
+        page_count(self):
+            Returns the number of pages.
+    """
+
+    def __init__(self, cache=None, page_size=25):
+        self.cache = cache or inventory_cache
+        self.page_size = page_size
+        self.sort_key = "name"
+        self.descending = False
+        self.query = ""
+        self.version = None
+        self.layout = None
+        self.rows = None
+        self.ids = []
+        self.names = []
+        self.search_keys = []
+        self.prices = array("d")
+        self.quantities = array("q")
+        self.orders = {}
+        self.matches = None
+        self.matched_query = ""
+        self.view = None
+
+    def __len__(self):
+        return len(self.current_view())
+
+    def snapshot(self):
+        """
+        Rebuilds the columns if the inventory changed since the last call.
+        """
+        with self.cache.reading() as inventory:
+            self.copy_columns(inventory)
+
+    def copy_columns(self, inventory):
+        """
+        Copies the columns of the inventory, held still by the caller.
+        """
+        version = (id(inventory), self.cache.signature)
+        if version == self.version:
+            return
+        self.version = version
+        self.view = None
+        if isinstance(inventory, ProductStore):
+            # Rows are only added, deleted or renamed when one of these changes
+            layout = (
+                id(inventory),
+                inventory.squeezes,
+                inventory.row_count,
+                len(inventory),
+                len(inventory.names),
+            )
+            if layout == self.layout:
+                self.copy_numbers(inventory)
+                self.orders.pop("price", None)
+                self.orders.pop("stock", None)
+                return
+            self.layout = layout
+            ids = inventory.row_ids()
+            if not inventory.holes:
+                self.rows = None
+                self.ids = ids
+            else:
+                self.rows = [
+                    row for row in range(len(ids)) if row not in inventory.holes
+                ]
+                self.ids = [ids[row] for row in self.rows]
+            rows = self.rows or range(len(ids))
+            names = bytes(inventory.names)
+            self.names = [
+                names[offset : offset + length].decode()
+                for offset, length in zip(
+                    (inventory.name_offsets[row] for row in rows),
+                    (inventory.name_lengths[row] for row in rows),
+                )
+            ]
+            self.copy_numbers(inventory)
+        else:
+            self.layout = None
+            products = list(inventory.values())
+            self.ids = [product.product_id for product in products]
+            self.names = [product.name for product in products]
+            self.prices = array("d", (product.price for product in products))
+            self.quantities = array("q", (product.quantity for product in products))
+        self.search_keys = [
+            f"{name}\n{product_id}".lower()
+            for name, product_id in zip(self.names, self.ids)
+        ]
+        self.orders = {}
+        self.matches = None
+        self.matched_query = ""
+
+    def copy_numbers(self, store):
+        """
+        Copies the prices and stock of the live rows of a ProductStore.
+        """
+        if self.rows is None:
+            self.prices = array("d", store.prices)
+            self.quantities = array("q", store.quantities)
+        else:
+            self.prices = array("d", (store.prices[row] for row in self.rows))
+            self.quantities = array("q", (store.quantities[row] for row in self.rows))
+
+    def set_filter(self, query):
+        """
+        Shows only the products whose name or ID contains the query.
+
+        Args:
+         - query (str): The text to look for, empty to show everything.
+        """
+        self.query = query.strip().lower()
+        self.view = None
+
+    def set_sort(self, sort_key, descending=False):
+        """
+        Changes the sort order.
+
+        Args:
+         - sort_key (str): "name", "id", "price" or "stock".
+         - descending (bool): Whether to reverse the order.
+
+        Raises:
+         - ValueError: If the sort key is unknown.
+        """
+        if sort_key not in SORT_KEYS:
+            raise ValueError(sort_key)
+        self.sort_key = sort_key
+        self.descending = descending
+        self.view = None
+
+    def sort_column(self, sort_key):
+        """
+        Returns the function giving the sort value of a row.
+        """
+        if sort_key == "name":
+            return lambda row: self.names[row].lower()
+        if sort_key == "id":
+            # Numeric IDs sort by value when they sort by length first
+            return lambda row: (len(self.ids[row]), self.ids[row])
+        if sort_key == "price":
+            return self.prices.__getitem__
+        return self.quantities.__getitem__
+
+    def order(self, sort_key):
+        """
+        Returns every row in the order of a sort key, computed once per
+        snapshot.
+        """
+        if sort_key not in self.orders:
+            self.orders[sort_key] = sorted(
+                range(len(self.ids)), key=self.sort_column(sort_key)
+            )
+        return self.orders[sort_key]
+
+    def matching_rows(self):
+        """
+        Returns the rows matching the filter, or None if there is no filter.
+        """
+        if not self.query:
+            return None
+        if self.matches is None or self.query != self.matched_query:
+            if self.matches is not None and self.query.startswith(self.matched_query):
+                candidates = self.matches
+            else:
+                candidates = range(len(self.ids))
+            query = self.query
+            keys = self.search_keys
+            self.matches = [row for row in candidates if query in keys[row]]
+            self.matched_query = query
+        return self.matches
+
+    def current_view(self):
+        """
+        Returns the rows to show, filtered and sorted.
+        """
+        self.snapshot()
+        if self.view is not None:
+            return self.view
+
+        matches = self.matching_rows()
+        if matches is None:
+            view = self.order(self.sort_key)
+        elif len(matches) * 4 < len(self.ids) and self.sort_key not in self.orders:
+            # Sorting a few matches beats sorting the whole inventory
+            view = sorted(matches, key=self.sort_column(self.sort_key))
+        else:
+            selected = bytearray(len(self.ids))
+            for row in matches:
+                selected[row] = 1
+            view = [row for row in self.order(self.sort_key) if selected[row]]
+        if self.descending:
+            view = view[::-1]
+        self.view = view
+        return view
+
+    def page_count(self):
+        """
+        Returns the number of pages.
+
+        Returns:
+         - int: The number of pages, at least 1.
+        """
+        return max(1, -(-len(self.current_view()) // self.page_size))
+
+    def page(self, number):
+        """
+        Returns the products on a page.
+
+        Args:
+         - number (int): The page number, from 0. Numbers past the last page
+           return the last page.
+
+        Returns:
+         - list: Product instances.
+        """
+        view = self.current_view()
+        # The count of this view, as the inventory may change in the meantime
+        pages = max(1, -(-len(view) // self.page_size))
+        number = min(max(number, 0), pages - 1)
+        start = number * self.page_size
+        return [
+            Product(
+                self.names[row], self.ids[row], self.prices[row], self.quantities[row]
+            )
+            for row in view[start : start + self.page_size]
+        ]
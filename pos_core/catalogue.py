@@ -0,0 +1,308 @@
+"""
+Usage: python -m pos_core.catalogue import <catalogue.csv> [--inventory FILE] [--errors FILE]
+       python -m pos_core.catalogue export <catalogue.csv> [--inventory FILE]
+
+Bulk import of supplier catalogues into the inventory and export of the
+inventory as a catalogue, both streamed so large files never sit in memory.
+"""
+
+# Imports
+import argparse
+import csv
+import math
+import os
+from array import array
+from collections import namedtuple
+
+from pos_core.constants import (
+    IMPORT_CHUNK_ROWS,
+    IMPORT_ERROR_SAMPLE,
+    INVENTORY_FILE,
+)
+from pos_core.inventory import InventoryCache, inventory_cache
+from pos_core.products import ProductStore
+from pos_core.storage import open_storage
+
+CATALOGUE_COLUMNS = ("name", "product_id", "price", "quantity")
+
+ImportReport = namedtuple("ImportReport", "rows imported added rejected errors")
+
+
+class CatalogueImport:
+    """
+    One import of a catalogue CSV into the inventory.
+
+    The file is read row by row and handed to the storage in chunks of
+    validated "set" records, so the inventory is written once however many
+    rows there are. Rejected rows are written to the error report as they
+    are found, with their line number and the reason.
+
+    A header row naming the columns name, product_id, price and quantity
+    may list them in any order, with extra columns ignored. Without a header
+    the columns are read in that order, as in the inventory file.
+
+    To catch duplicate product IDs without keeping every ID read, the line
+    of each imported product is kept by its row in a ProductStore inventory,
+    four bytes per product, and only the chunk not yet applied is kept in a
+    dictionary. Other inventories keep the lines of all imported IDs.
+
+    Attributes:
+     - path (str): The catalogue to import.
+     - report_path (str): Where rejected rows are written, None to skip the
+       report. The file is only created if a row is rejected.
+     - chunk_rows (int): The number of records handed to the storage at once.
+     - rows (int): The data rows read so far.
+     - added (int): The imported products that were not in the inventory.
+     - rejected (int): The rows rejected so far.
+     - errors (list): The first IMPORT_ERROR_SAMPLE (line, reason) pairs.
+
+    Methods:
+        run(self, cache):
+            Imports the catalogue.
+
+        parse(self, row, columns):
+            Validates a row and returns its "set" record.
+    """
+
+    def __init__(self, path, report_path=None, chunk_rows=IMPORT_CHUNK_ROWS):
+        self.path = path
+        self.report_path = report_path
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.added = 0
+        self.rejected = 0
+        self.errors = []
+        self.header = list(CATALOGUE_COLUMNS)
+        self.report = None
+        self.report_writer = None
+
+    def run(self, cache=None):
+        """
+        Imports the catalogue, adding new products and replacing existing
+        ones, with the inventory lock held throughout.
+
+        Args:
+         - cache (InventoryCache): The inventory to import into.
+
+        Returns:
+         - ImportReport: The number of rows read, imported, added and
+           rejected, and the first rejected rows.
+        """
+        cache = cache or inventory_cache
+        try:
+            with open(self.path, newline="", encoding="utf-8-sig") as file:
+                cache.apply_many(self.chunks(csv.reader(file), cache))
+        finally:
+            if self.report is not None:
+                self.report.close()
+        return ImportReport(
+            self.rows,
+            self.rows - self.rejected,
+            self.added,
+            self.rejected,
+            self.errors,
+        )
+
+    def chunks(self, reader, cache):
+        """
+        Yields lists of validated records, reading the catalogue as they are
+        consumed.
+        """
+        columns = None
+        # The line of each ID in the chunk not applied yet, then by store row
+        seen = {}
+        seen_rows = array("I")
+        chunk = []
+
+        def first_line(product_id):
+            line = seen.get(product_id)
+            if line is None and seen_rows:
+                row = cache.inventory.row_of(product_id)
+                if row is not None and row < len(seen_rows):
+                    line = seen_rows[row] or None
+            return line
+
+        for row in reader:
+            if columns is None:
+                header = [field.strip().lower() for field in row]
+                if set(CATALOGUE_COLUMNS) <= set(header):
+                    columns = [header.index(column) for column in CATALOGUE_COLUMNS]
+                    self.header = row
+                    continue
+                columns = range(len(CATALOGUE_COLUMNS))
+            if not any(field.strip() for field in row):
+                continue
+            self.rows += 1
+            try:
+                record = self.parse(row, columns)
+                product_id = record[2]
+                line = first_line(product_id)
+                if line is not None:
+                    raise ValueError(f"duplicate product ID, first on line {line}")
+            except ValueError as error:
+                self.reject(reader.line_num, str(error), row)
+                continue
+            seen[product_id] = reader.line_num
+            # The inventory is loaded by the time the first chunk is pulled
+            if product_id not in cache.inventory:
+                self.added += 1
+            chunk.append(record)
+            if len(chunk) == self.chunk_rows:
+                yield chunk
+                chunk = []
+                if isinstance(cache.inventory, ProductStore):
+                    store = cache.inventory
+                    missing = store.row_count - len(seen_rows)
+                    seen_rows.frombytes(bytes(seen_rows.itemsize * missing))
+                    for product_id, line in seen.items():
+                        seen_rows[store.row_of(product_id)] = line
+                    seen.clear()
+        if chunk:
+            yield chunk
+
+    def parse(self, row, columns):
+        """
+        Validates a row and returns its "set" record.
+
+        Args:
+         - row (list): The fields of the row.
+         - columns (list): The position of the name, product ID, price and
+           quantity fields.
+
+        Returns:
+         - tuple: ("set", name, product_id, price, quantity).
+
+        Raises:
+         - ValueError: With the reason if the row is invalid.
+        """
+        if len(row) <= max(columns):
+            raise ValueError(f"expected {max(columns) + 1} fields, found {len(row)}")
+        name, product_id, price_text, quantity_text = (
+            row[column].strip() for column in columns
+        )
+        if not name:
+            raise ValueError("missing name")
+        if not product_id:
+            raise ValueError("missing product ID")
+        if any(character in name + product_id for character in ",\r\n"):
+            # The text inventory is comma-separated, one product per line
+            raise ValueError("commas and line breaks are not allowed in names or IDs")
+        try:
+            price = float(price_text)
+        except ValueError:
+            price = math.nan
+        if not math.isfinite(price) or price < 0:
+            raise ValueError(f"invalid price {price_text!r}")
+        try:
+            quantity = int(quantity_text)
+        except ValueError:
+            quantity = -1
+        if quantity < 0:
+            raise ValueError(f"invalid quantity {quantity_text!r}")
+        return ("set", name, product_id, price, quantity)
+
+    def reject(self, line, reason, row):
+        """
+        Counts a rejected row and writes it to the error report, after the
+        line number and the reason, under the header of the catalogue.
+        """
+        self.rejected += 1
+        if len(self.errors) < IMPORT_ERROR_SAMPLE:
+            self.errors.append((line, reason))
+        if self.report_path is None:
+            return
+        if self.report is None:
+            self.report = open(self.report_path, "w", newline="", encoding="utf-8")
+            self.report_writer = csv.writer(self.report)
+            self.report_writer.writerow(["line", "error", *self.header])
+        self.report_writer.writerow([line, reason, *row])
+
+
+def import_catalogue(path, report_path=None, cache=None):
+    """
+    Imports a catalogue CSV into the inventory in one pass.
+
+    Args:
+     - path (str): The catalogue to import.
+     - report_path (str): Where rejected rows are written, None to skip the
+       report.
+     - cache (InventoryCache): The inventory to import into.
+
+    Returns:
+     - ImportReport: The number of rows read, imported, added and rejected,
+       and the first rejected rows.
+    """
+    return CatalogueImport(path, report_path).run(cache)
+
+
+def export_catalogue(path, cache=None):
+    """
+    Writes the inventory as a catalogue CSV with a header row, one product
+    at a time. The file is written to a temporary file and moved into place.
+
+    Args:
+     - path (str): The catalogue to write.
+     - cache (InventoryCache): The inventory to export.
+
+    Returns:
+     - int: The number of products written.
+    """
+    cache = cache or inventory_cache
+    temporary_path = path + ".tmp"
+    count = 0
+    with cache.transaction() as inventory:
+        with open(temporary_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(CATALOGUE_COLUMNS)
+            for product in inventory.values():
+                writer.writerow(
+                    (product.name, product.product_id, product.price, product.quantity)
+                )
+                count += 1
+    os.replace(temporary_path, path)
+    return count
+
+
+def error_report_path(path):
+    """
+    Returns the default error report path for a catalogue.
+
+    Args:
+     - path (str): The catalogue.
+
+    Returns:
+     - str: The catalogue's path with _errors.csv in place of its extension.
+    """
+    return os.path.splitext(path)[0] + "_errors.csv"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or export a catalogue")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("catalogue", help="the catalogue CSV file")
+    parser.add_argument("--inventory", default=INVENTORY_FILE)
+    parser.add_argument(
+        "--errors",
+        help="where to write rejected rows, defaults to <catalogue>_errors.csv",
+    )
+    arguments = parser.parse_args()
+
+    cache = InventoryCache(open_storage(arguments.inventory))
+    if arguments.action == "export":
+        count = export_catalogue(arguments.catalogue, cache)
+        print(f"Exported {count} products to {arguments.catalogue}")
+        return
+
+    report_path = arguments.errors or error_report_path(arguments.catalogue)
+    report = import_catalogue(arguments.catalogue, report_path, cache)
+    print(
+        f"Imported {report.imported} of {report.rows} rows, {report.added} new products"
+    )
+    if report.rejected:
+        print(f"Rejected {report.rejected} rows, see {report_path}")
+        for line, reason in report.errors:
+            print(f"  line {line}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
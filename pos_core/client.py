@@ -0,0 +1,331 @@
+"""
+Usage: register operations run on a register server, for registers sharing
+one inventory process (see pos_core.server)
+"""
+
+# Imports
+import json
+import socket
+import threading
+
+from pos_core.errors import (
+    EmptyCartError,
+    InsufficientStockError,
+    InvalidQuantityError,
+    MemberNotFoundError,
+    NotInCartError,
+    NotReturnableError,
+    ProductNotFoundError,
+    ReceiptNotFoundError,
+    ReceiptSaveError,
+    RemoteError,
+)
+from pos_core.metrics import metrics
+from pos_core.products import Product
+from pos_core.receipt_index import ReceiptItem
+from pos_core.register import Purchase, ReturnSession, ShoppingCart
+
+# The errors the server reports that are raised again as they are
+REMOTE_ERRORS = {
+    error.__name__: error
+    for error in (
+        EmptyCartError,
+        InsufficientStockError,
+        InvalidQuantityError,
+        MemberNotFoundError,
+        NotInCartError,
+        NotReturnableError,
+        ProductNotFoundError,
+        ReceiptNotFoundError,
+        ReceiptSaveError,
+        RemoteError,
+        ValueError,
+    )
+}
+
+
+def error_fields(error):
+    """
+    Returns the name and arguments of an exception to send to a client.
+
+    Args:
+     - error (Exception): The exception.
+
+    Returns:
+     - tuple: The class name and a list of JSON-ready arguments.
+    """
+    if isinstance(error, InsufficientStockError):
+        return type(error).__name__, [error.available]
+    if isinstance(error, NotReturnableError):
+        return type(error).__name__, [error.product_id, error.returnable]
+    return type(error).__name__, [str(arg) for arg in error.args]
+
+
+def remote_error(name, args):
+    """
+    Returns the exception the server reported.
+
+    Args:
+     - name (str): The class name of the exception.
+     - args (list): Its arguments.
+
+    Returns:
+     - Exception: The same exception if it is one of REMOTE_ERRORS, or a
+       RemoteError describing it.
+    """
+    if name in REMOTE_ERRORS:
+        return REMOTE_ERRORS[name](*args)
+    return RemoteError(f"{name}: {', '.join(map(str, args))}")
+
+
+def product_fields(product):
+    """
+    Returns a product as the list of fields sent over the connection.
+    """
+    return [product.name, product.product_id, product.price, product.quantity]
+
+
+class RegisterClient:
+    """
+    A connection to a register server offering the functions of the register
+    module, so the GUI can use either.
+
+    Requests are JSON objects on one line, {"id": 1, "op": "get_product",
+    "args": ["1001"]}, answered in order by {"id": 1, "result": ...} or
+    {"id": 1, "error": "ProductNotFoundError", "args": ["1001"]}. The server
+    keeps no state per connection, so a dropped connection is opened again on
+    the next request; a request that was in flight when it dropped fails with
+    the OSError.
+
+    Attributes:
+     - address (str): "host:port", or the path of a Unix socket.
+
+    Methods:
+        request(self, operation, *args):
+            Sends a request and returns the result.
+
+        ShoppingCart(self):
+            Returns an empty cart that checks out through the server.
+
+        ReturnSession(self, receipt_number):
+            Starts a return of items from a purchase.
+
+        purchase_of(self, receipt_number):
+            Returns a purchase and what has been returned from it.
+
+        return_receipt(self, receipt_number, quantities):
+            Returns items bought on a purchase receipt.
+
+        add_product(self, name, product_id, price, quantity):
+            Adds a product to the inventory.
+
+        update_product(self, product_id, price, quantity):
+            Updates the price and quantity of a product.
+
+        delete_product(self, product_id):
+            Deletes a product from the inventory.
+
+        close(self):
+            Closes the connection.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.lock = threading.Lock()
+        self.connection = None
+        self.stream = None
+        self.requests = 0
+
+    def connect(self):
+        host, _, port = self.address.rpartition(":")
+        if host and port.isdigit():
+            self.connection = socket.create_connection((host, int(port)))
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.connect(self.address)
+        self.stream = self.connection.makefile("rwb")
+
+    def request(self, operation, *args):
+        """
+        Sends a request and returns the result. Worker threads may share the
+        client; their requests take turns on the connection.
+
+        Args:
+         - operation (str): The name of the operation.
+         - args: Its JSON-ready arguments.
+
+        Returns:
+         - The result of the operation.
+
+        Raises:
+         - RegisterError: As raised by the operation on the server.
+         - RemoteError: If the server closed the connection.
+         - OSError: If the server can't be reached.
+        """
+        with self.lock:
+            if self.stream is None:
+                self.connect()
+            self.requests += 1
+            message = {"id": self.requests, "op": operation, "args": args}
+            try:
+                self.stream.write(json.dumps(message).encode() + b"\n")
+                self.stream.flush()
+                line = self.stream.readline()
+            except OSError:
+                self.close()
+                raise
+            if not line:
+                self.close()
+                raise RemoteError("the register server closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise remote_error(response["error"], response["args"])
+        return response["result"]
+
+    def ShoppingCart(self):
+        """
+        Returns an empty cart that checks out through the server, in place
+        of register.ShoppingCart().
+
+        Returns:
+         - RemoteCart: The cart.
+        """
+        return RemoteCart(self)
+
+    def ReturnSession(self, receipt_number):
+        """
+        Starts a return of items from a purchase checked on the server, in
+        place of register.ReturnSession().
+
+        Returns:
+         - ReturnSession: The return.
+        """
+        return ReturnSession(
+            receipt_number, lookup=self.purchase_of, commit=self.return_receipt
+        )
+
+    def purchase_of(self, receipt_number):
+        """
+        Returns a purchase and what has been returned from it.
+
+        Returns:
+         - Purchase: The purchase.
+
+        Raises:
+         - ReceiptNotFoundError: If the number is not the number of a purchase.
+        """
+        number, items, total, returned = self.request("purchase_of", receipt_number)
+        return Purchase(
+            number,
+            {item[1]: ReceiptItem(*item) for item in items},
+            total,
+            returned,
+        )
+
+    @metrics.timed("return_receipt")
+    def return_receipt(self, receipt_number, quantities):
+        """
+        Returns items bought on a purchase receipt to the inventory and saves
+        a return receipt.
+
+        Args:
+         - receipt_number (int): The number of the purchase receipt.
+         - quantities (dict): The quantities returned, keyed by product ID.
+
+        Returns:
+         - str: The return receipt.
+        """
+        return self.request("return_receipt", receipt_number, quantities)
+
+    def add_product(self, name, product_id, price, quantity):
+        """
+        Adds a product to the inventory, replacing any product with the same ID.
+
+        Returns:
+         - Product: The stored product.
+        """
+        return Product(*self.request("add_product", name, product_id, price, quantity))
+
+    def update_product(self, product_id, price, quantity):
+        """
+        Updates the price and quantity of a product in the inventory.
+
+        Returns:
+         - Product: The stored product.
+        """
+        return Product(*self.request("update_product", product_id, price, quantity))
+
+    def delete_product(self, product_id):
+        """
+        Deletes a product from the inventory.
+
+        Returns:
+         - Product: The deleted product.
+        """
+        return Product(*self.request("delete_product", product_id))
+
+    def close(self):
+        """
+        Closes the connection. The next request opens it again.
+        """
+        if self.connection is not None:
+            self.stream.close()
+            self.connection.close()
+        self.connection = None
+        self.stream = None
+
+
+class RemoteCart(ShoppingCart):
+    """
+    A shopping cart kept by the register that looks products up and checks
+    out through a register server.
+
+    Attributes:
+     - client (RegisterClient): The connection to the server.
+
+    Methods:
+        lookup(self, product_id):
+            Returns a product from the server's inventory.
+
+        checkout(self):
+            Checks the cart out on the server.
+    """
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    def lookup(self, product_id):
+        """
+        Returns a product from the server's inventory.
+
+        Raises:
+         - ProductNotFoundError: If the product is not in the inventory.
+        """
+        return Product(*self.client.request("get_product", product_id))
+
+    @metrics.timed("checkout")
+    def checkout(self):
+        """
+        Checks the cart out on the server, which saves the purchase receipt,
+        removes the items from the inventory and adds the points to the
+        attached member, and empties the cart.
+
+        Returns:
+         - str: The purchase receipt.
+
+        Raises:
+         - EmptyCartError: If the cart is empty.
+         - ProductNotFoundError: If a product was deleted from the inventory.
+         - InsufficientStockError: If the inventory no longer holds enough items.
+        """
+        if not self.items:
+            raise EmptyCartError()
+        quantities = {
+            product_id: line.quantity for product_id, line in self.items.items()
+        }
+        card_number = self.member.card_number if self.member is not None else None
+        _, receipt = self.client.request("checkout", quantities, card_number)
+        self.clear()
+        return receipt
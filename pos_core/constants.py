@@ -0,0 +1,33 @@
+"""
+Usage: file locations and tuning constants for the POS core
+"""
+
+# Imports
+import os
+
+# Constants:
+INVENTORY_FILE = os.environ.get("POS_INVENTORY_FILE", "inventory.txt")
+MEMBERS_FILE = "members.txt"
+PROMOTIONS_FILE = os.environ.get("POS_PROMOTIONS_FILE", "promotions.json")
+MEMBERS_DATABASE = os.environ.get("POS_MEMBERS_DATABASE", "members.db")
+MEMBER_CACHE_SIZE = 50_000
+POINTS_PER_KR = 1
+JOURNAL_SUFFIX = ".journal"
+BINARY_SNAPSHOT_SUFFIX = ".bin"
+COMPACT_JOURNAL_BYTES = 256 * 1024
+SAVE_CHUNK_PRODUCTS = 10_000
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+RECEIPTS_FOLDER = "receipts"
+METRICS_ENABLED = os.environ.get("POS_METRICS", "1") != "0"
+METRICS_FILE = os.environ.get("POS_METRICS_FILE")
+METRICS_FLUSH_SECONDS = 15
+SCAN_FRAME_MS = 16
+SCAN_KEY_GAP_MS = 50
+IMPORT_CHUNK_ROWS = 10_000
+ANALYTICS_CHUNK_ROWS = 100_000
+IMPORT_ERROR_SAMPLE = 20
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_ADDRESS = os.environ.get("POS_SERVER")
+COMMIT_MAX_BATCH = 256
+READER_THREADS = 4
@@ -0,0 +1,89 @@
+"""
+Usage: exceptions raised by the register operations
+"""
+
+
+class RegisterError(Exception):
+    """
+    Base class for errors raised by the register operations.
+    """
+
+
+class InvalidQuantityError(RegisterError, ValueError):
+    """
+    Raised when a quantity is not a whole number.
+    """
+
+
+class ProductNotFoundError(RegisterError, KeyError):
+    """
+    Raised when a product ID is not in the inventory.
+    """
+
+
+class InsufficientStockError(RegisterError):
+    """
+    Raised when the inventory holds less than the requested quantity.
+
+    Attributes:
+     - available (int): The quantity left in the inventory.
+    """
+
+    def __init__(self, available):
+        super().__init__(f"only {available} left")
+        self.available = available
+
+
+class MemberNotFoundError(RegisterError, KeyError):
+    """
+    Raised when a card number belongs to no member.
+    """
+
+
+class ReceiptSaveError(RegisterError):
+    """
+    Raised when a receipt can't be written to the receipt journal. Nothing of
+    the receipt was saved.
+    """
+
+
+class ReceiptNotFoundError(RegisterError, KeyError):
+    """
+    Raised when a receipt number belongs to no purchase.
+    """
+
+
+class NotReturnableError(RegisterError):
+    """
+    Raised when more items are returned than were bought on the receipt and
+    not returned yet.
+
+    Attributes:
+     - product_id (str): The product returned.
+     - returnable (int): The quantity that can still be returned.
+    """
+
+    def __init__(self, product_id, returnable):
+        super().__init__(f"only {returnable} of {product_id} can be returned")
+        self.product_id = product_id
+        self.returnable = int(returnable)
+
+
+class NotInCartError(RegisterError):
+    """
+    Raised when a product is not in the shopping cart, or not in the
+    requested quantity.
+    """
+
+
+class EmptyCartError(RegisterError):
+    """
+    Raised when checking out an empty shopping cart.
+    """
+
+
+class RemoteError(RegisterError):
+    """
+    Raised when the register server fails a request with an error the client
+    doesn't know, or closes the connection.
+    """
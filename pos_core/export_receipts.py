@@ -0,0 +1,29 @@
+"""
+Usage: python -m pos_core.export_receipts <folder> [--journal receipts] [--first N] [--last N]
+
+Writes receipts from the receipt journal as one text file per receipt.
+"""
+
+# Imports
+import argparse
+
+from pos_core.constants import RECEIPTS_FOLDER
+from pos_core.receipts import ReceiptJournal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the receipt journal")
+    parser.add_argument("folder", help="folder to write the text receipts to")
+    parser.add_argument("--journal", default=RECEIPTS_FOLDER)
+    parser.add_argument("--first", type=int, default=1)
+    parser.add_argument("--last", type=int)
+    arguments = parser.parse_args()
+
+    journal = ReceiptJournal(arguments.journal)
+    last = arguments.last or len(journal)
+    count = journal.export(arguments.folder, range(arguments.first, last + 1))
+    print(f"Exported {count} receipts to {arguments.folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Usage: python -m pos_core.import_members [members.txt] [--database members.db]
+
+Imports loyalty members, one "card_number,name,points" line each, into the
+members database, replacing members with the same cards.
+"""
+
+# Imports
+import argparse
+
+from pos_core.constants import MEMBERS_DATABASE, MEMBERS_FILE
+from pos_core.members import MemberStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import loyalty members")
+    parser.add_argument("members", nargs="?", default=MEMBERS_FILE)
+    parser.add_argument("--database", default=MEMBERS_DATABASE)
+    arguments = parser.parse_args()
+
+    # Don't import the default members.txt on top of the one given
+    store = MemberStore(arguments.database, source=None)
+    report = store.import_text(arguments.members)
+    print(
+        f"Imported {report.imported} of {report.rows} members into"
+        f" {arguments.database}"
+    )
+    if report.rejected:
+        print(f"Rejected {report.rejected} lines")
+        for line, reason in report.errors:
+            print(f"  line {line}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
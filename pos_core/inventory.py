@@ -0,0 +1,259 @@
+"""
+Usage: shared in-memory inventory cache in front of the storage backend
+"""
+
+# Imports
+import threading
+from contextlib import contextmanager
+
+from pos_core.constants import INVENTORY_FILE
+from pos_core.storage import open_storage
+
+
+class InventoryCache:
+    """
+    A class keeping the inventory in memory so lookups don't re-read the file.
+
+    The inventory is only loaded again when the storage signature changes,
+    for example when the text file's modification time or size changes or
+    another register commits to the database. Writes go through the storage
+    backend and are applied to the cached inventory.
+
+    Reloads and writes hold the storage lock, so registers sharing one
+    inventory never lose each other's updates. A reload of the text inventory
+    only applies the journal records other registers appended.
+
+    The cached inventory is changed in place. Threads that read it while
+    another thread may write, such as the browser and the lookups of the
+    carts, read it within reading(), which holds the changes of this process
+    back until they are done.
+
+    Attributes:
+     - storage (InventoryStorage): The storage backend behind the cache.
+     - inventory (dict): The cached products, keyed by product ID.
+     - hits (int): Number of lookups served from memory.
+     - misses (int): Number of lookups that had to load a cold cache.
+     - reloads (int): Number of lookups that reloaded a changed inventory.
+
+    Methods:
+        get(self):
+            Returns the inventory, reloading it only if the storage changed.
+
+        transaction(self):
+            Holds the storage lock around a read-modify-write section.
+
+        reading(self):
+            Holds the inventory still while it is read.
+
+        save(self, inventory):
+            Writes the inventory to the storage and keeps it cached.
+
+        apply_many(self, chunks):
+            Persists a stream of record chunks in one pass.
+
+        adjust_quantities(self, changes):
+            Adds the given quantity changes to products in the inventory.
+
+        put_product(self, product):
+            Adds or replaces a product in the inventory.
+
+        delete_product(self, product_id):
+            Removes a product from the inventory.
+
+        invalidate(self):
+            Drops the cached inventory so the next lookup reads the storage.
+
+        stats(self):
+            Returns the hit/miss/reload counters as a dictionary.
+
+        subscribe(self, listener):
+            Calls a function with the records of every change to the inventory.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.inventory = None
+        self.signature = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.listeners = []
+        # Held while the cached inventory changes or is read by reading()
+        self.mutex = threading.RLock()
+
+    def get(self):
+        """
+        Returns the inventory, reloading it only if the storage changed.
+
+        Returns:
+         - dict: A dictionary containing Product instances.
+        """
+        signature = self.storage.signature()
+        if self.inventory is not None and signature == self.signature:
+            self.hits += 1
+            return self.inventory
+
+        with self.storage.lock(), self.mutex:
+            signature = self.storage.signature()
+            if self.inventory is None:
+                self.misses += 1
+                self.inventory = self.storage.load()
+                records = None
+            else:
+                self.reloads += 1
+                self.inventory, records = self.storage.refresh(self.inventory)
+            self.signature = signature
+            self.notify(records)
+        return self.inventory
+
+    @contextmanager
+    def transaction(self):
+        """
+        Holds the storage lock around a read-modify-write section, so no other
+        register changes the inventory in between.
+
+        Yields:
+         - dict: The up to date inventory.
+        """
+        with self.storage.lock():
+            yield self.get()
+
+    @contextmanager
+    def reading(self):
+        """
+        Holds the inventory still while it is read, so a write from another
+        thread never changes it halfway through. Writes in this process wait
+        until the block ends; the block should not write or call get().
+
+        Yields:
+         - dict: The up to date inventory.
+        """
+        while True:
+            inventory = self.get()
+            with self.mutex:
+                # Read the inventory get() returned, unless it was dropped since
+                if self.inventory is inventory:
+                    yield inventory
+                    return
+
+    def save(self, inventory):
+        """
+        Writes the inventory to the storage and keeps it cached.
+
+        Args:
+         - inventory (dict): A dictionary containing Product instances.
+        """
+        with self.storage.lock(), self.mutex:
+            self.storage.save(inventory)
+            self.inventory = inventory
+            self.signature = self.storage.signature()
+            self.notify(None)
+
+    def apply(self, records):
+        """
+        Persists the mutation records and applies them to the cached inventory.
+
+        Args:
+         - records (list): The mutation records.
+        """
+        with self.storage.lock():
+            inventory = self.get()
+            with self.mutex:
+                self.inventory = self.storage.apply(inventory, records)
+                self.signature = self.storage.signature()
+                self.notify(records)
+
+    def apply_many(self, chunks):
+        """
+        Persists a stream of record chunks, such as a bulk import, in one
+        pass with the storage lock held throughout. Listeners are told the
+        whole inventory was replaced.
+
+        Args:
+         - chunks (iterable): Lists of mutation records, consumed lazily.
+        """
+        with self.storage.lock(), self.mutex:
+            try:
+                self.inventory = self.storage.apply_many(self.get(), chunks)
+            except BaseException:
+                # Chunks applied in memory before the failure were not persisted
+                self.invalidate()
+                raise
+            self.signature = self.storage.signature()
+            self.notify(None)
+
+    def adjust_quantities(self, changes):
+        """
+        Adds the given quantity changes to products in the inventory.
+
+        Args:
+         - changes (dict): Quantity changes keyed by product ID, negative for
+           sold items and positive for returned items.
+        """
+        self.apply(
+            [("delta", product_id, change) for product_id, change in changes.items()]
+        )
+
+    def put_product(self, product):
+        """
+        Adds or replaces a product in the inventory.
+
+        Args:
+         - product (Product): The product to store.
+        """
+        self.apply(
+            [
+                (
+                    "set",
+                    product.name,
+                    product.product_id,
+                    product.price,
+                    product.quantity,
+                )
+            ]
+        )
+
+    def delete_product(self, product_id):
+        """
+        Removes a product from the inventory.
+
+        Args:
+         - product_id (str): The ID of the product to remove.
+        """
+        self.apply([("delete", product_id)])
+
+    def invalidate(self):
+        """
+        Drops the cached inventory so the next lookup reads the storage.
+        """
+        with self.mutex:
+            self.inventory = None
+            self.signature = None
+
+    def stats(self):
+        """
+        Returns the hit/miss/reload counters.
+
+        Returns:
+         - dict: The counters keyed by name.
+        """
+        return {"hits": self.hits, "misses": self.misses, "reloads": self.reloads}
+
+    def subscribe(self, listener):
+        """
+        Calls a function with the records of every change to the inventory,
+        made here or read from the storage. The function is called with the
+        storage lock held and should return quickly.
+
+        Args:
+         - listener (callable): Called with the list of mutation records, or
+           with None when the whole inventory was loaded or replaced.
+        """
+        self.listeners.append(listener)
+
+    def notify(self, records):
+        for listener in self.listeners:
+            listener(records)
+
+
+inventory_cache = InventoryCache(open_storage(INVENTORY_FILE))
@@ -0,0 +1,122 @@
+"""
+Usage: advisory file locks shared by every register using the same files
+"""
+
+# Imports
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from pos_core.metrics import metrics
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class FileLock:
+    """
+    An advisory lock on a file, held by one register process at a time.
+
+    The lock is re-entrant and also serializes the threads of one process,
+    so it can wrap nested read-modify-write sections. Use file_lock() to get
+    the lock for a path; two FileLock instances for the same path in one
+    process would block each other.
+
+    How long the lock is held each time is recorded in the metrics, as
+    every register waits on the registers holding it.
+
+    Attributes:
+     - path (str): The lock file.
+     - operation (str): The name the hold times are recorded under, such as
+       "lock_receipts" for receipts.lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.operation = "lock_" + os.path.basename(path).removesuffix(".lock")
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+        self.acquired = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            try:
+                self.file = open(self.path, "a+b")
+                lock_file(self.file)
+            except BaseException:
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                self.thread_lock.release()
+                raise
+            self.acquired = time.perf_counter()
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if self.depth == 0:
+            unlock_file(self.file)
+            self.file.close()
+            self.file = None
+            if metrics.enabled:
+                metrics.observe(self.operation, time.perf_counter() - self.acquired)
+        self.thread_lock.release()
+
+
+def lock_file(file):
+    """
+    Blocks until the process holds an exclusive lock on the open file.
+
+    Args:
+     - file (file): The open lock file.
+    """
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        return
+    file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            time.sleep(0.01)
+
+
+def unlock_file(file):
+    """
+    Releases the lock taken by lock_file.
+
+    Args:
+     - file (file): The open lock file.
+    """
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        return
+    file.seek(0)
+    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def file_lock(path):
+    """
+    Returns the lock for a path, shared by everything in this process.
+
+    Args:
+     - path (str): The lock file.
+
+    Returns:
+     - FileLock: The lock.
+    """
+    key = os.path.abspath(path)
+    with _locks_guard:
+        if key not in _locks:
+            _locks[key] = FileLock(path)
+        return _locks[key]
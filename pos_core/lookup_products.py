@@ -0,0 +1,129 @@
+"""
+Usage: python -m pos_core.lookup_products [product_id ...] [--inventory inventory.txt]
+
+Looks products up in the binary snapshot of a text inventory, with the
+journal applied, without loading the inventory. The inventory is loaded, and
+the snapshot made again, only if the snapshot is missing or out of date.
+"""
+
+# Imports
+import argparse
+import os
+
+from pos_core.binary_snapshot import BinarySnapshot
+from pos_core.constants import INVENTORY_FILE
+from pos_core.products import Product
+from pos_core.storage import TextStorage
+
+# The position of the product ID in each kind of journal record
+RECORD_IDS = {"delta": 1, "set": 2, "delete": 1}
+
+
+def open_current_snapshot(storage):
+    """
+    Opens the binary snapshot if it was made of the text inventory as it is
+    now. A snapshot is written after the text it was made of, so it is
+    current if it is no older than the text and was made of a text of the
+    same size.
+
+    Returns:
+     - BinarySnapshot: The snapshot, or None if it is missing or out of date.
+    """
+    try:
+        text = os.stat(storage.filename)
+        binary = os.stat(storage.binary_snapshot)
+        snapshot = BinarySnapshot(storage.binary_snapshot)
+    except (FileNotFoundError, ValueError):
+        return None
+    if snapshot.layout.size == text.st_size and binary.st_mtime_ns >= text.st_mtime_ns:
+        return snapshot
+    snapshot.close()
+    return None
+
+
+def journal_records(storage, checksum):
+    """
+    Returns the complete records of the journal, if it was written against
+    the text inventory with the checksum; a stale journal is never replayed.
+    """
+    try:
+        with open(storage.journal, "rb") as file:
+            content = file.read()
+    except FileNotFoundError:
+        return []
+    lines = content[: content.rfind(b"\n") + 1].decode().split("\n")[:-1]
+    if not lines or lines[0] != f"base,{checksum}":
+        return []
+    return [line.split(",") for line in lines[1:]]
+
+
+def lookup(snapshot, records, product_ids):
+    """
+    Looks products up in the snapshot and applies the journal records on
+    them.
+
+    Args:
+     - snapshot (BinarySnapshot): The snapshot.
+     - records (list): The journal records.
+     - product_ids (list): The IDs to look up.
+
+    Returns:
+     - dict: The products keyed by product ID, None for a product that is
+       not in the inventory.
+    """
+    products = {product_id: snapshot.get(product_id) for product_id in product_ids}
+    for record in records:
+        product_id = record[RECORD_IDS[record[0]]]
+        if product_id not in products:
+            continue
+        if record[0] == "delta":
+            if products[product_id] is not None:
+                products[product_id].add_quantity(int(record[2]))
+        elif record[0] == "set":
+            products[product_id] = Product(*record[1:])
+        else:
+            products[product_id] = None
+    return products
+
+
+def count(snapshot, records):
+    """
+    Returns the number of products in the snapshot with the journal applied.
+    """
+    present = {}
+    for record in records:
+        if record[0] != "delta":
+            present[record[RECORD_IDS[record[0]]]] = record[0] == "set"
+    return (
+        len(snapshot)
+        + sum(present.values())
+        - sum(product_id in snapshot for product_id in present)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look products up by ID")
+    parser.add_argument("product_ids", nargs="*", help="the product IDs to look up")
+    parser.add_argument("--inventory", default=INVENTORY_FILE)
+    arguments = parser.parse_args()
+
+    storage = TextStorage(arguments.inventory)
+    # Held so no register compacts the journal between the two reads
+    with storage.lock():
+        snapshot = open_current_snapshot(storage)
+        if snapshot is None:
+            # Loading makes the binary snapshot again
+            storage.load()
+            snapshot = BinarySnapshot(storage.binary_snapshot)
+        with snapshot:
+            records = journal_records(storage, snapshot.layout.checksum)
+            if arguments.product_ids:
+                products = lookup(snapshot, records, arguments.product_ids)
+                for product_id, product in products.items():
+                    print(product or f"{product_id} not found")
+            else:
+                print(f"{count(snapshot, records)} products in {snapshot.path}")
+
+
+if __name__ == "__main__":
+    main()
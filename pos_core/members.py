@@ -0,0 +1,425 @@
+"""
+Usage: loyalty members looked up by card number, and the points they earn
+"""
+
+# Imports
+import csv
+import os
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+from itertools import islice
+
+from pos_core.constants import (
+    IMPORT_CHUNK_ROWS,
+    IMPORT_ERROR_SAMPLE,
+    MEMBER_CACHE_SIZE,
+    MEMBERS_DATABASE,
+    MEMBERS_FILE,
+    POINTS_PER_KR,
+)
+from pos_core.errors import MemberNotFoundError
+from pos_core.metrics import metrics
+
+Member = namedtuple("Member", "card_number name points")
+
+MemberImport = namedtuple("MemberImport", "rows imported rejected errors")
+
+
+def parse_member(row):
+    """
+    Validates a "card_number,name,points" row of a members file.
+
+    Args:
+     - row (list): The fields of the row.
+
+    Returns:
+     - tuple: The card number, the name and the points, 0 if left empty.
+
+    Raises:
+     - ValueError: With the reason if the row is invalid.
+    """
+    if len(row) != 3:
+        raise ValueError(f"expected 3 fields, found {len(row)}")
+    card_number, name, points_text = (field.strip() for field in row)
+    if not card_number:
+        raise ValueError("missing card number")
+    if not name:
+        raise ValueError("missing name")
+    try:
+        points = int(points_text or 0)
+    except ValueError:
+        points = -1
+    if points < 0:
+        raise ValueError(f"invalid points {points_text!r}")
+    return (card_number, name, points)
+
+
+def points_for(amount):
+    """
+    Returns the points earned for an amount.
+
+    Args:
+     - amount (float): The amount in kr.
+
+    Returns:
+     - int: POINTS_PER_KR per whole kr, rounded towards zero.
+    """
+    return int(amount * POINTS_PER_KR)
+
+
+class LRUCache:
+    """
+    A dictionary holding at most size entries, dropping the least recently
+    used entry when full.
+
+    Attributes:
+     - size (int): The most entries held.
+     - hits (int): Lookups served from the cache.
+     - misses (int): Lookups of keys not in the cache.
+
+    Methods:
+        get(self, key):
+            Returns the value of a key, or None.
+
+        put(self, key, value):
+            Stores a value.
+
+        pop(self, key):
+            Drops a key.
+
+        clear(self):
+            Drops every entry.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def pop(self, key):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class MemberStore:
+    """
+    The loyalty members in an SQLite database indexed by card number, with
+    the recently used cards kept in memory.
+
+    A card lookup is a dictionary hit for hot cards and one primary key
+    lookup for the rest, however many members there are; nothing is loaded
+    up front. Other registers may change points in the same database, so the
+    cache is dropped whenever SQLite's data_version shows another connection
+    committed.
+
+    Every points change is also kept in a ledger with the receipt it was
+    made for, so the points of a purchase can be found again when it is
+    returned.
+
+    The first time the database is opened, members.txt, with one
+    "card_number,name,points" line per member, is imported if it exists.
+    Lines that can't be imported are skipped with a warning rather than
+    failing the lookup that opened the database.
+
+    Attributes:
+     - path (str): The members database.
+     - source (str): The text file imported into a new database.
+     - cache (LRUCache): The recently used members, keyed by card number.
+
+    Methods:
+        find(self, card_number):
+            Returns a member, or None.
+
+        get(self, card_number):
+            Returns a member, raising MemberNotFoundError if there is none.
+
+        add_member(self, card_number, name, points=0):
+            Adds or replaces a member.
+
+        add_points(self, card_number, points, receipt_number=None):
+            Adds points to a member.
+
+        add_points_many(self, changes):
+            Adds points to several members in one transaction.
+
+        points_of_receipt(self, receipt_number):
+            Returns the member and the points of a receipt.
+
+        import_text(self, path):
+            Imports members from a text file, skipping invalid lines.
+    """
+
+    def __init__(
+        self, path=MEMBERS_DATABASE, source=MEMBERS_FILE, cache_size=MEMBER_CACHE_SIZE
+    ):
+        self.path = path
+        self.source = source
+        self.cache = LRUCache(cache_size)
+        self.data_version = None
+        self._connection = None
+        # One connection is shared by the threads of the register
+        self.lock = threading.RLock()
+
+    @property
+    def connection(self):
+        """
+        The connection to the database, opened and set up on first use.
+        """
+        with self.lock:
+            return self.open()
+
+    def open(self):
+        if self._connection is None:
+            new = not os.path.exists(self.path)
+            self._connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS members (
+                    card_number TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    points INTEGER NOT NULL
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS points (
+                    receipt_number INTEGER,
+                    card_number TEXT NOT NULL,
+                    points INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS points_by_receipt
+                    ON points (receipt_number);
+                """)
+            if new and self.source and os.path.exists(self.source):
+                self.import_source()
+        return self._connection
+
+    def import_source(self):
+        """
+        Imports the members text file into a new database, printing a warning
+        for the lines that weren't imported.
+        """
+        try:
+            report = self.import_text(self.source)
+        except (OSError, UnicodeDecodeError) as error:
+            print(f"\nWarning: members in {self.source} not imported: {error}\n")
+            return
+        if report.rejected:
+            lines = ", ".join(
+                f"line {line}: {reason}" for line, reason in report.errors
+            )
+            print(
+                f"\nWarning: {report.rejected} lines of {self.source} not imported"
+                f" ({lines})\n"
+            )
+
+    def check_cache(self):
+        """
+        Drops the cached members if another connection changed the database.
+        """
+        (version,) = self.connection.execute("PRAGMA data_version").fetchone()
+        if version != self.data_version:
+            self.cache.clear()
+            self.data_version = version
+
+    @metrics.timed("member_lookup")
+    def find(self, card_number):
+        """
+        Returns a member.
+
+        Args:
+         - card_number (str): The number on the member's card.
+
+        Returns:
+         - Member: The member, or None if there is no member with the card.
+        """
+        card_number = card_number.strip()
+        with self.lock:
+            self.check_cache()
+            member = self.cache.get(card_number)
+            if member is None:
+                row = self.connection.execute(
+                    "SELECT card_number, name, points FROM members"
+                    " WHERE card_number = ?",
+                    (card_number,),
+                ).fetchone()
+                if row is None:
+                    return None
+                member = Member(*row)
+                self.cache.put(card_number, member)
+            return member
+
+    def get(self, card_number):
+        """
+        Returns a member.
+
+        Args:
+         - card_number (str): The number on the member's card.
+
+        Returns:
+         - Member: The member.
+
+        Raises:
+         - MemberNotFoundError: If there is no member with the card.
+        """
+        member = self.find(card_number)
+        if member is None:
+            raise MemberNotFoundError(card_number)
+        return member
+
+    def add_member(self, card_number, name, points=0):
+        """
+        Adds a member, replacing any member with the same card.
+
+        Returns:
+         - Member: The stored member.
+        """
+        member = Member(card_number, name, int(points))
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO members VALUES (?, ?, ?)", member
+            )
+            self.cache.pop(card_number)
+        return member
+
+    def add_points(self, card_number, points, receipt_number=None):
+        """
+        Adds points to a member, or removes them if negative. Points never go
+        below zero.
+
+        Args:
+         - card_number (str): The member's card.
+         - points (int): The points to add.
+         - receipt_number (int): The receipt the points were earned or
+           returned on.
+
+        Returns:
+         - Member: The member with the new points.
+
+        Raises:
+         - MemberNotFoundError: If there is no member with the card.
+        """
+        self.add_points_many([(card_number, points, receipt_number)])
+        return self.get(card_number)
+
+    @metrics.timed("member_points")
+    def add_points_many(self, changes):
+        """
+        Adds points to several members in one transaction. Cards with no
+        member, such as a member removed after being attached to a cart, are
+        skipped.
+
+        Args:
+         - changes (list): (card_number, points, receipt_number) tuples.
+        """
+        with self.lock, self.connection:
+            for card_number, points, receipt_number in changes:
+                cursor = self.connection.execute(
+                    "UPDATE members SET points = MAX(points + ?, 0)"
+                    " WHERE card_number = ?",
+                    (points, card_number),
+                )
+                if cursor.rowcount == 0:
+                    continue
+                self.connection.execute(
+                    "INSERT INTO points VALUES (?, ?, ?)",
+                    (receipt_number, card_number, points),
+                )
+                self.cache.pop(card_number)
+
+    def points_of_receipt(self, receipt_number):
+        """
+        Returns the member and the points of a receipt.
+
+        Args:
+         - receipt_number (int): The receipt number.
+
+        Returns:
+         - tuple: The card number and the points earned or returned, or None
+           if no member was attached to the receipt.
+        """
+        with self.lock:
+            return self.connection.execute(
+                "SELECT card_number, points FROM points WHERE receipt_number = ?",
+                (receipt_number,),
+            ).fetchone()
+
+    def import_text(self, path):
+        """
+        Imports members from a text file with one "card_number,name,points"
+        line per member, replacing members with the same cards. Names with
+        commas must be quoted, as in a CSV file. Invalid lines are skipped
+        and counted. The file is read in chunks, so it never sits in memory.
+
+        Args:
+         - path (str): The text file.
+
+        Returns:
+         - MemberImport: The number of lines read, imported and rejected,
+           and the first IMPORT_ERROR_SAMPLE (line, reason) pairs.
+        """
+        errors = []
+        rejected = 0
+
+        def parsed(reader):
+            nonlocal rejected
+            for row in reader:
+                if not any(field.strip() for field in row):
+                    continue
+                try:
+                    member = parse_member(row)
+                except ValueError as error:
+                    rejected += 1
+                    if len(errors) < IMPORT_ERROR_SAMPLE:
+                        errors.append((reader.line_num, str(error)))
+                    continue
+                yield member
+
+        imported = 0
+        with self.lock, open(path, newline="", encoding="utf-8-sig") as file:
+            rows = parsed(csv.reader(file))
+            while chunk := list(islice(rows, IMPORT_CHUNK_ROWS)):
+                with self.connection:
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO members VALUES (?, ?, ?)", chunk
+                    )
+                imported += len(chunk)
+            self.cache.clear()
+        return MemberImport(imported + rejected, imported, rejected, errors)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+         - dict: The counters keyed by name.
+        """
+        return {
+            "cached": len(self.cache),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+        }
+
+
+member_store = MemberStore()
@@ -0,0 +1,361 @@
+"""
+Usage: latency histograms and I/O byte counters for the register operations,
+exported in the Prometheus text format
+"""
+
+# Imports
+import bisect
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+from pos_core.constants import METRICS_ENABLED
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+# Observations kept before they are folded into the histograms
+PENDING_LIMIT = 10000
+
+
+class Histogram:
+    """
+    Counts of latencies per bucket, with their sum.
+
+    Attributes:
+     - buckets (list): The number of observations per bucket of LATENCY_BUCKETS,
+       plus one bucket for anything slower.
+     - count (int): The number of observations.
+     - total (float): The sum of the observations, in seconds.
+     - errors (int): The number of observations of failed calls.
+    """
+
+    __slots__ = ("buckets", "count", "total", "errors")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+    def quantile(self, fraction):
+        """
+        Returns the upper bound of the bucket holding a quantile.
+
+        Args:
+         - fraction (float): The quantile, 0.5 for the median.
+
+        Returns:
+         - float: The latency in seconds, inf if it is above every bucket.
+        """
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """
+    Latency histograms per operation and bytes read and written per file kind.
+
+    Operations are recorded with the timed() decorator; the storage and
+    receipt code report their file I/O with read() and written(). A call only
+    appends its latency to a deque, which is thread-safe without a lock; the
+    histograms are brought up to date when they are read, so the metrics can
+    stay on in production.
+
+    Attributes:
+     - enabled (bool): Whether anything is recorded.
+     - latencies (dict): Histogram instances keyed by operation.
+     - bytes_read (dict): Bytes read keyed by file kind.
+     - bytes_written (dict): Bytes written keyed by file kind.
+
+    Methods:
+        timed(self, operation):
+            Decorator recording the latency of every call.
+
+        read(self, kind, size):
+            Counts bytes read from a file.
+
+        written(self, kind, size):
+            Counts bytes written to a file.
+
+        to_prometheus(self):
+            Returns every metric in the Prometheus text format.
+
+        write_prometheus(self, path):
+            Writes the metrics to a file for a node exporter to pick up.
+
+        start_flushing(self, path, interval):
+            Writes the metrics file every interval seconds on a daemon thread.
+
+        summary(self):
+            Returns a table of the metrics for the diagnostics panel.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.latencies = {}
+        self.bytes_read = {}
+        self.bytes_written = {}
+        self.pending = deque()
+        self.lock = threading.Lock()
+
+    def observe(self, operation, seconds, failed=False):
+        """
+        Records one call of an operation.
+
+        Args:
+         - operation (str): The name of the operation.
+         - seconds (float): How long the call took.
+         - failed (bool): Whether the call raised an exception.
+        """
+        self.pending.append((operation, seconds, failed))
+        if len(self.pending) > PENDING_LIMIT:
+            with self.lock:
+                self.collect()
+
+    def collect(self):
+        """
+        Moves the pending observations into the histograms. Call with the
+        lock held.
+        """
+        while True:
+            try:
+                operation, seconds, failed = self.pending.popleft()
+            except IndexError:
+                return
+            histogram = self.latencies.get(operation)
+            if histogram is None:
+                histogram = self.latencies[operation] = Histogram()
+            histogram.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            histogram.count += 1
+            histogram.total += seconds
+            if failed:
+                histogram.errors += 1
+
+    def timed(self, operation):
+        """
+        Decorator recording the latency of every call of a function.
+
+        Args:
+         - operation (str): The name the calls are recorded under.
+
+        Returns:
+         - function: The decorator.
+        """
+
+        clock = time.perf_counter
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = clock()
+                try:
+                    result = function(*args, **kwargs)
+                except BaseException:
+                    self.observe(operation, clock() - start, True)
+                    raise
+                self.observe(operation, clock() - start)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def read(self, kind, size):
+        """
+        Counts bytes read from a file.
+
+        Args:
+         - kind (str): The kind of file, e.g. "inventory" or "receipts".
+         - size (int): The number of bytes.
+        """
+        if self.enabled:
+            with self.lock:
+                self.bytes_read[kind] = self.bytes_read.get(kind, 0) + size
+
+    def written(self, kind, size):
+        """
+        Counts bytes written to a file.
+
+        Args:
+         - kind (str): The kind of file, e.g. "inventory" or "receipts".
+         - size (int): The number of bytes.
+        """
+        if self.enabled:
+            with self.lock:
+                self.bytes_written[kind] = self.bytes_written.get(kind, 0) + size
+
+    def reset(self):
+        """
+        Drops everything recorded so far.
+        """
+        with self.lock:
+            self.pending.clear()
+            self.latencies.clear()
+            self.bytes_read.clear()
+            self.bytes_written.clear()
+
+    def to_prometheus(self):
+        """
+        Returns every metric in the Prometheus text exposition format.
+
+        Returns:
+         - str: The metrics.
+        """
+        with self.lock:
+            self.collect()
+            latencies = {
+                operation: (
+                    list(histogram.buckets),
+                    histogram.count,
+                    histogram.total,
+                    histogram.errors,
+                )
+                for operation, histogram in self.latencies.items()
+            }
+            bytes_read = dict(self.bytes_read)
+            bytes_written = dict(self.bytes_written)
+
+        lines = [
+            "# HELP pos_operation_duration_seconds Latency of register operations.",
+            "# TYPE pos_operation_duration_seconds histogram",
+        ]
+        for operation, (buckets, count, total, _) in sorted(latencies.items()):
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(
+                    f'pos_operation_duration_seconds_bucket{{operation="{operation}",'
+                    f'le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'pos_operation_duration_seconds_bucket{{operation="{operation}",'
+                f'le="+Inf"}} {count}'
+            )
+            lines.append(
+                f'pos_operation_duration_seconds_sum{{operation="{operation}"}} {total}'
+            )
+            lines.append(
+                f'pos_operation_duration_seconds_count{{operation="{operation}"}} {count}'
+            )
+
+        lines += [
+            "# HELP pos_operation_errors_total Register operations that raised.",
+            "# TYPE pos_operation_errors_total counter",
+        ]
+        for operation, (_, _, _, errors) in sorted(latencies.items()):
+            lines.append(
+                f'pos_operation_errors_total{{operation="{operation}"}} {errors}'
+            )
+
+        for name, counters in (("read", bytes_read), ("written", bytes_written)):
+            lines += [
+                f"# HELP pos_io_bytes_{name}_total Bytes {name} per kind of file.",
+                f"# TYPE pos_io_bytes_{name}_total counter",
+            ]
+            for kind, size in sorted(counters.items()):
+                lines.append(f'pos_io_bytes_{name}_total{{file="{kind}"}} {size}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Writes the metrics to a file, replacing it in one step so a scraper
+        never reads half a file.
+
+        Args:
+         - path (str): The .prom file, e.g. in a node exporter textfile folder.
+        """
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as file:
+            file.write(self.to_prometheus())
+        os.replace(temporary_path, path)
+
+    def start_flushing(self, path, interval=15):
+        """
+        Writes the metrics file every interval seconds on a daemon thread.
+
+        Args:
+         - path (str): The .prom file.
+         - interval (float): Seconds between writes.
+
+        Returns:
+         - threading.Event: Set it to stop flushing after one last write.
+        """
+        stopped = threading.Event()
+
+        def flush():
+            while not stopped.wait(interval):
+                self.write_prometheus(path)
+            self.write_prometheus(path)
+
+        threading.Thread(target=flush, name="metrics-flush", daemon=True).start()
+        return stopped
+
+    def summary(self):
+        """
+        Returns a table of the metrics for the diagnostics panel.
+
+        Returns:
+         - str: One line per operation and per kind of file.
+        """
+        with self.lock:
+            self.collect()
+            lines = [
+                f"{'operation':<24}{'count':>8}{'errors':>8}{'p50':>10}{'p99':>10}"
+            ]
+            for operation, histogram in sorted(self.latencies.items()):
+                lines.append(
+                    f"{operation:<24}{histogram.count:>8}{histogram.errors:>8}"
+                    f"{format_seconds(histogram.quantile(0.5)):>10}"
+                    f"{format_seconds(histogram.quantile(0.99)):>10}"
+                )
+            lines.append("")
+            lines.append(f"{'file':<24}{'read':>14}{'written':>14}")
+            for kind in sorted(set(self.bytes_read) | set(self.bytes_written)):
+                lines.append(
+                    f"{kind:<24}{self.bytes_read.get(kind, 0):>14}"
+                    f"{self.bytes_written.get(kind, 0):>14}"
+                )
+        return "\n".join(lines)
+
+
+def format_seconds(seconds):
+    """
+    Formats a bucket bound for the diagnostics panel.
+
+    Args:
+     - seconds (float): The latency.
+
+    Returns:
+     - str: The latency in milliseconds, or ">5s" above every bucket.
+    """
+    if seconds == float("inf"):
+        return f">{LATENCY_BUCKETS[-1]:g}s"
+    return f"{seconds * 1000:g}ms"
+
+
+metrics = Metrics(enabled=METRICS_ENABLED)
@@ -0,0 +1,460 @@
+"""
+Usage: product model shared by the inventory, the cart and the receipts
+"""
+
+# Imports
+from array import array
+from collections.abc import MutableMapping
+
+# Markers for the hash table slots of a ProductStore that hold no row
+EMPTY = -1
+DELETED = -2
+
+
+class BaseProduct:
+    """
+    Behaviour shared by Product and the ProductRow views of a ProductStore.
+
+    Methods:
+        __repr__(self):
+            Returns a string representation of the product.
+
+        add_quantity(self, quantity):
+            Adds the specified quantity to the product's existing quantity.
+
+        remove_quantity(self, quantity):
+            Removes the specified quantity from the product's existing quantity.
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"{self.name} ({self.product_id}): {self.price} kr, {self.quantity} st"
+
+    def add_quantity(self, quantity):
+        """
+        Adds the specified quantity to the product's existing quantity.
+
+        Args:
+         - quantity (int): The quantity to be added.
+        """
+        self.quantity += quantity
+
+    def remove_quantity(self, quantity):
+        """
+        Removes the specified quantity from the product's existing quantity.
+
+        Args:
+         - quantity (int): The quantity to be removed.
+        """
+        self.quantity -= quantity
+
+
+class Product(BaseProduct):
+    """
+    A class representing a product with basic information.
+
+    Attributes:
+     - name (str): The name of the product.
+     - product_id (int): The unique identifier for the product.
+     - price (float): The price of the product.
+     - quantity (int): The quantity of the product available.
+
+    Methods:
+        __init__(self, name, product_id, price, quantity):
+            Initializes a new Product instance.
+    """
+
+    __slots__ = ("name", "product_id", "price", "quantity")
+
+    def __init__(self, name, product_id, price, quantity):
+        self.name = name
+        self.product_id = product_id
+        self.price = float(price)
+        self.quantity = int(quantity)
+
+
+class ProductRow(BaseProduct):
+    """
+    A lightweight view of one row of a ProductStore that behaves like a Product.
+
+    Setting the price or quantity writes straight into the store's columns.
+
+    Attributes:
+     - store (ProductStore): The store holding the row.
+     - row (int): The row number in the store.
+    """
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def name(self):
+        return self.store.name_at(self.row)
+
+    @property
+    def product_id(self):
+        return self.store.id_at(self.row)
+
+    @property
+    def price(self):
+        return self.store.prices[self.row]
+
+    @price.setter
+    def price(self, price):
+        self.store.prices[self.row] = price
+
+    @property
+    def quantity(self):
+        return self.store.quantities[self.row]
+
+    @quantity.setter
+    def quantity(self, quantity):
+        self.store.quantities[self.row] = quantity
+
+
+class ProductStore(MutableMapping):
+    """
+    A compact inventory keeping products in parallel columns instead of objects.
+
+    Prices and quantities live in typed arrays, and names and product IDs in
+    UTF-8 string tables, so no product needs a Python object of its own. A
+    product ID is found through an open addressing hash table of row numbers,
+    kept at most half full. A product costs 8 bytes of price, 8 of quantity,
+    8 of name offset and length, 4 of ID offset and 8 to 16 of hash table,
+    plus its name and ID. benchmarks/inventory_memory.py measures about 60
+    bytes per SKU at 1M SKUs, against about 240 for a dictionary of slotted
+    Product instances.
+
+    Looking up a product ID returns a ProductRow view, which keeps
+    inventory[product_id] working like a dictionary of Product instances.
+    Deleted rows are left as holes, and a renamed product's old name stays in
+    the string table. Both are squeezed out once they make up half of the
+    store, so views should not be kept across deletions and renames.
+
+    Attributes:
+     - slots (array): The hash table of row numbers, EMPTY or DELETED.
+     - id_bytes (bytearray): The UTF-8 product ID of every row, each
+       followed by a newline.
+     - id_starts (array): The offset of every row's ID in id_bytes, and the
+       size of id_bytes.
+     - holes (set): The deleted rows.
+     - prices (array): The price of every row.
+     - quantities (array): The quantity of every row.
+     - unused_name_bytes (int): The bytes of names no row uses any more.
+     - squeezes (int): How many times the rows were renumbered by squeeze().
+
+    Methods:
+        from_columns(cls, id_bytes, id_starts, names, name_offsets, name_lengths, prices, quantities):
+            Builds a store around ready-made columns.
+
+        reserve(self, count):
+            Makes room in the hash table for the given number of products.
+
+        put(self, name, product_id, price, quantity):
+            Adds or replaces a product without building a Product first.
+
+        row_of(self, product_id):
+            Returns the row of a product ID.
+
+        id_at(self, row):
+            Returns the product ID stored for a row.
+
+        row_ids(self):
+            Returns the product ID of every row.
+
+        name_at(self, row):
+            Returns the name stored for a row.
+
+        values(self):
+            Yields a view of every product in insertion order.
+    """
+
+    def __init__(self, products=()):
+        self.slots = array("i", [EMPTY]) * 8
+        self.used_slots = 0
+        self.id_bytes = bytearray()
+        self.id_starts = array("I", [0])
+        self.holes = set()
+        self.prices = array("d")
+        self.quantities = array("q")
+        self.names = bytearray()
+        self.name_offsets = array("I")
+        self.name_lengths = array("I")
+        self.unused_name_bytes = 0
+        self.squeezes = 0
+        for product in products:
+            self[product.product_id] = product
+
+    @classmethod
+    def from_columns(
+        cls, id_bytes, id_starts, names, name_offsets, name_lengths, prices, quantities
+    ):
+        """
+        Builds a store around ready-made columns, such as those read from a
+        binary snapshot, without adding the products one by one.
+
+        Args:
+         - id_bytes (bytearray): The UTF-8 product ID of every row, each
+           followed by a newline.
+         - id_starts (array): The offset of every row's ID in id_bytes, and
+           the size of id_bytes.
+         - names (bytearray): The UTF-8 names of every row.
+         - name_offsets (array): The offset of every row's name in names.
+         - name_lengths (array): The length of every row's name in bytes.
+         - prices (array): The price of every row.
+         - quantities (array): The quantity of every row.
+
+        Returns:
+         - ProductStore: The store, using the given columns.
+
+        Raises:
+         - ValueError: If a product ID is on more than one row.
+        """
+        store = cls()
+        store.id_bytes = id_bytes
+        store.id_starts = id_starts
+        store.names = names
+        store.name_offsets = name_offsets
+        store.name_lengths = name_lengths
+        store.unused_name_bytes = len(names) - sum(name_lengths)
+        store.prices = prices
+        store.quantities = quantities
+        store.rehash(table_size(len(prices)))
+        return store
+
+    @property
+    def row_count(self):
+        """
+        The number of rows, deleted ones included.
+        """
+        return len(self.prices)
+
+    def rehash(self, size):
+        """
+        Rebuilds the hash table with the given number of slots, a power of
+        two, dropping the DELETED markers.
+
+        Raises:
+         - ValueError: If a product ID is on more than one live row.
+        """
+        slots = array("i", [EMPTY]) * size
+        mask = size - 1
+        ids = self.row_ids()
+        rows = enumerate(map(mask.__and__, map(hash, ids)))
+        if self.holes:
+            rows = ((row, slot) for row, slot in rows if row not in self.holes)
+        for row, slot in rows:
+            while (other := slots[slot]) != EMPTY:
+                if ids[other] == ids[row]:
+                    raise ValueError(f"duplicate product ID {ids[row]}")
+                slot = (slot + 1) & mask
+            slots[slot] = row
+        self.slots = slots
+        self.used_slots = self.row_count - len(self.holes)
+
+    def reserve(self, count):
+        """
+        Makes room in the hash table for the given number of products, so
+        adding them one by one never has to rebuild it.
+
+        Args:
+         - count (int): The number of products the store will hold.
+        """
+        size = table_size(count)
+        if size > len(self.slots):
+            self.rehash(size)
+
+    def find(self, product_id):
+        """
+        Returns the slot of a product ID in the hash table, and its row.
+
+        Returns:
+         - tuple: The slot and the row, or the slot the product ID would go
+           in and None if the product is not in the store.
+        """
+        slots = self.slots
+        mask = len(slots) - 1
+        slot = hash(product_id) & mask
+        free = None
+        wanted = None
+        while (row := slots[slot]) != EMPTY:
+            if row == DELETED:
+                if free is None:
+                    free = slot
+            else:
+                if wanted is None:
+                    wanted = product_id.encode()
+                if (
+                    self.id_bytes[self.id_starts[row] : self.id_starts[row + 1] - 1]
+                    == wanted
+                ):
+                    return slot, row
+            slot = (slot + 1) & mask
+        return (slot if free is None else free), None
+
+    def row_of(self, product_id):
+        """
+        Returns the row of a product ID.
+
+        Args:
+         - product_id (str): The product ID.
+
+        Returns:
+         - int: The row, or None if the product is not in the store.
+        """
+        return self.find(product_id)[1]
+
+    def id_at(self, row):
+        """
+        Returns the product ID stored for a row.
+
+        Args:
+         - row (int): The row number.
+
+        Returns:
+         - str: The product ID, or None if the row was deleted.
+        """
+        if row in self.holes:
+            return None
+        return self.id_bytes[self.id_starts[row] : self.id_starts[row + 1] - 1].decode()
+
+    def row_ids(self):
+        """
+        Returns the product ID of every row, deleted rows included, decoded in
+        one go.
+
+        Returns:
+         - list: The product IDs in row order.
+        """
+        return self.id_bytes.decode().split("\n")[:-1]
+
+    def put(self, name, product_id, price, quantity):
+        """
+        Adds or replaces a product without building a Product first.
+
+        Args:
+         - name (str): The name of the product.
+         - product_id (str): The ID of the product.
+         - price (float): The price of the product.
+         - quantity (int): The quantity of the product.
+        """
+        encoded_name = name.encode()
+        slot, row = self.find(product_id)
+        if row is None:
+            slots = self.slots
+            if slots[slot] == EMPTY:
+                self.used_slots += 1
+            slots[slot] = len(self.prices)
+            id_bytes = self.id_bytes
+            id_bytes += f"{product_id}\n".encode()
+            self.id_starts.append(len(id_bytes))
+            self.prices.append(float(price))
+            self.quantities.append(int(quantity))
+            names = self.names
+            self.name_offsets.append(len(names))
+            self.name_lengths.append(len(encoded_name))
+            names += encoded_name
+            if self.used_slots * 2 > len(slots):
+                self.rehash(table_size(len(self)))
+            return
+
+        self.prices[row] = float(price)
+        self.quantities[row] = int(quantity)
+        if encoded_name != self.name_bytes(row):
+            self.unused_name_bytes += self.name_lengths[row]
+            self.name_offsets[row] = len(self.names)
+            self.name_lengths[row] = len(encoded_name)
+            self.names += encoded_name
+            if self.unused_name_bytes * 2 > len(self.names):
+                self.squeeze()
+
+    def name_bytes(self, row):
+        """
+        Returns the encoded name stored for a row.
+        """
+        offset = self.name_offsets[row]
+        return bytes(self.names[offset : offset + self.name_lengths[row]])
+
+    def name_at(self, row):
+        """
+        Returns the name stored for a row.
+
+        Args:
+         - row (int): The row number.
+
+        Returns:
+         - str: The name of the product.
+        """
+        return self.name_bytes(row).decode()
+
+    def __getitem__(self, product_id):
+        row = self.row_of(product_id)
+        if row is None:
+            raise KeyError(product_id)
+        return ProductRow(self, row)
+
+    def __setitem__(self, product_id, product):
+        self.put(product.name, product_id, product.price, product.quantity)
+
+    def __delitem__(self, product_id):
+        slot, row = self.find(product_id)
+        if row is None:
+            raise KeyError(product_id)
+        self.slots[slot] = DELETED
+        self.holes.add(row)
+        self.unused_name_bytes += self.name_lengths[row]
+        if len(self.holes) * 2 > self.row_count or self.unused_name_bytes * 2 > len(
+            self.names
+        ):
+            self.squeeze()
+
+    def __contains__(self, product_id):
+        return self.row_of(product_id) is not None
+
+    def __iter__(self):
+        for row, product_id in enumerate(self.row_ids()):
+            if row not in self.holes:
+                yield product_id
+
+    def __len__(self):
+        return self.row_count - len(self.holes)
+
+    def values(self):
+        """
+        Yields a view of every product in insertion order.
+        """
+        for row in range(self.row_count):
+            if row not in self.holes:
+                yield ProductRow(self, row)
+
+    def squeeze(self):
+        """
+        Rebuilds the columns without deleted rows and unused name bytes.
+        """
+        ids = self.row_ids()
+        rows = [row for row in range(self.row_count) if row not in self.holes]
+        names = [self.name_bytes(row) for row in rows]
+        prices = [self.prices[row] for row in rows]
+        quantities = [self.quantities[row] for row in rows]
+
+        squeezes = self.squeezes + 1
+        self.__init__()
+        self.reserve(len(rows))
+        for row, name, price, quantity in zip(rows, names, prices, quantities):
+            self.put(name.decode(), ids[row], price, quantity)
+        self.squeezes = squeezes
+
+
+def table_size(count):
+    """
+    Returns the number of hash table slots for a number of products: the
+    smallest power of two, at least 8, that keeps the table at most half full.
+    """
+    size = 8
+    while size < count * 2:
+        size *= 2
+    return size
@@ -0,0 +1,465 @@
+"""
+Usage: multi-buy, bundle and time-of-day promotions priced incrementally as
+items are added to and removed from a cart
+"""
+
+# Imports
+import json
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from pos_core.constants import PROMOTIONS_FILE
+
+
+def minutes_of(clock):
+    """
+    Returns the minutes since midnight of a "HH:MM" time.
+    """
+    hours, minutes = clock.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def line_price(items, product_id):
+    """
+    Returns the price of a cart line as the receipt shows it, 0 for a
+    product not in the cart.
+    """
+    line = items.get(product_id)
+    return round(line.price * line.quantity) if line is not None else 0
+
+
+def split_amount(amount, weights):
+    """
+    Splits a whole amount in proportion to whole weights, giving the kr left
+    after rounding down to the largest remainders.
+
+    Args:
+     - amount (int): The amount to split.
+     - weights (dict): The weights, keyed by what the parts are for.
+
+    Returns:
+     - dict: The parts, adding up to the amount, with the same keys.
+    """
+    if len(weights) == 1:
+        return dict.fromkeys(weights, amount)
+    total = sum(weights.values())
+    if total == 0:
+        weights = dict.fromkeys(weights, 1)
+        total = len(weights)
+    parts = {key: amount * weight // total for key, weight in weights.items()}
+    left = amount - sum(parts.values())
+    if left:
+        remainders = sorted(
+            weights, key=lambda key: (-(amount * weights[key] % total), key)
+        )
+        for key in remainders[:left]:
+            parts[key] += 1
+    return parts
+
+
+class Promotion(ABC):
+    """
+    A promotion on a set of products, the base of the promotion kinds.
+
+    A promotion can be limited to a time of day, from start to end, and to
+    days of the week. Promotions on the same product stack.
+
+    Attributes:
+     - promotion_id (str): The unique identifier of the promotion.
+     - name (str): The name shown on the receipt.
+     - product_ids (frozenset): The products the promotion applies to.
+     - start (int): Minutes after midnight the promotion starts, or None.
+     - end (int): Minutes after midnight the promotion ends, or None.
+     - days (frozenset): The weekdays, 0 for Monday, or None for every day.
+
+    Methods:
+        active(self, moment):
+            Returns whether the promotion applies at a moment.
+
+        discount(self, lines):
+            Returns the discount on the cart lines of the products.
+    """
+
+    def __init__(
+        self, promotion_id, name, product_ids, start=None, end=None, days=None
+    ):
+        self.promotion_id = promotion_id
+        self.name = name
+        self.product_ids = frozenset(product_ids)
+        self.start = minutes_of(start) if start else None
+        self.end = minutes_of(end) if end else None
+        self.days = frozenset(days) if days is not None else None
+
+    def active(self, moment):
+        """
+        Returns whether the promotion applies at a moment.
+
+        Args:
+         - moment (datetime): The moment.
+
+        Returns:
+         - bool: True if the moment is on one of the days and between the
+           start and the end. An end before the start runs past midnight.
+        """
+        if self.days is not None and moment.weekday() not in self.days:
+            return False
+        if self.start is None or self.end is None:
+            return True
+        minute = moment.hour * 60 + moment.minute
+        if self.start <= self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    @abstractmethod
+    def discount(self, lines):
+        """
+        Returns the discount on the cart lines of the products.
+
+        Args:
+         - lines (list): The cart lines of the products of the promotion.
+
+        Returns:
+         - int: The discount in whole kr, never negative.
+        """
+
+
+class MultiBuy(Promotion):
+    """
+    Any quantity items of the products for a price, e.g. 3 for 50 kr. The
+    most expensive items are grouped first.
+
+    Attributes:
+     - quantity (int): The number of items in a group.
+     - price (float): The price of a group.
+    """
+
+    def __init__(self, promotion_id, name, product_ids, quantity, price, **when):
+        super().__init__(promotion_id, name, product_ids, **when)
+        self.quantity = int(quantity)
+        self.price = float(price)
+        if self.quantity < 1:
+            raise ValueError(f"promotion {promotion_id}: quantity must be positive")
+
+    def discount(self, lines):
+        groups = sum(line.quantity for line in lines) // self.quantity
+        if groups == 0:
+            return 0
+        left = groups * self.quantity
+        full_price = 0.0
+        for line in sorted(lines, key=lambda line: line.price, reverse=True):
+            taken = min(line.quantity, left)
+            full_price += line.price * taken
+            left -= taken
+            if left == 0:
+                break
+        return max(0, round(full_price - groups * self.price))
+
+
+class Bundle(Promotion):
+    """
+    One of each of the products for a price, e.g. a lunch deal.
+
+    Attributes:
+     - price (float): The price of a bundle.
+    """
+
+    def __init__(self, promotion_id, name, product_ids, price, **when):
+        super().__init__(promotion_id, name, product_ids, **when)
+        self.price = float(price)
+
+    def discount(self, lines):
+        if len(lines) < len(self.product_ids):
+            return 0
+        bundles = min(line.quantity for line in lines)
+        full_price = sum(line.price for line in lines)
+        return max(0, round(bundles * (full_price - self.price)))
+
+
+class PercentOff(Promotion):
+    """
+    A percentage off the products, e.g. 20% off during happy hour.
+
+    Attributes:
+     - percent (float): The percentage taken off.
+    """
+
+    def __init__(self, promotion_id, name, product_ids, percent, **when):
+        super().__init__(promotion_id, name, product_ids, **when)
+        self.percent = float(percent)
+
+    def discount(self, lines):
+        full_price = sum(line.price * line.quantity for line in lines)
+        return max(0, round(full_price * self.percent / 100))
+
+
+KINDS = {"multibuy": MultiBuy, "bundle": Bundle, "percent": PercentOff}
+
+
+class Promotions:
+    """
+    The active promotions, compiled into an index from product ID to the
+    promotions on the product, so a cart change only looks at the
+    promotions it can affect.
+
+    Attributes:
+     - rules (dict): The promotions, keyed by promotion ID.
+     - by_product (dict): Tuples of the promotions on each product, keyed by
+       product ID.
+
+    Methods:
+        affected(self, product_id):
+            Returns the promotions on a product.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = {}
+        by_product = {}
+        for promotion in rules:
+            if promotion.promotion_id in self.rules:
+                raise ValueError(f"duplicate promotion {promotion.promotion_id}")
+            self.rules[promotion.promotion_id] = promotion
+            for product_id in promotion.product_ids:
+                by_product.setdefault(product_id, []).append(promotion)
+        self.by_product = {
+            product_id: tuple(promotions)
+            for product_id, promotions in by_product.items()
+        }
+
+    def __len__(self):
+        return len(self.rules)
+
+    def affected(self, product_id):
+        """
+        Returns the promotions on a product.
+
+        Args:
+         - product_id (str): The ID of the product.
+
+        Returns:
+         - tuple: The promotions, empty if there are none.
+        """
+        return self.by_product.get(product_id, ())
+
+
+def load_promotions(path=PROMOTIONS_FILE):
+    """
+    Reads the promotions from a JSON file holding a list of promotions:
+
+        {"id": "milk", "name": "3 milk for 30 kr", "type": "multibuy",
+         "products": ["1001", "1002"], "quantity": 3, "price": 30}
+        {"id": "lunch", "name": "Lunch deal", "type": "bundle",
+         "products": ["2001", "2002"], "price": 60}
+        {"id": "happy", "name": "Happy hour -20%", "type": "percent",
+         "products": ["3001"], "percent": 20, "start": "15:00", "end": "17:00",
+         "days": [0, 1, 2, 3, 4]}
+
+    Args:
+     - path (str): The promotions file.
+
+    Returns:
+     - Promotions: The compiled promotions, none if the file doesn't exist.
+
+    Raises:
+     - ValueError: If a promotion is invalid.
+    """
+    if not os.path.exists(path):
+        return Promotions()
+    with open(path, encoding="utf-8") as file:
+        entries = json.load(file)
+    rules = []
+    for original in entries:
+        entry = dict(original)
+        try:
+            kind = KINDS[entry.pop("type")]
+            rules.append(
+                kind(
+                    entry.pop("id"),
+                    entry.pop("name"),
+                    entry.pop("products"),
+                    **entry,
+                )
+            )
+        except (KeyError, TypeError) as error:
+            raise ValueError(f"invalid promotion {original}: {error}") from None
+    return Promotions(rules)
+
+
+class CartPricing:
+    """
+    The discounts of the promotions on one cart, kept on the cart's receipt.
+
+    For every promotion with products in the cart, the pricing keeps which
+    of its products are in the cart. When a line changes, only the
+    promotions on that product are evaluated again, over their own lines,
+    whatever the number of promotions and lines.
+
+    Stacked promotions never take more off a line than its price. Each
+    discount is shared out over the promotion's lines in proportion to their
+    prices. Where the shares on a line add up to more than its price, each
+    promotion with a share gives up its part of the excess. Only the
+    promotions on those lines are shown again.
+
+    Attributes:
+     - promotions (Promotions): The active promotions.
+     - receipt (ReceiptBuilder): The receipt the discount lines are kept on.
+
+    Methods:
+        update(self, items, product_id, moment=None):
+            Evaluates the promotions on a product after its line changed.
+
+        refresh(self, items, moment=None):
+            Evaluates every promotion with products in the cart again.
+
+        price(self, items, moment=None):
+            Evaluates the promotions of a whole cart at once.
+
+        clear(self):
+            Forgets the cart.
+    """
+
+    def __init__(self, promotions, receipt):
+        self.promotions = promotions
+        self.receipt = receipt
+        # The IDs of the products in the cart, keyed by promotion ID
+        self.in_cart = {}
+        # The share of every line in a discount, keyed by promotion ID
+        self.shares = {}
+        # The sum of the shares on a line, keyed by product ID
+        self.stacked = {}
+
+    def update(self, items, product_id, moment=None):
+        """
+        Evaluates the promotions on a product after its line changed.
+
+        Args:
+         - items (dict): The cart lines, keyed by product ID.
+         - product_id (str): The product whose line was added, changed or
+           removed.
+         - moment (datetime): When the cart is priced, now by default.
+        """
+        promotions = self.promotions.affected(product_id)
+        if not promotions:
+            return
+        moment = moment or datetime.now()
+        over = set()
+        for promotion in promotions:
+            product_ids = self.in_cart.setdefault(promotion.promotion_id, set())
+            if product_id in items:
+                product_ids.add(product_id)
+            else:
+                product_ids.discard(product_id)
+            over |= self.evaluate(promotion, items, moment)
+        shown = {promotion.promotion_id: promotion for promotion in promotions}
+        for line in over:
+            for promotion in self.promotions.affected(line):
+                if promotion.promotion_id in self.shares:
+                    shown[promotion.promotion_id] = promotion
+        for promotion in shown.values():
+            self.show(promotion, items)
+
+    def evaluate(self, promotion, items, moment):
+        """
+        Prices a promotion over its lines and shares out its discount.
+
+        Returns:
+         - set: The IDs of the lines whose shares added up to more than their
+           price before or after, as the other promotions on them change.
+        """
+        product_ids = self.in_cart.get(promotion.promotion_id)
+        amount = 0
+        if product_ids and promotion.active(moment):
+            amount = promotion.discount(
+                [items[product_id] for product_id in product_ids]
+            )
+        old = self.shares.pop(promotion.promotion_id, {})
+        new = {}
+        if amount:
+            new = split_amount(
+                amount,
+                {
+                    product_id: line_price(items, product_id)
+                    for product_id in product_ids
+                },
+            )
+            self.shares[promotion.promotion_id] = new
+        elif not product_ids:
+            self.in_cart.pop(promotion.promotion_id, None)
+
+        lines = old.keys() | new.keys()
+        # A line only stops being over its price if its shares went down
+        over = {line for line in old if self.excess(items, line) > 0}
+        for line, share in old.items():
+            self.stacked[line] -= share
+        for line, share in new.items():
+            self.stacked[line] = self.stacked.get(line, 0) + share
+        for line in lines:
+            if not self.stacked[line]:
+                del self.stacked[line]
+            elif self.excess(items, line) > 0:
+                over.add(line)
+        return over
+
+    def excess(self, items, product_id):
+        """
+        Returns how much the shares on a line add up to over its price.
+        """
+        return self.stacked.get(product_id, 0) - line_price(items, product_id)
+
+    def show(self, promotion, items):
+        """
+        Puts the discount of a promotion on the receipt, less its part of
+        the excess on lines over their price, rounded up.
+        """
+        shares = self.shares.get(promotion.promotion_id, {})
+        amount = sum(shares.values())
+        for product_id, share in shares.items():
+            excess = self.excess(items, product_id)
+            if excess > 0:
+                amount -= -(-share * excess // self.stacked[product_id])
+        if amount > 0:
+            self.receipt.set_discount(promotion.promotion_id, promotion.name, amount)
+        else:
+            self.receipt.remove_discount(promotion.promotion_id)
+
+    def refresh(self, items, moment=None):
+        """
+        Evaluates every promotion with products in the cart again, e.g. at
+        checkout, as time-of-day promotions may have started or ended.
+
+        Args:
+         - items (dict): The cart lines, keyed by product ID.
+         - moment (datetime): When the cart is priced, now by default.
+        """
+        moment = moment or datetime.now()
+        rules = [self.promotions.rules[promotion_id] for promotion_id in self.in_cart]
+        for promotion in rules:
+            self.evaluate(promotion, items, moment)
+        for promotion in rules:
+            self.show(promotion, items)
+
+    def price(self, items, moment=None):
+        """
+        Evaluates the promotions of a whole cart at once, for carts that
+        were not priced as they were filled.
+
+        Args:
+         - items (dict): The cart lines, keyed by product ID.
+         - moment (datetime): When the cart is priced, now by default.
+        """
+        self.clear()
+        for product_id in items:
+            for promotion in self.promotions.affected(product_id):
+                self.in_cart.setdefault(promotion.promotion_id, set()).add(product_id)
+        self.refresh(items, moment)
+
+    def clear(self):
+        """
+        Forgets the cart. The receipt is cleared by its owner.
+        """
+        self.in_cart.clear()
+        self.shares.clear()
+        self.stacked.clear()
+
+
+promotions = load_promotions()
@@ -0,0 +1,456 @@
+"""
+Usage: searchable index of saved receipts by date, product and amount
+"""
+
+# Imports
+import os
+import re
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from pos_core.constants import RECEIPTS_FOLDER
+from pos_core.metrics import metrics
+
+ITEM_LINE = re.compile(r"^(.*) \((.+)\): (-?[\d.]+) kr, (-?\d+) st$")
+TOTAL_LINE = re.compile(r"^(Total price|Money returned): (-?\d+) kr$")
+ORIGINAL_LINE = re.compile(r"^Original receipt: (\d+)$")
+FILE_NAME = re.compile(
+    r"^(purchase|return)_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})\.txt$"
+)
+
+ParsedReceipt = namedtuple(
+    "ParsedReceipt", "kind items total original", defaults=(None,)
+)
+ReceiptItem = namedtuple("ReceiptItem", "name product_id price quantity")
+IndexedReceipt = namedtuple(
+    "IndexedReceipt", "receipt_id number source timestamp kind total"
+)
+
+
+def parse_receipt(receipt):
+    """
+    Reads the items and the total back from a receipt made by create_receipt.
+
+    Args:
+     - receipt (str): The receipt text.
+
+    Returns:
+     - ParsedReceipt: The kind, the items and the total of the receipt, and
+       for a return the number of the purchase it was returned from.
+    """
+    kind = None
+    total = None
+    original = None
+    items = []
+    for line in receipt.splitlines():
+        match = ITEM_LINE.match(line)
+        if match:
+            name, product_id, price, quantity = match.groups()
+            items.append(ReceiptItem(name, product_id, float(price), int(quantity)))
+            continue
+        match = TOTAL_LINE.match(line)
+        if match:
+            kind = "purchase" if match.group(1) == "Total price" else "return"
+            total = int(match.group(2))
+            continue
+        match = ORIGINAL_LINE.match(line)
+        if match:
+            original = int(match.group(1))
+    return ParsedReceipt(kind, items, total, original)
+
+
+def to_timestamp(moment):
+    """
+    Converts a datetime or a POSIX timestamp to a POSIX timestamp.
+
+    Args:
+     - moment (datetime or float): The moment to convert.
+
+    Returns:
+     - float: The POSIX timestamp.
+    """
+    if isinstance(moment, datetime):
+        return moment.timestamp()
+    return float(moment)
+
+
+class ReceiptIndex:
+    """
+    An SQLite index of receipts, kept up to date as receipts are saved.
+
+    Every receipt gets a row with its timestamp, kind and total, and every
+    item a row with the product, quantity and price. A return also keeps the
+    number of the purchase it was returned from. B-tree indexes on the
+    timestamp, the total, the purchase of a return and (product_id,
+    timestamp) make the queries run in logarithmic time in the number of
+    receipts.
+
+    Attributes:
+     - path (str): The path of the index database.
+
+    Methods:
+        add(self, number, kind, timestamp, receipt, source=None):
+            Indexes one receipt.
+
+        between(self, start, end, kind=None):
+            Returns the receipts made in a date range.
+
+        with_product(self, product_id, start=None, end=None):
+            Returns the receipts containing a product.
+
+        by_total(self, minimum=None, maximum=None):
+            Returns the receipts with a total in a range.
+
+        items(self, receipt_id):
+            Returns the items of an indexed receipt.
+
+        returned_quantities(self, number):
+            Returns the quantities returned from a purchase.
+
+        backfill(self, folder, journal=None):
+            Indexes text receipts and journal receipts that are not indexed yet.
+    """
+
+    def __init__(self, path=os.path.join(RECEIPTS_FOLDER, "index.db")):
+        self.path = path
+        self._connection = None
+        # One connection is shared by the threads of the register
+        self.lock = threading.RLock()
+
+    @property
+    def connection(self):
+        """
+        The connection to the index, opened and set up on first use.
+        """
+        with self.lock:
+            return self.open()
+
+    def open(self):
+        if self._connection is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            # The index can be rebuilt from the journal with backfill()
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS receipts (
+                    receipt_id INTEGER PRIMARY KEY,
+                    number INTEGER UNIQUE,
+                    source TEXT UNIQUE,
+                    timestamp REAL NOT NULL,
+                    kind TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    original INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS receipt_items (
+                    receipt_id INTEGER NOT NULL REFERENCES receipts,
+                    product_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    price REAL NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    timestamp REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS receipts_by_timestamp
+                    ON receipts (timestamp);
+                CREATE INDEX IF NOT EXISTS receipts_by_total ON receipts (total);
+                CREATE INDEX IF NOT EXISTS receipt_items_by_product
+                    ON receipt_items (product_id, timestamp);
+                CREATE INDEX IF NOT EXISTS receipt_items_by_receipt
+                    ON receipt_items (receipt_id);
+                """)
+            columns = [
+                row[1]
+                for row in self._connection.execute("PRAGMA table_info(receipts)")
+            ]
+            if "original" not in columns:
+                # Indexes made before returns were linked to their purchase
+                self._connection.execute(
+                    "ALTER TABLE receipts ADD COLUMN original INTEGER"
+                )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS receipts_by_original"
+                " ON receipts (original)"
+            )
+        return self._connection
+
+    def add(self, number, kind, timestamp, receipt, source=None):
+        """
+        Indexes one receipt.
+
+        Args:
+         - number (int): The journal number of the receipt, None for text files.
+         - kind (str): The kind of receipt, "purchase" or "return".
+         - timestamp (float): When the receipt was made.
+         - receipt (str): The receipt text.
+         - source (str): The text file the receipt came from, if any.
+        """
+        self.add_many([(number, kind, timestamp, receipt, source)])
+
+    @metrics.timed("receipt_index_add")
+    def add_many(self, entries):
+        """
+        Indexes several receipts in one transaction. Receipts that are already
+        indexed are skipped.
+
+        Args:
+         - entries (list): (number, kind, timestamp, receipt, source) tuples.
+        """
+        with self.lock, self.connection:
+            for number, kind, timestamp, receipt, source in entries:
+                parsed = parse_receipt(receipt)
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO receipts"
+                    " (number, source, timestamp, kind, total, original)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        number,
+                        source,
+                        timestamp,
+                        kind,
+                        parsed.total or 0,
+                        parsed.original,
+                    ),
+                )
+                if cursor.rowcount == 0:
+                    continue
+                self.connection.executemany(
+                    "INSERT INTO receipt_items"
+                    " (receipt_id, product_id, name, price, quantity, timestamp)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            cursor.lastrowid,
+                            item.product_id,
+                            item.name,
+                            item.price,
+                            item.quantity,
+                            timestamp,
+                        )
+                        for item in parsed.items
+                    ],
+                )
+
+    def query(self, where, parameters):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT receipt_id, number, source, timestamp, kind, total"
+                f" FROM receipts WHERE {where} ORDER BY timestamp",
+                parameters,
+            ).fetchall()
+        return [IndexedReceipt(*row) for row in rows]
+
+    def between(self, start, end, kind=None):
+        """
+        Returns the receipts made in a date range.
+
+        Args:
+         - start (datetime or float): The start of the range, inclusive.
+         - end (datetime or float): The end of the range, exclusive.
+         - kind (str): Only return "purchase" or "return" receipts.
+
+        Returns:
+         - list: IndexedReceipt tuples ordered by timestamp.
+        """
+        where = "timestamp >= ? AND timestamp < ?"
+        parameters = [to_timestamp(start), to_timestamp(end)]
+        if kind is not None:
+            where += " AND kind = ?"
+            parameters.append(kind)
+        return self.query(where, parameters)
+
+    def with_product(self, product_id, start=None, end=None):
+        """
+        Returns the receipts containing a product, optionally in a date range.
+
+        Args:
+         - product_id (str): The ID of the product.
+         - start (datetime or float): The start of the range, inclusive.
+         - end (datetime or float): The end of the range, exclusive.
+
+        Returns:
+         - list: IndexedReceipt tuples ordered by timestamp.
+        """
+        where = "product_id = ?"
+        parameters = [product_id]
+        if start is not None:
+            where += " AND timestamp >= ?"
+            parameters.append(to_timestamp(start))
+        if end is not None:
+            where += " AND timestamp < ?"
+            parameters.append(to_timestamp(end))
+        return self.query(
+            f"receipt_id IN (SELECT receipt_id FROM receipt_items WHERE {where})",
+            parameters,
+        )
+
+    def by_total(self, minimum=None, maximum=None):
+        """
+        Returns the receipts with a total in a range.
+
+        Args:
+         - minimum (int): The lowest total, inclusive.
+         - maximum (int): The highest total, inclusive.
+
+        Returns:
+         - list: IndexedReceipt tuples ordered by timestamp.
+        """
+        where = "1"
+        parameters = []
+        if minimum is not None:
+            where += " AND total >= ?"
+            parameters.append(minimum)
+        if maximum is not None:
+            where += " AND total <= ?"
+            parameters.append(maximum)
+        return self.query(where, parameters)
+
+    def items(self, receipt_id):
+        """
+        Returns the items of an indexed receipt.
+
+        Args:
+         - receipt_id (int): The receipt_id of an IndexedReceipt.
+
+        Returns:
+         - list: ReceiptItem tuples.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT name, product_id, price, quantity FROM receipt_items"
+                " WHERE receipt_id = ? ORDER BY rowid",
+                (receipt_id,),
+            ).fetchall()
+        return [ReceiptItem(*row) for row in rows]
+
+    def returned_quantities(self, number):
+        """
+        Returns the quantities returned from a purchase so far.
+
+        Args:
+         - number (int): The number of the purchase receipt.
+
+        Returns:
+         - dict: The returned quantities, keyed by product ID.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT product_id, SUM(quantity) FROM receipt_items"
+                " WHERE receipt_id IN"
+                " (SELECT receipt_id FROM receipts WHERE original = ?)"
+                " GROUP BY product_id",
+                (number,),
+            ).fetchall()
+        return dict(rows)
+
+    def backfill(self, folder, journal=None):
+        """
+        Indexes text receipts and journal receipts that are not indexed yet,
+        including receipts missing between indexed ones, such as receipts
+        whose index write failed.
+
+        Text receipts are the {kind}_{YYYY-mm-dd_HH-MM-SS}.txt files written
+        before the receipt journal; their time is taken from the file name.
+
+        Args:
+         - folder (str): The folder holding text receipts.
+         - journal (ReceiptJournal): The journal to index, if any.
+
+        Returns:
+         - int: The number of receipts read.
+        """
+        entries = []
+        for file_name in sorted(os.listdir(folder)):
+            match = FILE_NAME.match(file_name)
+            if not match:
+                continue
+            with open(os.path.join(folder, file_name), "r") as file:
+                receipt = file.read()
+            timestamp = datetime.strptime(
+                match.group(2), "%Y-%m-%d_%H-%M-%S"
+            ).timestamp()
+            entries.append((None, match.group(1), timestamp, receipt, file_name))
+
+        if journal is not None:
+            for number in self.missing_numbers(len(journal)):
+                stored = journal.fetch(number)
+                entries.append(
+                    (number, stored.kind, stored.timestamp, stored.receipt, None)
+                )
+
+        self.add_many(entries)
+        return len(entries)
+
+    def unindexed(self, journal, end=None):
+        """
+        Returns the journal receipts after the last indexed one.
+
+        Args:
+         - journal (ReceiptJournal): The journal.
+         - end (int): The number to stop before, the end of the journal by
+           default.
+
+        Returns:
+         - list: (number, kind, timestamp, receipt, source) tuples for
+           add_many().
+        """
+        with self.lock:
+            indexed = self.connection.execute(
+                "SELECT COALESCE(MAX(number), 0) FROM receipts"
+            ).fetchone()[0]
+        if end is None:
+            end = len(journal) + 1
+        entries = []
+        for number in range(indexed + 1, end):
+            stored = journal.fetch(number)
+            entries.append(
+                (number, stored.kind, stored.timestamp, stored.receipt, None)
+            )
+        return entries
+
+    def catch_up(self, journal):
+        """
+        Indexes the journal receipts after the last indexed one, such as
+        receipts whose index write failed.
+
+        Args:
+         - journal (ReceiptJournal): The journal.
+
+        Returns:
+         - int: The number of receipts indexed.
+        """
+        entries = self.unindexed(journal)
+        if entries:
+            self.add_many(entries)
+        return len(entries)
+
+    def missing_numbers(self, count):
+        """
+        Returns the journal numbers up to a count that are not indexed.
+
+        Args:
+         - count (int): The number of receipts in the journal.
+
+        Returns:
+         - list: The missing numbers, in order.
+        """
+        missing = []
+        expected = 1
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT number FROM receipts WHERE number IS NOT NULL"
+                " ORDER BY number"
+            )
+            for (number,) in rows:
+                missing.extend(range(expected, min(number, count + 1)))
+                expected = number + 1
+        missing.extend(range(expected, count + 1))
+        return missing
+
+
+receipt_index = ReceiptIndex()
@@ -0,0 +1,498 @@
+"""
+Usage: receipt formatting and storage
+"""
+
+# Imports
+import json
+import os
+import sqlite3
+import struct
+from collections import namedtuple
+from datetime import datetime
+
+from pos_core.constants import RECEIPTS_FOLDER
+from pos_core.errors import ReceiptSaveError
+from pos_core.locking import file_lock
+from pos_core.metrics import metrics
+from pos_core.receipt_index import receipt_index
+
+# Record layout: payload length, receipt number, timestamp
+RECORD_HEADER = struct.Struct("<IQd")
+# Index entry layout: segment day as YYYYMMDD, offset in the segment
+INDEX_ENTRY = struct.Struct("<IQ")
+
+
+RECEIPT_HEADER = "\n\nReceipt\n-------\nItems:\n"
+
+
+def create_receipt(shopping_cart, return_receipt=False):
+    """
+    Creates a receipt for the items in the shopping cart.
+
+    Args:
+     - shopping_cart (dict): A dictionary representing the shopping cart.
+     - return_receipt (bool): If True, indicates a return receipt.
+
+    Returns:
+     - str: The receipt as a string.
+    """
+    builder = ReceiptBuilder()
+    for item in shopping_cart.values():
+        builder.set_line(item)
+    return builder.render(return_receipt)
+
+
+class ReceiptBuilder:
+    """
+    The lines and the running total of a receipt, kept up to date as items
+    are added and removed, so the receipt is ready when the customer pays.
+
+    Each line is formatted once when its item changes. Rendering joins the
+    formatted lines in one pass, and the output is the same as the receipt
+    create_receipt makes for the same items. Promotion discounts follow the
+    items as lines of their own. The builder also remembers which lines
+    changed, so a display of the cart can update just those.
+
+    Attributes:
+     - lines (dict): The formatted line and rounded price of every item,
+       keyed by product ID, in the order the items were added.
+     - discounts (dict): The formatted line and negative amount of every
+       discount, keyed by ("discount", promotion ID).
+     - total (int): The sum of the rounded line prices less the discounts.
+     - changed (dict): The keys of the lines changed since the last
+       take_changes(), in the order they changed.
+
+    Methods:
+        set_line(self, item):
+            Adds the line of an item or replaces it after a quantity change.
+
+        remove_line(self, product_id):
+            Removes the line of an item.
+
+        set_discount(self, promotion_id, name, amount):
+            Adds or replaces the discount line of a promotion.
+
+        remove_discount(self, promotion_id):
+            Removes the discount line of a promotion.
+
+        render(self, return_receipt=False):
+            Returns the receipt text.
+
+        write(self, stream, return_receipt=False):
+            Writes the receipt text to a text stream.
+
+        take_changes(self):
+            Returns the lines changed since the last call.
+
+        clear(self):
+            Removes every line.
+    """
+
+    def __init__(self):
+        self.lines = {}
+        self.discounts = {}
+        self.total = 0
+        self.changed = {}
+
+    def __len__(self):
+        return len(self.lines)
+
+    def set_line(self, item):
+        """
+        Adds the line of an item or replaces it after a quantity change. A
+        replaced line keeps its place on the receipt.
+
+        Args:
+         - item (Product): The cart line.
+        """
+        price = round(item.price * item.quantity)
+        previous = self.lines.get(item.product_id)
+        if previous is not None:
+            self.total -= previous[1]
+        self.lines[item.product_id] = (
+            f"{item.name} ({item.product_id}): {item.price} kr, {item.quantity} st\n",
+            price,
+        )
+        self.total += price
+        self.changed[item.product_id] = None
+
+    def remove_line(self, product_id):
+        """
+        Removes the line of an item.
+
+        Args:
+         - product_id (str): The ID of the item.
+        """
+        _, price = self.lines.pop(product_id)
+        self.total -= price
+        self.changed[product_id] = None
+
+    def set_discount(self, promotion_id, name, amount):
+        """
+        Adds or replaces the discount line of a promotion.
+
+        Args:
+         - promotion_id (str): The ID of the promotion.
+         - name (str): The name of the promotion.
+         - amount (int): The discount in whole kr.
+        """
+        key = ("discount", promotion_id)
+        previous = self.discounts.get(key)
+        if previous is not None:
+            if previous[1] == -amount:
+                return
+            self.total -= previous[1]
+        self.discounts[key] = (f"{name}: -{amount} kr\n", -amount)
+        self.total -= amount
+        self.changed[key] = None
+
+    def remove_discount(self, promotion_id):
+        """
+        Removes the discount line of a promotion, if there is one.
+
+        Args:
+         - promotion_id (str): The ID of the promotion.
+        """
+        key = ("discount", promotion_id)
+        previous = self.discounts.pop(key, None)
+        if previous is not None:
+            self.total -= previous[1]
+            self.changed[key] = None
+
+    def footer(self, return_receipt=False):
+        if return_receipt:
+            return f"Money returned: {self.total} kr"
+        return f"Total price: {self.total} kr"
+
+    def render(self, return_receipt=False):
+        """
+        Returns the receipt text.
+
+        Args:
+         - return_receipt (bool): If True, indicates a return receipt.
+
+        Returns:
+         - str: The receipt as a string.
+        """
+        return "".join(
+            [
+                RECEIPT_HEADER,
+                *(text for text, _ in self.lines.values()),
+                *(text for text, _ in self.discounts.values()),
+                self.footer(return_receipt),
+            ]
+        )
+
+    def write(self, stream, return_receipt=False):
+        """
+        Writes the receipt text to a text stream without building it in memory.
+
+        Args:
+         - stream (file): The stream, e.g. a file opened for writing.
+         - return_receipt (bool): If True, indicates a return receipt.
+        """
+        stream.write(RECEIPT_HEADER)
+        stream.writelines(text for text, _ in self.lines.values())
+        stream.writelines(text for text, _ in self.discounts.values())
+        stream.write(self.footer(return_receipt))
+
+    def take_changes(self):
+        """
+        Returns the lines changed since the last call.
+
+        Returns:
+         - dict: The formatted line and rounded price of every changed item
+           or discount, or None for a removed one, keyed by product ID or by
+           ("discount", promotion ID).
+        """
+        changes = {
+            key: self.lines.get(key, self.discounts.get(key)) for key in self.changed
+        }
+        self.changed.clear()
+        return changes
+
+    def clear(self):
+        """
+        Removes every line.
+        """
+        self.changed.update(dict.fromkeys(self.lines))
+        self.changed.update(dict.fromkeys(self.discounts))
+        self.lines.clear()
+        self.discounts.clear()
+        self.total = 0
+
+
+def save_receipt(filename, receipt):
+    """
+    Save the receipt to the receipt journal and add it to the receipt index.
+
+    Args:
+     - filename (str): The kind of receipt, "purchase" or "return".
+     - receipt (str): The content of the receipt to be saved.
+
+    Returns:
+     - int: The number of the saved receipt.
+
+    Raises:
+     - ReceiptSaveError: If the receipt can't be written to the journal.
+    """
+    return save_receipts([(filename, receipt)])[0]
+
+
+def save_receipts(receipts):
+    """
+    Save several receipts with one append to the receipt journal and one
+    transaction in the receipt index.
+
+    Either every receipt is saved to the journal or none is. The index is
+    built from the journal, so receipts the index fails to take are still
+    saved; they are indexed along with the next receipts saved, so the index
+    always holds every receipt up to its last one.
+
+    Args:
+     - receipts (list): (kind, receipt) tuples.
+
+    Returns:
+     - list: The numbers of the saved receipts, in the order given.
+
+    Raises:
+     - ReceiptSaveError: If the receipts can't be written to the journal.
+    """
+    timestamp = datetime.now().timestamp()
+    try:
+        numbers = receipt_journal.append_many(
+            [(kind, receipt, timestamp) for kind, receipt in receipts]
+        )
+    except OSError as error:
+        raise ReceiptSaveError(f"receipt not saved: {error}") from error
+    try:
+        receipt_index.add_many(
+            receipt_index.unindexed(receipt_journal, numbers[0])
+            + [
+                (number, kind, timestamp, receipt, None)
+                for number, (kind, receipt) in zip(numbers, receipts)
+            ]
+        )
+    except sqlite3.Error as error:
+        print(f"\nWarning: receipts {numbers[0]}-{numbers[-1]} not indexed: {error}\n")
+    return numbers
+
+
+StoredReceipt = namedtuple("StoredReceipt", "number kind timestamp receipt")
+
+
+class ReceiptJournal:
+    """
+    An append-only store for receipts, numbered from 1 upwards.
+
+    Receipts are appended as length-prefixed records to one segment file per
+    day. A sidecar index holds a fixed-width (day, offset) entry per receipt,
+    so the entry of receipt n sits at (n - 1) * INDEX_ENTRY.size and any
+    receipt is fetched with two seeks.
+
+    Attributes:
+     - folder (str): The folder holding the segments and the index.
+     - index_path (str): The path of the offset index.
+
+    Methods:
+        append(self, kind, receipt, timestamp=None):
+            Appends a receipt and returns its number.
+
+        append_many(self, entries):
+            Appends several receipts with one write per file.
+
+        fetch(self, number):
+            Returns the receipt with the given number.
+
+        export(self, folder, numbers=None):
+            Writes receipts as text files in the old one-file-per-receipt format.
+    """
+
+    def __init__(self, folder=RECEIPTS_FOLDER):
+        self.folder = folder
+        self.index_path = os.path.join(folder, "receipts.idx")
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.index_path) // INDEX_ENTRY.size
+        except FileNotFoundError:
+            return 0
+
+    def __iter__(self):
+        for number in range(1, len(self) + 1):
+            yield self.fetch(number)
+
+    def segment_path(self, day):
+        """
+        Returns the path of the segment holding the receipts of a day.
+
+        Args:
+         - day (int): The day as YYYYMMDD.
+
+        Returns:
+         - str: The path of the segment file.
+        """
+        return os.path.join(self.folder, f"receipts_{day}.log")
+
+    def append(self, kind, receipt, timestamp=None):
+        """
+        Appends a receipt and returns its number.
+
+        Args:
+         - kind (str): The kind of receipt, "purchase" or "return".
+         - receipt (str): The receipt text.
+         - timestamp (float): When the receipt was made, defaults to now.
+
+        Returns:
+         - int: The number of the receipt.
+        """
+        return self.append_many([(kind, receipt, timestamp)])[0]
+
+    def append_many(self, entries):
+        """
+        Appends several receipts with one write to each segment and the index.
+
+        Args:
+         - entries (list): (kind, receipt, timestamp) tuples, where a timestamp
+           of None means now.
+
+        Returns:
+         - list: The numbers of the receipts, in the order given.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        with file_lock(os.path.join(self.folder, "receipts.lock")):
+            return self.append_locked(entries)
+
+    @metrics.timed("receipt_append")
+    def append_locked(self, entries):
+        """
+        Appends receipts with the journal lock held, so registers sharing the
+        journal never hand out the same receipt number.
+
+        Args:
+         - entries (list): (kind, receipt, timestamp) tuples.
+
+        Returns:
+         - list: The numbers of the receipts, in the order given.
+        """
+        self.repair_index()
+
+        first_number = len(self) + 1
+        records = {}
+        for position, (kind, receipt, timestamp) in enumerate(entries):
+            if timestamp is None:
+                timestamp = datetime.now().timestamp()
+            day = int(datetime.fromtimestamp(timestamp).strftime("%Y%m%d"))
+            payload = json.dumps({"kind": kind, "receipt": receipt}).encode()
+            record = (
+                RECORD_HEADER.pack(len(payload), first_number + position, timestamp)
+                + payload
+            )
+            records.setdefault(day, []).append((position, record))
+
+        index_entries = [None] * len(entries)
+        for day, day_records in records.items():
+            with open(self.segment_path(day), "ab") as file:
+                offset = file.seek(0, os.SEEK_END)
+                for position, record in day_records:
+                    index_entries[position] = INDEX_ENTRY.pack(day, offset)
+                    offset += len(record)
+                content = b"".join(record for _, record in day_records)
+                file.write(content)
+                metrics.written("receipts", len(content))
+                file.flush()
+                os.fsync(file.fileno())
+
+        # The receipts are saved once their index entries are; a failed write
+        # is cut off, so no entry of the batch hands out a number
+        content = b"".join(index_entries)
+        with open(self.index_path, "ab", buffering=0) as file:
+            try:
+                if file.write(content) != len(content):
+                    raise OSError("short write to the receipt index")
+                os.fsync(file.fileno())
+            except OSError:
+                file.truncate((first_number - 1) * INDEX_ENTRY.size)
+                raise
+            metrics.written("receipts_index", len(content))
+        return list(range(first_number, first_number + len(entries)))
+
+    def repair_index(self):
+        """
+        Cuts off an index entry left incomplete by a crash during an append.
+        """
+        try:
+            size = os.path.getsize(self.index_path)
+        except FileNotFoundError:
+            return
+        if size % INDEX_ENTRY.size:
+            os.truncate(self.index_path, size - size % INDEX_ENTRY.size)
+
+    def fetch(self, number):
+        """
+        Returns the receipt with the given number.
+
+        Args:
+         - number (int): The receipt number.
+
+        Returns:
+         - StoredReceipt: The number, kind, timestamp and text of the receipt.
+
+        Raises:
+         - KeyError: If there is no receipt with that number.
+        """
+        if number < 1:
+            raise KeyError(number)
+        try:
+            with open(self.index_path, "rb") as file:
+                file.seek((number - 1) * INDEX_ENTRY.size)
+                entry = file.read(INDEX_ENTRY.size)
+        except FileNotFoundError:
+            raise KeyError(number) from None
+        if len(entry) < INDEX_ENTRY.size:
+            raise KeyError(number)
+
+        day, offset = INDEX_ENTRY.unpack(entry)
+        with open(self.segment_path(day), "rb") as file:
+            file.seek(offset)
+            length, _, timestamp = RECORD_HEADER.unpack(file.read(RECORD_HEADER.size))
+            payload = json.loads(file.read(length))
+        metrics.read("receipts", RECORD_HEADER.size + length)
+        return StoredReceipt(number, payload["kind"], timestamp, payload["receipt"])
+
+    def export(self, folder, numbers=None):
+        """
+        Writes receipts as text files in the old one-file-per-receipt format.
+
+        Files are named {kind}_{YYYY-mm-dd_HH-MM-SS}.txt like save_receipt used
+        to name them; receipts made in the same second get their number added.
+
+        Args:
+         - folder (str): The folder to write the files to.
+         - numbers (iterable): The receipt numbers to export, defaults to all.
+
+        Returns:
+         - int: The number of files written.
+        """
+        os.makedirs(folder, exist_ok=True)
+        if numbers is None:
+            numbers = range(1, len(self) + 1)
+
+        written = 0
+        for number in numbers:
+            stored = self.fetch(number)
+            current_datetime = datetime.fromtimestamp(stored.timestamp).strftime(
+                "%Y-%m-%d_%H-%M-%S"
+            )
+            path = os.path.join(folder, f"{stored.kind}_{current_datetime}.txt")
+            if os.path.exists(path):
+                path = os.path.join(
+                    folder, f"{stored.kind}_{current_datetime}_{number}.txt"
+                )
+            with open(path, "w") as file:
+                file.write(stored.receipt)
+            written += 1
+        return written
+
+
+receipt_journal = ReceiptJournal()
@@ -0,0 +1,772 @@
+"""
+Usage: cart, checkout, return and inventory operations without any GUI
+"""
+
+# Imports
+import sqlite3
+from collections import namedtuple
+
+from pos_core.errors import (
+    EmptyCartError,
+    InsufficientStockError,
+    InvalidQuantityError,
+    NotInCartError,
+    NotReturnableError,
+    ProductNotFoundError,
+    ReceiptNotFoundError,
+    ReceiptSaveError,
+    RegisterError,
+)
+from pos_core.inventory import inventory_cache
+from pos_core.members import member_store, points_for
+from pos_core.metrics import metrics
+from pos_core.products import Product
+from pos_core.promotions import CartPricing, promotions
+from pos_core.receipt_index import parse_receipt, receipt_index
+from pos_core.receipts import (
+    ReceiptBuilder,
+    receipt_journal,
+    save_receipts,
+)
+
+
+def parse_quantity(quantity):
+    """
+    Converts a quantity entered by the cashier to a positive integer.
+
+    Args:
+     - quantity (str): The quantity to convert.
+
+    Returns:
+     - int: The absolute value of the quantity.
+    """
+    try:
+        return abs(int(quantity))
+    except ValueError:
+        raise InvalidQuantityError(quantity) from None
+
+
+def save_receipts_or_undo(receipts, cache, changes):
+    """
+    Saves the receipts of stock changes that were just made, undoing the
+    changes if the receipts can't be saved, so the stock never changes
+    without a receipt.
+
+    Args:
+     - receipts (list): (kind, receipt) tuples.
+     - cache (InventoryCache): The inventory the changes were made to.
+     - changes (dict): The quantity changes, keyed by product ID.
+
+    Returns:
+     - list: The numbers of the saved receipts, in the order given.
+
+    Raises:
+     - ReceiptSaveError: If the receipts can't be saved.
+    """
+    try:
+        return save_receipts(receipts)
+    except ReceiptSaveError:
+        cache.adjust_quantities(
+            {product_id: -change for product_id, change in changes.items()}
+        )
+        raise
+
+
+class ShoppingCart:
+    """
+    A class representing the shopping cart of one customer.
+
+    Attributes:
+     - cache (InventoryCache): The inventory the cart sells from.
+     - items (dict): The products in the cart, keyed by product ID.
+     - receipt (ReceiptBuilder): The receipt lines and running total of the
+       items, less the promotion discounts.
+     - pricing (CartPricing): The promotions on the items, evaluated again
+       for the product of every line that changes.
+     - member (Member): The loyalty member earning points on the cart, if any.
+
+    Methods:
+        attach_member(self, card_number):
+            Lets a loyalty member earn the points of the cart.
+
+        lookup(self, product_id):
+            Returns a product from the inventory.
+
+        add_item(self, product_id, quantity):
+            Adds an item to the shopping cart.
+
+        remove_item(self, product_id, quantity):
+            Removes an item from the shopping cart.
+
+        checkout(self):
+            Saves a purchase receipt and removes the items from the inventory.
+
+        clear(self):
+            Empties the shopping cart.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or inventory_cache
+        self.items = {}
+        self.receipt = ReceiptBuilder()
+        self.pricing = CartPricing(promotions, self.receipt)
+        self.member = None
+
+    def __contains__(self, product_id):
+        return product_id in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def total(self):
+        """
+        The total price of the cart as it will be printed on the receipt.
+        """
+        return self.receipt.total
+
+    def attach_member(self, card_number):
+        """
+        Lets a loyalty member earn the points of the cart at checkout.
+
+        Args:
+         - card_number (str): The number on the member's card.
+
+        Returns:
+         - Member: The member.
+
+        Raises:
+         - MemberNotFoundError: If there is no member with the card.
+        """
+        self.member = member_store.get(card_number)
+        return self.member
+
+    def lookup(self, product_id):
+        """
+        Returns a product from the inventory.
+
+        Args:
+         - product_id (str): The ID of the product.
+
+        Returns:
+         - Product: A copy of the product with its stock.
+
+        Raises:
+         - ProductNotFoundError: If the product is not in the inventory.
+        """
+        with self.cache.reading() as inventory:
+            if product_id not in inventory:
+                raise ProductNotFoundError(product_id)
+            product = inventory[product_id]
+            return Product(
+                product.name, product.product_id, product.price, product.quantity
+            )
+
+    @metrics.timed("add_item")
+    def add_item(self, product_id, quantity):
+        """
+        Adds an item to the shopping cart.
+
+        Args:
+         - product_id (str): The ID of the product to be added.
+         - quantity (str): The quantity of the product to be added.
+
+        Returns:
+         - Product: The cart line of the product.
+
+        Raises:
+         - InvalidQuantityError: If the quantity is not a number.
+         - ProductNotFoundError: If the product is not in the inventory.
+         - InsufficientStockError: If the inventory holds too few items.
+        """
+        quantity = parse_quantity(quantity)
+        product = self.lookup(product_id)
+        if product.quantity < quantity:
+            raise InsufficientStockError(product.quantity)
+
+        if product_id in self.items:
+            self.items[product_id].add_quantity(quantity)
+        else:
+            self.items[product_id] = Product(
+                product.name, product.product_id, product.price, quantity
+            )
+        self.receipt.set_line(self.items[product_id])
+        self.pricing.update(self.items, product_id)
+        return self.items[product_id]
+
+    @metrics.timed("remove_item")
+    def remove_item(self, product_id, quantity):
+        """
+        Removes an item from the shopping cart.
+
+        Args:
+         - product_id (str): The ID of the product to be removed.
+         - quantity (str): The quantity of the product to be removed.
+
+        Returns:
+         - Product: The cart line of the product. A line removed as a whole is
+           returned with its quantity unchanged.
+
+        Raises:
+         - InvalidQuantityError: If the quantity is not a number.
+         - NotInCartError: If the cart holds fewer items than requested.
+        """
+        quantity = parse_quantity(quantity)
+        line = self.items.get(product_id)
+        if line is None or quantity > line.quantity:
+            raise NotInCartError(product_id)
+
+        if quantity == line.quantity:
+            del self.items[product_id]
+            self.receipt.remove_line(product_id)
+        else:
+            line.remove_quantity(quantity)
+            self.receipt.set_line(line)
+        self.pricing.update(self.items, product_id)
+        return line
+
+    @metrics.timed("checkout")
+    def checkout(self):
+        """
+        Saves a purchase receipt, removes the items from the inventory, adds
+        the points to the attached member and empties the cart.
+
+        The stock is checked and removed under the inventory lock, as other
+        registers may have sold the same products since they were added. The
+        receipt is saved after the lock is released, so lanes don't wait on
+        each other's receipt writes; if it can't be saved, the items are put
+        back and the cart is kept.
+
+        Returns:
+         - str: The purchase receipt.
+
+        Raises:
+         - EmptyCartError: If the cart is empty.
+         - ProductNotFoundError: If a product was deleted from the inventory.
+         - InsufficientStockError: If the inventory no longer holds enough items.
+         - ReceiptSaveError: If the receipt can't be saved.
+        """
+        if not self.items:
+            raise EmptyCartError()
+
+        changes = {
+            product_id: -line.quantity for product_id, line in self.items.items()
+        }
+        with self.cache.transaction() as inventory:
+            for product_id, line in self.items.items():
+                if product_id not in inventory:
+                    raise ProductNotFoundError(product_id)
+                if inventory[product_id].quantity < line.quantity:
+                    raise InsufficientStockError(inventory[product_id].quantity)
+
+            self.cache.adjust_quantities(changes)
+        # Time-of-day promotions may have started or ended since the items were added
+        self.pricing.refresh(self.items)
+        receipt = self.receipt.render()
+        (number,) = save_receipts_or_undo([("purchase", receipt)], self.cache, changes)
+        if self.member is not None:
+            member_store.add_points_many(
+                [(self.member.card_number, points_for(self.total), number)]
+            )
+        self.clear()
+        return receipt
+
+    def clear(self):
+        """
+        Empties the shopping cart and detaches the member.
+        """
+        self.items.clear()
+        self.receipt.clear()
+        self.pricing.clear()
+        self.member = None
+
+
+CheckoutResult = namedtuple("CheckoutResult", "accepted receipt_number receipt error")
+
+
+@metrics.timed("checkout_many")
+def checkout_many(carts, cache=None):
+    """
+    Checks out many carts against one inventory snapshot.
+
+    Stock is checked cart by cart in the order given, so a cart is rejected
+    when earlier carts in the batch used up the stock it needs. All receipts
+    are saved in one bulk append and the inventory is persisted once.
+
+    Args:
+     - carts (list): ShoppingCart instances or dictionaries of quantities
+       keyed by product ID. Accepted ShoppingCart instances are emptied.
+     - cache (InventoryCache): The inventory to sell from.
+
+    Returns:
+     - list: A CheckoutResult per cart, in the order given. Rejected carts have
+       accepted set to False and the RegisterError that rejected them.
+
+    Raises:
+     - ReceiptSaveError: If the receipts can't be saved. No cart is checked
+       out and the carts are kept.
+    """
+    cache = cache or inventory_cache
+    with cache.transaction() as inventory:
+        return checkout_snapshot(carts, inventory, cache)
+
+
+def checkout_snapshot(carts, inventory, cache, members=None):
+    """
+    Checks out carts against an inventory, with the inventory lock held.
+
+    Args:
+     - carts (list): ShoppingCart instances or dictionaries of quantities
+       keyed by product ID.
+     - inventory (Mapping): The up to date inventory.
+     - cache (InventoryCache): The inventory to persist the changes to.
+     - members (list): The card number of the member earning the points of
+       each cart, or None. Defaults to the members attached to the
+       ShoppingCart instances.
+
+    The stock of the accepted carts is removed and their receipts are saved
+    as one step: if the receipts can't be saved, the stock is put back. The
+    accepted ShoppingCart instances are emptied only once both are done.
+
+    Returns:
+     - list: A CheckoutResult per cart, in the order given.
+
+    Raises:
+     - ReceiptSaveError: If the receipts can't be saved.
+    """
+    if members is None:
+        members = [
+            (
+                cart.member.card_number
+                if isinstance(cart, ShoppingCart) and cart.member is not None
+                else None
+            )
+            for cart in carts
+        ]
+    stock = {}
+    changes = {}
+    results = []
+    receipts = []
+    # The position of the result, the card and the points of each member
+    awards = []
+
+    for cart, card_number in zip(carts, members):
+        if isinstance(cart, ShoppingCart):
+            quantities = {
+                product_id: line.quantity for product_id, line in cart.items.items()
+            }
+        else:
+            quantities = cart
+        try:
+            if not quantities:
+                raise EmptyCartError()
+            lines = {}
+            for product_id, quantity in quantities.items():
+                quantity = parse_quantity(quantity)
+                if product_id not in inventory:
+                    raise ProductNotFoundError(product_id)
+                product = inventory[product_id]
+                stock.setdefault(product_id, product.quantity)
+                if stock[product_id] < quantity:
+                    raise InsufficientStockError(stock[product_id])
+                lines[product_id] = Product(
+                    product.name, product.product_id, product.price, quantity
+                )
+        except RegisterError as error:
+            results.append(CheckoutResult(False, None, None, error))
+            continue
+
+        for product_id, line in lines.items():
+            stock[product_id] -= line.quantity
+            changes[product_id] = changes.get(product_id, 0) - line.quantity
+        builder = ReceiptBuilder()
+        for line in lines.values():
+            builder.set_line(line)
+        CartPricing(promotions, builder).price(lines)
+        receipt = builder.render()
+        receipts.append(("purchase", receipt))
+        if card_number is not None:
+            awards.append((len(results), card_number, points_for(builder.total)))
+        results.append(CheckoutResult(True, None, receipt, None))
+
+    if receipts:
+        cache.adjust_quantities(changes)
+        numbers = iter(save_receipts_or_undo(receipts, cache, changes))
+        results = [
+            result._replace(receipt_number=next(numbers)) if result.accepted else result
+            for result in results
+        ]
+        for cart, result in zip(carts, results):
+            if result.accepted and isinstance(cart, ShoppingCart):
+                cart.clear()
+    if awards:
+        member_store.add_points_many(
+            [
+                (card_number, points, results[position].receipt_number)
+                for position, card_number, points in awards
+            ]
+        )
+    return results
+
+
+Purchase = namedtuple("Purchase", "number items total returned")
+
+
+def purchase_of(receipt_number):
+    """
+    Returns a purchase and what has been returned from it. The receipt is
+    read through the journal's number index and the returns through the
+    receipt index, so the lookup takes the same time after years of
+    receipts. Receipts the index failed to take are indexed first, so no
+    return is missed.
+
+    Args:
+     - receipt_number (str): The number printed on the purchase receipt.
+
+    Returns:
+     - Purchase: The receipt number, the bought items keyed by product ID,
+       the total paid and the quantities returned so far keyed by product ID.
+
+    Raises:
+     - ReceiptNotFoundError: If the number is not the number of a purchase.
+     - ReceiptSaveError: If the receipt index can't be brought up to date,
+       so the returns can't be checked.
+    """
+    try:
+        number = int(receipt_number)
+        stored = receipt_journal.fetch(number)
+    except (ValueError, KeyError):
+        raise ReceiptNotFoundError(receipt_number) from None
+    if stored.kind != "purchase":
+        raise ReceiptNotFoundError(receipt_number)
+    try:
+        receipt_index.catch_up(receipt_journal)
+    except sqlite3.Error as error:
+        raise ReceiptSaveError(
+            f"returns of receipt {number} can't be checked: {error}"
+        ) from error
+    parsed = parse_receipt(stored.receipt)
+    return Purchase(
+        number,
+        {item.product_id: item for item in parsed.items},
+        parsed.total,
+        receipt_index.returned_quantities(number),
+    )
+
+
+def returnable(purchase, product_id):
+    """
+    Returns the quantity of a product that can still be returned from a
+    purchase.
+    """
+    item = purchase.items.get(product_id)
+    if item is None:
+        return 0
+    return item.quantity - purchase.returned.get(product_id, 0)
+
+
+def discount_share(purchase, amount, returned_amount):
+    """
+    Returns the part of the purchase's discounts that goes with an amount of
+    returned items, so returned items are paid back at what they cost after
+    the discounts.
+
+    Args:
+     - purchase (Purchase): The purchase.
+     - amount (int): The full price of the items returned now.
+     - returned_amount (int): The full price of the items returned before.
+
+    Returns:
+     - int: The discount in whole kr. Over every return of a purchase the
+       shares add up to the purchase's discounts.
+    """
+    full_price = sum(
+        round(item.price * item.quantity) for item in purchase.items.values()
+    )
+    discounts = full_price - purchase.total
+    if discounts <= 0 or full_price <= 0:
+        return 0
+    return round(discounts * (returned_amount + amount) / full_price) - round(
+        discounts * returned_amount / full_price
+    )
+
+
+@metrics.timed("return_receipt")
+def return_receipt(receipt_number, quantities, cache=None):
+    """
+    Returns items bought on a purchase receipt to the inventory and saves a
+    return receipt referring to the purchase. The items are paid back at the
+    price they were bought for, less their share of the purchase's
+    discounts, and the points they earned are taken back from the member the
+    purchase was made by, if any.
+
+    Args:
+     - receipt_number (str): The number of the purchase receipt.
+     - quantities (dict): The quantities returned, keyed by product ID.
+     - cache (InventoryCache): The inventory to return to.
+
+    Returns:
+     - str: The return receipt.
+
+    Raises:
+     - ReceiptNotFoundError: If the number is not the number of a purchase.
+     - NotReturnableError: If more of a product is returned than was bought
+       and not returned yet.
+     - ProductNotFoundError: If a product was deleted from the inventory.
+     - InvalidQuantityError: If a quantity is not a number.
+     - EmptyCartError: If nothing is returned.
+     - ReceiptSaveError: If the receipt can't be saved.
+    """
+    cache = cache or inventory_cache
+    quantities = {
+        product_id: parse_quantity(quantity)
+        for product_id, quantity in quantities.items()
+    }
+    quantities = {
+        product_id: quantity for product_id, quantity in quantities.items() if quantity
+    }
+    if not quantities:
+        raise EmptyCartError()
+
+    # The return is checked and saved with the lock held, so two registers
+    # can't both return the last item of a purchase
+    with cache.transaction() as inventory:
+        purchase = purchase_of(receipt_number)
+        builder = ReceiptBuilder()
+        for product_id, quantity in quantities.items():
+            left = returnable(purchase, product_id)
+            if quantity > left:
+                raise NotReturnableError(product_id, left)
+            if product_id not in inventory:
+                raise ProductNotFoundError(product_id)
+            item = purchase.items[product_id]
+            builder.set_line(Product(item.name, product_id, item.price, quantity))
+
+        returned_amount = sum(
+            round(purchase.items[product_id].price * quantity)
+            for product_id, quantity in purchase.returned.items()
+            if product_id in purchase.items
+        )
+        amount = discount_share(purchase, builder.total, returned_amount)
+        if amount:
+            builder.set_discount("purchase", "Discounts on the purchase", amount)
+        receipt = builder.render(return_receipt=True)
+        receipt += f"\nOriginal receipt: {purchase.number}"
+        cache.adjust_quantities(quantities)
+        (number,) = save_receipts_or_undo([("return", receipt)], cache, quantities)
+
+    earned = member_store.points_of_receipt(purchase.number)
+    if earned is not None:
+        member_store.add_points_many([(earned[0], -points_for(builder.total), number)])
+    return receipt
+
+
+class ReturnSession:
+    """
+    One customer's return of items from one purchase.
+
+    The purchase is looked up when the session starts, and every item is
+    checked against what was bought on it and not returned yet as it is
+    added. The session holds only the items of this return and forgets them
+    once the return receipt is saved.
+
+    Attributes:
+     - purchase (Purchase): The purchase the items are returned from.
+     - items (dict): The returned products, keyed by product ID.
+     - receipt (ReceiptBuilder): The lines of the return receipt.
+
+    Methods:
+        returnable(self, product_id):
+            Returns the quantity of a product that can still be added.
+
+        add_item(self, product_id, quantity):
+            Adds a returned item.
+
+        finish(self):
+            Saves the return receipt and empties the session.
+
+        clear(self):
+            Empties the session.
+    """
+
+    def __init__(self, receipt_number, lookup=None, commit=None):
+        self.purchase = (lookup or purchase_of)(receipt_number)
+        self.commit = commit or return_receipt
+        self.items = {}
+        self.receipt = ReceiptBuilder()
+
+    def __len__(self):
+        return len(self.items)
+
+    def returnable(self, product_id):
+        """
+        Returns the quantity of a product that can still be added.
+
+        Args:
+         - product_id (str): The ID of the product.
+
+        Returns:
+         - int: The quantity bought, less the quantity returned before and
+           the quantity already in the session.
+        """
+        line = self.items.get(product_id)
+        added = line.quantity if line is not None else 0
+        return returnable(self.purchase, product_id) - added
+
+    def add_item(self, product_id, quantity):
+        """
+        Adds a returned item at the price it was bought for.
+
+        Args:
+         - product_id (str): The ID of the product returned.
+         - quantity (str): The quantity returned.
+
+        Returns:
+         - Product: The line of the product in the return.
+
+        Raises:
+         - InvalidQuantityError: If the quantity is not a number.
+         - NotReturnableError: If more is returned than can be.
+        """
+        quantity = parse_quantity(quantity)
+        left = self.returnable(product_id)
+        if quantity > left:
+            raise NotReturnableError(product_id, left)
+
+        if product_id in self.items:
+            self.items[product_id].add_quantity(quantity)
+        else:
+            item = self.purchase.items[product_id]
+            self.items[product_id] = Product(
+                item.name, product_id, item.price, quantity
+            )
+        self.receipt.set_line(self.items[product_id])
+        return self.items[product_id]
+
+    def finish(self):
+        """
+        Saves the return receipt, returns the items to the inventory and
+        empties the session.
+
+        Returns:
+         - str: The return receipt.
+
+        Raises:
+         - EmptyCartError: If no items were added.
+         - NotReturnableError: If another register returned the items since
+           they were added.
+        """
+        if not self.items:
+            raise EmptyCartError()
+        receipt = self.commit(
+            self.purchase.number,
+            {product_id: line.quantity for product_id, line in self.items.items()},
+        )
+        self.clear()
+        return receipt
+
+    def clear(self):
+        """
+        Empties the session.
+        """
+        self.items.clear()
+        self.receipt.clear()
+
+
+def list_products(cache=None):
+    """
+    Returns every product in the inventory.
+
+    Args:
+     - cache (InventoryCache): The inventory to list.
+
+    Returns:
+     - list: Copies of the Product instances.
+    """
+    with (cache or inventory_cache).reading() as inventory:
+        return [
+            Product(product.name, product.product_id, product.price, product.quantity)
+            for product in inventory.values()
+        ]
+
+
+@metrics.timed("add_product")
+def add_product(name, product_id, price, quantity, cache=None):
+    """
+    Adds a product to the inventory, replacing any product with the same ID.
+
+    Args:
+     - name (str): The name of the product.
+     - product_id (str): The ID of the product.
+     - price (str): The price of the product.
+     - quantity (str): The quantity of the product.
+     - cache (InventoryCache): The inventory to add to.
+
+    Returns:
+     - Product: The stored product.
+
+    Raises:
+     - ValueError: If the price or quantity is not a number.
+    """
+    product = Product(name, product_id, abs(float(price)), abs(int(quantity)))
+    (cache or inventory_cache).put_product(product)
+    return product
+
+
+@metrics.timed("update_product")
+def update_product(product_id, price, quantity, cache=None):
+    """
+    Updates the price and quantity of a product in the inventory.
+
+    Args:
+     - product_id (str): The ID of the product.
+     - price (str): The new price of the product.
+     - quantity (str): The new quantity of the product.
+     - cache (InventoryCache): The inventory to update.
+
+    Returns:
+     - Product: The stored product.
+
+    Raises:
+     - ProductNotFoundError: If the product is not in the inventory.
+     - ValueError: If the price or quantity is not a number.
+    """
+    cache = cache or inventory_cache
+    with cache.transaction() as inventory:
+        if product_id not in inventory:
+            raise ProductNotFoundError(product_id)
+
+        product = Product(
+            inventory[product_id].name,
+            product_id,
+            abs(float(price)),
+            abs(int(quantity)),
+        )
+        cache.put_product(product)
+    return product
+
+
+@metrics.timed("delete_product")
+def delete_product(product_id, cache=None):
+    """
+    Deletes a product from the inventory.
+
+    Args:
+     - product_id (str): The ID of the product.
+     - cache (InventoryCache): The inventory to delete from.
+
+    Returns:
+     - Product: The deleted product.
+
+    Raises:
+     - ProductNotFoundError: If the product is not in the inventory.
+    """
+    cache = cache or inventory_cache
+    with cache.transaction() as inventory:
+        if product_id not in inventory:
+            raise ProductNotFoundError(product_id)
+
+        product = inventory[product_id]
+        product = Product(product.name, product_id, product.price, product.quantity)
+        cache.delete_product(product_id)
+    return product
@@ -0,0 +1,117 @@
+"""
+Usage: read keyboard-wedge barcode scanners and batch their scans for the cart
+"""
+
+# Imports
+from pos_core.constants import SCAN_FRAME_MS, SCAN_KEY_GAP_MS
+
+
+class ScanReader:
+    """
+    Turns the keystrokes of a keyboard-wedge barcode scanner into scanned
+    codes and hands them over in batches.
+
+    A scanner types the whole code and Enter within a few milliseconds.
+    Characters arriving after a longer pause start a new code, so a stray key
+    press doesn't end up in front of the next scan. Scans are collected for
+    one frame before the batch is handed over, with repeated scans of a code
+    counted up. The next batch is only handed over a frame after the last one
+    was reported done, so the cart and the screen are updated at most once
+    per frame however fast the scanner goes; when adding to the cart falls
+    behind, the batches just get bigger.
+
+    Attributes:
+     - widget: Any widget with an after() method, usually the frame reading
+       the scans.
+     - on_batch (callable): Called on the GUI thread with a dict of the
+       number of scans of each code, in the order they were first scanned.
+       done() must be called once the batch is handled.
+     - frame_ms (int): Milliseconds to collect scans before handing them over.
+     - key_gap_ms (int): The longest pause between the keystrokes of one scan.
+     - scans (int): The number of codes read.
+
+    Methods:
+        key(self, char, timestamp):
+            Reads one keystroke.
+
+        scan(self, code):
+            Adds a scanned code to the next batch.
+
+        flush(self):
+            Hands over the scans collected so far.
+
+        done(self):
+            Reports that the last batch is handled.
+    """
+
+    def __init__(
+        self, widget, on_batch, frame_ms=SCAN_FRAME_MS, key_gap_ms=SCAN_KEY_GAP_MS
+    ):
+        self.widget = widget
+        self.on_batch = on_batch
+        self.frame_ms = frame_ms
+        self.key_gap_ms = key_gap_ms
+        self.scans = 0
+        self.typed = []
+        self.last_key = None
+        self.pending = {}
+        self.scheduled = False
+        self.busy = False
+
+    def key(self, char, timestamp):
+        """
+        Reads one keystroke. Enter ends the code being scanned.
+
+        Args:
+         - char (str): The character typed, as in a Tk event's char.
+         - timestamp (int): The time of the keystroke in milliseconds, as in a
+           Tk event's time.
+        """
+        if not char:
+            # Shift and other keys that type nothing
+            return
+        if self.last_key is not None and timestamp - self.last_key > self.key_gap_ms:
+            self.typed.clear()
+        self.last_key = timestamp
+        if char in ("\r", "\n"):
+            code = "".join(self.typed).strip()
+            self.typed.clear()
+            if code:
+                self.scan(code)
+        else:
+            self.typed.append(char)
+
+    def scan(self, code):
+        """
+        Adds a scanned code to the next batch.
+
+        Args:
+         - code (str): The product ID read by the scanner.
+        """
+        self.scans += 1
+        self.pending[code] = self.pending.get(code, 0) + 1
+        self.schedule()
+
+    def schedule(self):
+        if not self.scheduled and not self.busy:
+            self.scheduled = True
+            self.widget.after(self.frame_ms, self.flush)
+
+    def flush(self):
+        """
+        Hands over the scans collected so far.
+        """
+        self.scheduled = False
+        batch, self.pending = self.pending, {}
+        if batch:
+            self.busy = True
+            self.on_batch(batch)
+
+    def done(self):
+        """
+        Reports that the last batch is handled. Scans read in the meantime
+        are handed over a frame later.
+        """
+        self.busy = False
+        if self.pending:
+            self.schedule()
@@ -0,0 +1,339 @@
+"""
+Usage: prefix and fuzzy product name search for looking up product IDs
+"""
+
+# Imports
+import bisect
+import re
+import threading
+from array import array
+from collections import Counter
+
+from pos_core.inventory import inventory_cache
+
+# Splits "PeanutButter 500g" into "Peanut", "Butter", "500g"
+WORD = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d\w*|[^\W\d_]+")
+
+
+def words_of(text):
+    """
+    Returns the lower-case words of a product name, splitting on spaces,
+    punctuation and CamelCase.
+
+    Args:
+     - text (str): The name.
+
+    Returns:
+     - list: The distinct words in the order they appear.
+    """
+    return list(dict.fromkeys(word.lower() for word in WORD.findall(text)))
+
+
+def id_word(product_id):
+    """
+    Returns the product ID as an index word, reusing the ID string when it
+    has no upper-case letters, as lower() always makes a copy.
+    """
+    word = product_id.lower()
+    return product_id if word == product_id else word
+
+
+def trigrams_of(word):
+    """
+    Returns the trigrams of a word, padded so short words and word starts
+    get their own trigrams.
+
+    Args:
+     - word (str): A lower-case word.
+
+    Returns:
+     - set: The trigrams.
+    """
+    padded = f"  {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    A search index over the product names and IDs of an inventory.
+
+    Every name is split into words, and the product ID counts as one more
+    word. The distinct words are kept in a sorted list, so a prefix lookup is
+    a binary search, like walking a trie but without a node per character.
+    Each word holds the rows of the products containing it: a plain int for
+    a word found in one product, which most product IDs and numbers are, or
+    an array of rows. A trigram index over the words, excluding numbers,
+    answers misspelled queries. Each trigram holds the set of words with it,
+    so a word can be dropped from it without a scan.
+
+    The index follows the inventory cache: added, renamed and deleted
+    products are applied as they happen, and a reloaded inventory marks the
+    index stale so the next search rebuilds it.
+
+    Attributes:
+     - cache (InventoryCache): The inventory to index.
+     - stale (bool): Whether the index must be rebuilt before the next search.
+
+    Methods:
+        search(self, query, limit=8):
+            Returns the product IDs best matching a query.
+
+        rebuild(self):
+            Indexes the whole inventory again.
+
+        prepare(self):
+            Builds the index now if it is stale.
+
+        add(self, product_id, name):
+            Indexes a product, replacing its previous name.
+
+        remove(self, product_id):
+            Removes a product from the index.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or inventory_cache
+        self.lock = threading.RLock()
+        self.stale = True
+        self.clear()
+        self.cache.subscribe(self.on_change)
+
+    def clear(self):
+        self.ids = []
+        self.names = []
+        self.rows = {}
+        self.words = []
+        self.postings = {}
+        self.trigrams = {}
+
+    def on_change(self, records):
+        """
+        Applies inventory changes to the index.
+
+        Args:
+         - records (list): The mutation records, or None after a reload.
+        """
+        with self.lock:
+            if records is None:
+                self.stale = True
+            elif not self.stale:
+                for record in records:
+                    if record[0] == "set":
+                        self.add(record[2], record[1])
+                    elif record[0] == "delete":
+                        self.remove(record[1])
+
+    def rebuild(self):
+        """
+        Indexes the whole inventory again, holding the storage lock so the
+        inventory doesn't change underneath.
+        """
+        with self.cache.transaction() as inventory, self.lock:
+            self.clear()
+            for product in inventory.values():
+                product_id = product.product_id
+                name = product.name
+                self.rows[product_id] = row = len(self.ids)
+                self.ids.append(product_id)
+                self.names.append(name)
+                for word in words_of(name) + [id_word(product_id)]:
+                    self.post(word, row)
+            self.words = sorted(self.postings)
+            for word in self.words:
+                self.index_trigrams(word)
+            self.stale = False
+
+    def prepare(self):
+        """
+        Builds the index now if it is stale, loading the inventory if needed,
+        so the first search doesn't wait for it.
+        """
+        if self.stale:
+            self.rebuild()
+
+    def post(self, word, row):
+        """
+        Adds a row to the postings of a word.
+
+        Returns:
+         - bool: True if the word is new to the index.
+        """
+        rows = self.postings.get(word)
+        if rows is None:
+            self.postings[word] = row
+            return True
+        if isinstance(rows, int):
+            self.postings[word] = array("I", (rows, row))
+        else:
+            rows.append(row)
+        return False
+
+    def unpost(self, word, row):
+        """
+        Removes a row from the postings of a word.
+
+        Returns:
+         - bool: True if no product has the word any more.
+        """
+        rows = self.postings[word]
+        if isinstance(rows, int):
+            del self.postings[word]
+            return True
+        # Rows are appended in order, so the postings are sorted
+        del rows[bisect.bisect_left(rows, row)]
+        if len(rows) == 1:
+            self.postings[word] = rows[0]
+        return False
+
+    def rows_of(self, word, limit):
+        """
+        Returns up to limit rows of the products with a word.
+        """
+        rows = self.postings[word]
+        if isinstance(rows, int):
+            return [rows]
+        return rows[:limit]
+
+    def index_trigrams(self, word):
+        if word.isdigit():
+            return
+        for trigram in trigrams_of(word):
+            self.trigrams.setdefault(trigram, set()).add(word)
+
+    def add(self, product_id, name):
+        """
+        Indexes a product, replacing its previous name.
+
+        Args:
+         - product_id (str): The ID of the product.
+         - name (str): The name of the product.
+        """
+        with self.lock:
+            row = self.rows.get(product_id)
+            if row is not None:
+                if self.names[row] == name:
+                    return
+                self.remove(product_id)
+            row = len(self.ids)
+            self.rows[product_id] = row
+            self.ids.append(product_id)
+            self.names.append(name)
+            for word in words_of(name) + [id_word(product_id)]:
+                if self.post(word, row):
+                    bisect.insort(self.words, word)
+                    self.index_trigrams(word)
+
+    def remove(self, product_id):
+        """
+        Removes a product from the index. Its row is left unused.
+
+        Args:
+         - product_id (str): The ID of the product.
+        """
+        with self.lock:
+            row = self.rows.pop(product_id, None)
+            if row is None:
+                return
+            for word in words_of(self.names[row]) + [id_word(product_id)]:
+                if self.unpost(word, row):
+                    del self.words[bisect.bisect_left(self.words, word)]
+                    if not word.isdigit():
+                        for trigram in trigrams_of(word):
+                            words = self.trigrams[trigram]
+                            words.discard(word)
+                            if not words:
+                                del self.trigrams[trigram]
+            self.ids[row] = None
+            self.names[row] = None
+
+    def prefix_rows(self, prefix, limit):
+        """
+        Returns up to limit rows holding a word starting with the prefix.
+        """
+        found = []
+        words = self.words
+        for position in range(bisect.bisect_left(words, prefix), len(words)):
+            word = words[position]
+            if not word.startswith(prefix):
+                break
+            found.extend(self.rows_of(word, limit - len(found)))
+            if len(found) >= limit:
+                break
+        return found
+
+    def similar_words(self, word, count=5):
+        """
+        Returns the indexed words sharing the most trigrams with a word.
+
+        A word sharing at least threshold of the n trigrams must have one of
+        the n - threshold + 1 rarest, so only the words of those are counted,
+        and the common trigrams, like a first letter, are only looked up for
+        them.
+        """
+        found = sorted(
+            (self.trigrams.get(trigram, set()) for trigram in trigrams_of(word)),
+            key=len,
+        )
+        threshold = max(2, len(found) // 2)
+        rare = len(found) - threshold + 1
+        scores = Counter()
+        for words in found[:rare]:
+            scores.update(words)
+        for words in found[rare:]:
+            scores.update(words.intersection(scores))
+        best = sorted(
+            (
+                (-score, candidate)
+                for candidate, score in scores.items()
+                if score >= threshold
+            )
+        )
+        return [candidate for _, candidate in best[:count]]
+
+    def search(self, query, limit=8):
+        """
+        Returns the product IDs best matching a query.
+
+        The last word of the query is the one being typed: products with a
+        word starting with it, and containing the other query words, come
+        first. When there are fewer than limit of them, products with words
+        spelled like it follow. Searching a stale index rebuilds it first.
+
+        Args:
+         - query (str): Part of a product name or ID, as typed.
+         - limit (int): The maximum number of results.
+
+        Returns:
+         - list: (product_id, name) tuples.
+        """
+        query_words = [word.lower() for word in query.split()]
+        if not query_words:
+            return []
+        self.prepare()
+        with self.lock:
+            results = []
+            seen = set()
+            typed, rest = query_words[-1], query_words[:-1]
+
+            def accept(row):
+                if row in seen or self.ids[row] is None:
+                    return
+                seen.add(row)
+                name = self.names[row].lower()
+                if all(word in name for word in rest):
+                    results.append((self.ids[row], self.names[row]))
+
+            # Over-fetch so rows failing the other query words don't starve the list
+            for row in self.prefix_rows(typed, limit * 4 if rest else limit):
+                accept(row)
+                if len(results) == limit:
+                    return results
+            for word in self.similar_words(typed):
+                for row in self.rows_of(word, limit):
+                    accept(row)
+                    if len(results) == limit:
+                        return results
+            return results
+
+
+name_index = NameIndex()
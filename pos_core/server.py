@@ -0,0 +1,333 @@
+"""
+Usage: python -m pos_core.server [--host HOST] [--port PORT] [--unix PATH]
+                                 [--inventory FILE] [--max-batch N]
+
+A register server keeping one inventory in memory for every register on the
+machine. Start the GUI with POS_SERVER=127.0.0.1:8765 to sell through it.
+"""
+
+# Imports
+import argparse
+import asyncio
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+
+from pos_core.client import error_fields, product_fields
+from pos_core.constants import (
+    COMMIT_MAX_BATCH,
+    INVENTORY_FILE,
+    READER_THREADS,
+    SERVER_HOST,
+    SERVER_PORT,
+)
+from pos_core.errors import ProductNotFoundError, RemoteError
+from pos_core.inventory import InventoryCache, inventory_cache
+from pos_core.metrics import metrics
+from pos_core.register import (
+    add_product,
+    checkout_snapshot,
+    delete_product,
+    purchase_of,
+    return_receipt,
+    update_product,
+)
+from pos_core.storage import open_storage
+
+PRODUCT_WRITES = {
+    "add_product": add_product,
+    "update_product": update_product,
+    "delete_product": delete_product,
+}
+
+
+class RegisterServer:
+    """
+    Serves the register operations to many registers over JSON lines, the
+    protocol of RegisterClient.
+
+    Lookups are answered by reader threads from the cached inventory, so a
+    lookup that waits for a commit never holds up the event loop. Every
+    write, checkouts, returns and product changes, is queued and committed
+    by one worker thread: while a batch is being written, the writes that
+    arrive queue up and are committed together as the next batch, under one
+    hold of the inventory lock. Consecutive checkouts in a batch share one
+    inventory write and one receipt append. Each write gets its own result
+    or error, and a failed commit fails only the writes it had not made.
+    Each connection is answered in order, so a register sees its own writes.
+
+    Attributes:
+     - cache (InventoryCache): The inventory served.
+     - max_batch (int): The most writes committed together.
+     - batches (int): The batches committed so far.
+     - committed (int): The writes committed so far.
+
+    Methods:
+        serve(self, host=SERVER_HOST, port=SERVER_PORT, path=None, ready=None):
+            Serves registers until cancelled.
+
+        handle(self, reader, writer):
+            Answers the requests of one connection.
+
+        commit(self, batch, results):
+            Commits a batch of writes.
+    """
+
+    def __init__(self, cache=None, max_batch=COMMIT_MAX_BATCH):
+        self.cache = cache or inventory_cache
+        self.max_batch = max_batch
+        self.batches = 0
+        self.committed = 0
+        self.pending = deque()
+        self.wakeup = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.readers = ThreadPoolExecutor(max_workers=READER_THREADS)
+        self.operations = {
+            "get_product": self.get_product,
+            "checkout": self.checkout,
+            "purchase_of": self.purchase_of,
+            "return_receipt": self.return_receipt,
+            "add_product": self.product_write("add_product"),
+            "update_product": self.product_write("update_product"),
+            "delete_product": self.product_write("delete_product"),
+            "stats": self.stats,
+        }
+
+    async def serve(self, host=SERVER_HOST, port=SERVER_PORT, path=None, ready=None):
+        """
+        Serves registers until cancelled.
+
+        Args:
+         - host (str): The address to listen on.
+         - port (int): The TCP port, 0 for any free port.
+         - path (str): A Unix socket to listen on instead.
+         - ready (callable): Called with the asyncio server once it listens.
+        """
+        self.wakeup = asyncio.Event()
+        committer = asyncio.create_task(self.commit_loop())
+        # Load the inventory before the first register connects
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.cache.get)
+        if path:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        try:
+            async with server:
+                if ready is not None:
+                    ready(server)
+                await server.serve_forever()
+        finally:
+            committer.cancel()
+            self.executor.shutdown(wait=True)
+            self.readers.shutdown(wait=True)
+
+    async def handle(self, reader, writer):
+        """
+        Answers the requests of one connection, one line each, in order.
+        """
+        try:
+            while line := await reader.readline():
+                response = await self.respond(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, line):
+        """
+        Runs one request.
+
+        Returns:
+         - dict: The response, with the result or the error.
+        """
+        number = None
+        try:
+            request = json.loads(line)
+            number = request.get("id")
+            operation = self.operations.get(request.get("op"))
+            if operation is None:
+                raise ValueError(f"unknown operation {request.get('op')!r}")
+            result = operation(*request.get("args", []))
+            if asyncio.iscoroutine(result):
+                result = await result
+        except Exception as error:
+            name, args = error_fields(error)
+            return {"id": number, "error": name, "args": args}
+        return {"id": number, "result": result}
+
+    async def read(self, function, *args):
+        """
+        Runs a lookup on a reader thread.
+
+        Returns:
+         - The result of the lookup.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.readers, function, *args)
+
+    async def get_product(self, product_id):
+        return await self.read(self.find_product, product_id)
+
+    def find_product(self, product_id):
+        with self.cache.reading() as inventory:
+            if product_id not in inventory:
+                raise ProductNotFoundError(product_id)
+            return product_fields(inventory[product_id])
+
+    async def checkout(self, quantities, card_number=None):
+        return await self.write("checkout", quantities, card_number)
+
+    async def purchase_of(self, receipt_number):
+        return await self.read(self.find_purchase, receipt_number)
+
+    def find_purchase(self, receipt_number):
+        purchase = purchase_of(receipt_number)
+        return [
+            purchase.number,
+            [list(item) for item in purchase.items.values()],
+            purchase.total,
+            purchase.returned,
+        ]
+
+    async def return_receipt(self, receipt_number, quantities):
+        return await self.write("return_receipt", receipt_number, quantities)
+
+    def product_write(self, kind):
+        async def write(*args):
+            return await self.write(kind, *args)
+
+        return write
+
+    def stats(self):
+        return {"batches": self.batches, "committed": self.committed}
+
+    async def write(self, kind, *args):
+        """
+        Queues a write for the next batch and waits until it is committed.
+
+        Returns:
+         - The result of the write.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((kind, args, future))
+        self.wakeup.set()
+        return await future
+
+    async def commit_loop(self):
+        """
+        Commits the queued writes, a batch at a time.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.pending:
+                batch = [
+                    self.pending.popleft()
+                    for _ in range(min(len(self.pending), self.max_batch))
+                ]
+                results = []
+                try:
+                    await loop.run_in_executor(
+                        self.executor, self.commit, batch, results
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except BaseException as error:
+                    if not isinstance(error, Exception):
+                        error = RemoteError(f"commit failed: {error!r}")
+                    # The writes with a result were made before the failure
+                    results += [(None, error)] * (len(batch) - len(results))
+                for (_, _, future), (result, error) in zip(batch, results):
+                    if future.done():
+                        continue
+                    if error is None:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(error)
+
+    @metrics.timed("group_commit")
+    def commit(self, batch, results):
+        """
+        Commits a batch of writes in order with the inventory lock held.
+
+        Args:
+         - batch (list): (kind, args, future) tuples.
+         - results (list): Gets a (result, error) pair appended per write
+           as it is made, so the writes made before a failure are known.
+        """
+        with self.cache.transaction():
+            for kind, writes in groupby(batch, key=itemgetter(0)):
+                writes = list(writes)
+                if kind == "checkout":
+                    carts = [args[0] for _, args, _ in writes]
+                    members = [args[1] for _, args, _ in writes]
+                    try:
+                        checked = checkout_snapshot(
+                            carts, self.cache.get(), self.cache, members
+                        )
+                    except Exception as error:
+                        # No cart of the group was checked out
+                        results += [(None, error)] * len(writes)
+                        continue
+                    for result in checked:
+                        if result.accepted:
+                            results.append(
+                                ([result.receipt_number, result.receipt], None)
+                            )
+                        else:
+                            results.append((None, result.error))
+                    continue
+                for _, args, _ in writes:
+                    try:
+                        results.append((self.apply(kind, *args), None))
+                    except Exception as error:
+                        results.append((None, error))
+        self.batches += 1
+        self.committed += len(batch)
+
+    def apply(self, kind, *args):
+        """
+        Runs one return or product change.
+        """
+        if kind == "return_receipt":
+            receipt_number, quantities = args
+            return return_receipt(receipt_number, quantities, self.cache)
+        return product_fields(PRODUCT_WRITES[kind](*args, cache=self.cache))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve one inventory to many registers"
+    )
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--unix", help="listen on a Unix socket instead")
+    parser.add_argument("--inventory", default=INVENTORY_FILE)
+    parser.add_argument("--max-batch", type=int, default=COMMIT_MAX_BATCH)
+    arguments = parser.parse_args()
+
+    server = RegisterServer(
+        InventoryCache(open_storage(arguments.inventory)), arguments.max_batch
+    )
+
+    def ready(listener):
+        if arguments.unix:
+            address = arguments.unix
+        else:
+            host, port = listener.sockets[0].getsockname()[:2]
+            address = f"{host}:{port}"
+        print(f"Serving {arguments.inventory} on {address}", flush=True)
+
+    try:
+        asyncio.run(server.serve(arguments.host, arguments.port, arguments.unix, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
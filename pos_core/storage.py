@@ -0,0 +1,705 @@
+"""
+Usage: inventory storage backends, the text file with its journal and SQLite
+"""
+
+# Imports
+import os
+import sqlite3
+import zlib
+from collections.abc import Mapping
+from array import array
+from itertools import accumulate, islice, repeat
+
+from pos_core.binary_snapshot import load_binary_snapshot, write_binary_snapshot
+from pos_core.constants import (
+    BINARY_SNAPSHOT_SUFFIX,
+    COMPACT_JOURNAL_BYTES,
+    JOURNAL_SUFFIX,
+    SAVE_CHUNK_PRODUCTS,
+    SQLITE_EXTENSIONS,
+)
+from pos_core.locking import file_lock
+from pos_core.metrics import metrics
+from pos_core.products import Product, ProductStore
+
+
+class InventoryStorage:
+    """
+    The interface every inventory storage backend implements.
+
+    Mutations are passed as records: ("delta", product_id, change),
+    ("set", name, product_id, price, quantity) or ("delete", product_id).
+    All records passed to one apply() call are persisted together.
+
+    Registers sharing a storage serialize their read-modify-write sections
+    with lock(), an advisory lock on a file next to the inventory.
+
+    Methods:
+        signature(self):
+            Returns a value that changes whenever the stored inventory changes.
+
+        load(self):
+            Returns the stored inventory as a mapping of product ID to Product.
+
+        refresh(self, inventory):
+            Brings a loaded inventory up to date with the storage.
+
+        save(self, inventory):
+            Replaces the stored inventory with the given products.
+
+        apply(self, inventory, records):
+            Persists the records and returns the updated inventory.
+
+        apply_many(self, inventory, chunks):
+            Persists a stream of record chunks in one pass.
+
+        lock(self):
+            Returns the lock shared by every register using this storage.
+    """
+
+    def signature(self):
+        raise NotImplementedError
+
+    def load(self):
+        raise NotImplementedError
+
+    def refresh(self, inventory):
+        """
+        Brings a loaded inventory up to date with the storage.
+
+        Args:
+         - inventory (Mapping): The inventory returned by load().
+
+        Returns:
+         - tuple: The up to date inventory, and the records applied to bring
+           it up to date, or None if it was loaded again.
+        """
+        return self.load(), None
+
+    def save(self, inventory):
+        raise NotImplementedError
+
+    def apply(self, inventory, records):
+        raise NotImplementedError
+
+    def apply_many(self, inventory, chunks):
+        """
+        Persists a stream of record chunks, such as a bulk import, and returns
+        the updated inventory. Backends override this to write everything in
+        one pass instead of once per chunk.
+
+        Args:
+         - inventory (Mapping): The loaded inventory.
+         - chunks (iterable): Lists of mutation records.
+
+        Returns:
+         - Mapping: The updated inventory.
+        """
+        for records in chunks:
+            inventory = self.apply(inventory, records)
+        return inventory
+
+    def lock(self):
+        """
+        Returns the lock shared by every register using this storage.
+
+        Returns:
+         - FileLock: The lock on the .lock file next to the inventory.
+        """
+        return file_lock(self.filename + ".lock")
+
+
+class TextStorage(InventoryStorage):
+    """
+    Inventory storage in the comma-separated text format, one product per line.
+
+    Mutations are appended to a journal next to the snapshot and compacted
+    into the snapshot once the journal grows past COMPACT_JOURNAL_BYTES.
+    The first line of a journal holds the checksum of the snapshot it applies
+    to, so a journal left behind by an interrupted compaction is never
+    replayed twice.
+
+    The storage remembers how far into the journal the loaded inventory goes,
+    so refresh() only applies the records other registers appended since.
+
+    Every snapshot also gets a binary snapshot next to it, made when the
+    snapshot is saved or first loaded. Loading reads the binary snapshot's
+    columns instead of parsing the text, as long as it was made of a text
+    snapshot with the same size and checksum.
+
+    Attributes:
+     - filename (str): The name of the inventory file.
+     - journal (str): The name of the journal file.
+     - binary_snapshot (str): The name of the binary snapshot file.
+     - base_signature (tuple): The (mtime, size) of the loaded snapshot.
+     - base_checksum (int): The checksum of the loaded snapshot.
+     - journal_position (int): The journal bytes applied to the loaded inventory.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.journal = filename + JOURNAL_SUFFIX
+        self.binary_snapshot = filename + BINARY_SNAPSHOT_SUFFIX
+        self.base_signature = None
+        self.base_checksum = None
+        self.journal_position = 0
+
+    def signature(self):
+        """
+        Returns the (mtime, size) pairs of the snapshot and the journal.
+
+        Returns:
+         - tuple: The signature of the snapshot and of the journal, where a
+           missing file is None.
+        """
+        return (file_signature(self.filename), file_signature(self.journal))
+
+    @metrics.timed("inventory_load")
+    def load(self):
+        """
+        Reads the snapshot and replays the journal on top of it. Call with
+        lock() held, as a stale journal gets removed.
+
+        The products come from the binary snapshot when it matches the text
+        snapshot; otherwise the text is parsed and the binary snapshot made
+        again.
+
+        Returns:
+         - ProductStore: The products keyed by product ID.
+        """
+        try:
+            with open(self.filename, "rb") as file:
+                content = file.read()
+        except FileNotFoundError:
+            print(f"\nFile {self.filename} not found\nProgram stopped!\n")
+            exit()
+        metrics.read("inventory", len(content))
+        checksum = zlib.crc32(content)
+
+        data = load_binary_snapshot(self.binary_snapshot, len(content), checksum)
+        if data is None:
+            data = parse_inventory(content.decode())
+            self.write_binary_snapshot(data, len(content), checksum)
+
+        self.base_signature = file_signature(self.filename)
+        self.base_checksum = checksum
+        self.journal_position = 0
+        return self.replay_journal(data)
+
+    def write_binary_snapshot(self, inventory, size, checksum):
+        """
+        Writes the binary snapshot of the text snapshot. The binary snapshot
+        only speeds up loading, so failing to write it is not an error.
+        """
+        try:
+            write_binary_snapshot(self.binary_snapshot, inventory, size, checksum)
+        except OSError:
+            pass
+
+    @metrics.timed("inventory_refresh")
+    def refresh(self, inventory):
+        """
+        Applies the journal records appended since the inventory was loaded,
+        or loads it again if the snapshot was replaced.
+
+        Args:
+         - inventory (ProductStore): The inventory returned by load().
+
+        Returns:
+         - tuple: The up to date inventory, and the records applied to it, or
+           None if it was loaded again.
+        """
+        if file_signature(self.filename) != self.base_signature:
+            return self.load(), None
+        try:
+            with open(self.journal, "rb") as file:
+                file.seek(self.journal_position)
+                tail = file.read()
+        except FileNotFoundError:
+            return self.load(), None
+        metrics.read("inventory_journal", len(tail))
+
+        complete = tail[: tail.rfind(b"\n") + 1]
+        lines = complete.decode().split("\n")[:-1]
+        if self.journal_position == 0:
+            if not lines or lines[0] != f"base,{self.base_checksum}":
+                return self.load(), None
+            lines = lines[1:]
+        records = [line.split(",") for line in lines]
+        apply_records(inventory, records)
+        self.journal_position += len(complete)
+        return inventory, records
+
+    @metrics.timed("inventory_save")
+    def save(self, inventory):
+        """
+        Writes a new snapshot and removes the journal folded into it.
+
+        The snapshot is written to a temporary file and moved into place, so a
+        crash never leaves a truncated file. It is formatted and checksummed
+        SAVE_CHUNK_PRODUCTS products at a time, so a large inventory is never
+        held in memory twice.
+
+        Args:
+         - inventory (dict): A dictionary containing Product instances.
+        """
+        checksum = 0
+        size = 0
+        products = iter(inventory.values())
+        temporary_filename = self.filename + ".tmp"
+        with open(temporary_filename, "wb") as file:
+            while True:
+                content = "".join(
+                    f"{item.name},{item.product_id},{item.price},{item.quantity}\n"
+                    for item in islice(products, SAVE_CHUNK_PRODUCTS)
+                ).encode()
+                if not content:
+                    break
+                file.write(content)
+                checksum = zlib.crc32(content, checksum)
+                size += len(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_filename, self.filename)
+        metrics.written("inventory", size)
+
+        try:
+            os.remove(self.journal)
+        except FileNotFoundError:
+            pass
+        self.base_signature = file_signature(self.filename)
+        self.base_checksum = checksum
+        self.journal_position = 0
+        self.write_binary_snapshot(inventory, size, checksum)
+
+    def apply(self, inventory, records):
+        """
+        Appends the records to the journal and applies them in memory. Call
+        with lock() held and the inventory refreshed.
+
+        Args:
+         - inventory (dict): The loaded inventory.
+         - records (list): The mutation records.
+
+        Returns:
+         - dict: The updated inventory.
+        """
+        self.journal_position = self.append_journal(records)
+        apply_records(inventory, records)
+        if self.journal_position > COMPACT_JOURNAL_BYTES:
+            self.save(inventory)
+        return inventory
+
+    @metrics.timed("inventory_apply_many")
+    def apply_many(self, inventory, chunks):
+        """
+        Applies the chunks in memory and writes one new snapshot, rather than
+        journaling records that would be compacted right away. Call with
+        lock() held and the inventory refreshed.
+
+        Args:
+         - inventory (dict): The loaded inventory.
+         - chunks (iterable): Lists of mutation records.
+
+        Returns:
+         - dict: The updated inventory.
+        """
+        for records in chunks:
+            apply_records(inventory, records)
+        self.save(inventory)
+        return inventory
+
+    @metrics.timed("inventory_journal_append")
+    def append_journal(self, records):
+        """
+        Appends mutation records to the journal, after cutting off a line
+        left incomplete by a crash.
+
+        Args:
+         - records (list): The mutation records.
+
+        Returns:
+         - int: The size of the journal after the append.
+        """
+        lines = []
+        size = os.path.getsize(self.journal) if os.path.exists(self.journal) else 0
+        if size == 0:
+            with open(self.filename, "rb") as file:
+                lines.append(f"base,{zlib.crc32(file.read())}\n")
+        for record in records:
+            lines.append(",".join(str(value) for value in record) + "\n")
+
+        with open(self.journal, "r+b" if size else "wb") as file:
+            if size:
+                file.seek(max(size - 4096, 0))
+                tail = file.read()
+                if not tail.endswith(b"\n"):
+                    size -= len(tail) - tail.rfind(b"\n") - 1
+                    file.truncate(size)
+                file.seek(size)
+            content = "".join(lines).encode()
+            file.write(content)
+            metrics.written("inventory_journal", len(content))
+            file.flush()
+            os.fsync(file.fileno())
+            return file.tell()
+
+    def replay_journal(self, data):
+        """
+        Applies the journal to the loaded snapshot.
+
+        A journal written against another snapshot is stale and gets removed.
+        An incomplete last line, left by a crash during an append, is ignored.
+
+        Args:
+         - data (dict): The products loaded from the snapshot.
+
+        Returns:
+         - dict: The same dictionary with the journal applied.
+        """
+        try:
+            with open(self.journal, "rb") as file:
+                content = file.read()
+        except FileNotFoundError:
+            return data
+        metrics.read("inventory_journal", len(content))
+
+        complete = content[: content.rfind(b"\n") + 1]
+        lines = complete.decode().split("\n")[:-1]
+        if not lines or lines[0] != f"base,{self.base_checksum}":
+            os.remove(self.journal)
+            return data
+
+        self.journal_position = len(complete)
+        return apply_records(data, (line.split(",") for line in lines[1:]))
+
+
+class SQLiteInventory(Mapping):
+    """
+    A read-only view of the products in an SQLite inventory.
+
+    Every lookup is a single indexed query, so nothing is loaded up front.
+
+    Attributes:
+     - connection (sqlite3.Connection): The connection to query.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getitem__(self, product_id):
+        row = self.connection.execute(
+            "SELECT name, product_id, price, quantity FROM products"
+            " WHERE product_id = ?",
+            (product_id,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(product_id)
+        return Product(*row)
+
+    def __contains__(self, product_id):
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM products WHERE product_id = ?", (product_id,)
+            ).fetchone()
+            is not None
+        )
+
+    def __iter__(self):
+        for (product_id,) in self.connection.execute(
+            "SELECT product_id FROM products ORDER BY rowid"
+        ):
+            yield product_id
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def values(self):
+        """
+        Yields every product with a single query.
+        """
+        for row in self.connection.execute(
+            "SELECT name, product_id, price, quantity FROM products ORDER BY rowid"
+        ):
+            yield Product(*row)
+
+
+class SQLiteStorage(InventoryStorage):
+    """
+    Inventory storage in an SQLite database in WAL mode.
+
+    Products are keyed by an indexed product_id, stock changes are single-row
+    UPDATEs and every apply() call runs in one transaction, so several
+    registers can share the database safely.
+
+    Attributes:
+     - filename (str): The name of the database file.
+     - connection (sqlite3.Connection): The connection to the database.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS products ("
+            "product_id TEXT PRIMARY KEY, name TEXT NOT NULL,"
+            " price REAL NOT NULL, quantity INTEGER NOT NULL)"
+        )
+        self.connection.commit()
+
+    def signature(self):
+        """
+        Returns a value that changes on commits from this or any other connection.
+
+        Returns:
+         - tuple: The data version and the number of changes made here.
+        """
+        data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        return (data_version, self.connection.total_changes)
+
+    def load(self):
+        """
+        Returns a live view of the database.
+
+        Returns:
+         - SQLiteInventory: The products keyed by product ID.
+        """
+        return SQLiteInventory(self.connection)
+
+    @metrics.timed("inventory_save")
+    def save(self, inventory):
+        """
+        Replaces every product in the database in one transaction.
+
+        Args:
+         - inventory (dict): A dictionary containing Product instances.
+        """
+        products = [
+            (item.product_id, item.name, item.price, item.quantity)
+            for item in inventory.values()
+        ]
+        with self.connection:
+            self.connection.execute("DELETE FROM products")
+            self.connection.executemany(
+                "INSERT INTO products (product_id, name, price, quantity)"
+                " VALUES (?, ?, ?, ?)",
+                products,
+            )
+
+    @metrics.timed("inventory_apply")
+    def apply(self, inventory, records):
+        """
+        Runs the records as one transaction.
+
+        Args:
+         - inventory (SQLiteInventory): The live view of the database.
+         - records (list): The mutation records.
+
+        Returns:
+         - SQLiteInventory: The same live view.
+        """
+        with self.connection:
+            self.execute_records(records)
+        return inventory
+
+    @metrics.timed("inventory_apply_many")
+    def apply_many(self, inventory, chunks):
+        """
+        Runs every chunk in one transaction.
+
+        Args:
+         - inventory (SQLiteInventory): The live view of the database.
+         - chunks (iterable): Lists of mutation records.
+
+        Returns:
+         - SQLiteInventory: The same live view.
+        """
+        with self.connection:
+            for records in chunks:
+                self.execute_records(records)
+        return inventory
+
+    def execute_records(self, records):
+        """
+        Runs the statements of mutation records in the open transaction.
+
+        Args:
+         - records (list): The mutation records.
+        """
+        for record in records:
+            if record[0] == "delta":
+                self.connection.execute(
+                    "UPDATE products SET quantity = quantity + ?"
+                    " WHERE product_id = ?",
+                    (int(record[2]), record[1]),
+                )
+            elif record[0] == "set":
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO products"
+                    " (product_id, name, price, quantity) VALUES (?, ?, ?, ?)",
+                    (record[2], record[1], float(record[3]), int(record[4])),
+                )
+            elif record[0] == "delete":
+                self.connection.execute(
+                    "DELETE FROM products WHERE product_id = ?", (record[1],)
+                )
+
+
+def file_signature(filename):
+    """
+    Returns the (mtime, size) pair used to detect changes to a file.
+
+    Args:
+     - filename (str): The name of the file.
+
+    Returns:
+     - tuple: The signature, or None if the file does not exist.
+    """
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def parse_inventory(text):
+    """
+    Parses a text inventory into a ProductStore. The columns are built in one
+    go unless a product ID repeats, in which case the later line wins.
+
+    Args:
+     - text (str): The content of the text inventory.
+
+    Returns:
+     - ProductStore: The products keyed by product ID.
+
+    Raises:
+     - ValueError: If a line does not have four fields, or its price or
+       quantity is not a number.
+    """
+    lines = text.splitlines()
+    # One flat list of fields, as a list per line keeps the garbage collector busy
+    fields = ",".join(lines).split(",")
+    if lines and set(map(str.count, lines, repeat(","))) == {3}:
+        # The store keeps a newline after every ID
+        encoded_ids = [f"{product_id}\n".encode() for product_id in fields[1::4]]
+        # A line's surrounding whitespace is stripped, as below
+        encoded = list(map(str.encode, map(str.lstrip, fields[0::4])))
+        name_lengths = array("I", map(len, encoded))
+        try:
+            return ProductStore.from_columns(
+                bytearray(b"".join(encoded_ids)),
+                array("I", accumulate(map(len, encoded_ids), initial=0)),
+                bytearray(b"".join(encoded)),
+                array("I", accumulate(name_lengths, initial=0))[:-1],
+                name_lengths,
+                array("d", map(float, fields[2::4])),
+                array("q", map(int, fields[3::4])),
+            )
+        except ValueError:
+            # A repeated ID or a bad number, sorted out line by line
+            pass
+
+    data = ProductStore()
+    data.reserve(len(lines))
+    for line in lines:
+        name, product_id, price, quantity = line.strip().split(",")
+        data.put(name, product_id, price, quantity)
+    return data
+
+
+def open_storage(filename):
+    """
+    Returns the storage backend for an inventory file, chosen by its extension.
+
+    Args:
+     - filename (str): The name of the inventory file.
+
+    Returns:
+     - InventoryStorage: SQLiteStorage for .db, .sqlite and .sqlite3 files,
+       TextStorage otherwise.
+    """
+    if os.path.splitext(filename)[1] in SQLITE_EXTENSIONS:
+        return SQLiteStorage(filename)
+    return TextStorage(filename)
+
+
+def read_file(filename):
+    """
+    Reads data from a file and returns a dictionary.
+
+    Args:
+     - filename (str): The name of the file to read, a text inventory or an
+       SQLite database.
+
+    Returns:
+     - dict: A dictionary containing entity instances.
+    """
+    storage = open_storage(filename)
+    with storage.lock():
+        return storage.load()
+
+
+def save_file(filename, dictionary):
+    """
+    Saves data to a file.
+
+    Args:
+     - filename (str): The name of the file to save, a text inventory or an
+       SQLite database.
+     - dictionary (dict): A dictionary containing entity instances.
+    """
+    storage = open_storage(filename)
+    with storage.lock():
+        storage.save(dictionary)
+
+
+def apply_records(data, records):
+    """
+    Applies mutation records to a loaded inventory.
+
+    Records may hold typed values or the strings read back from a journal.
+
+    Args:
+     - data (dict): The products keyed by product ID.
+     - records (iterable): The mutation records.
+
+    Returns:
+     - dict: The same dictionary with the records applied.
+    """
+    for record in records:
+        if record[0] == "delta" and record[1] in data:
+            data[record[1]].add_quantity(int(record[2]))
+        elif record[0] == "set":
+            data[record[2]] = Product(*record[1:])
+        elif record[0] == "delete":
+            data.pop(record[1], None)
+    return data
+
+
+def compact_file(filename):
+    """
+    Folds the journal of an inventory file back into its snapshot.
+
+    Args:
+     - filename (str): The name of the inventory file.
+    """
+    storage = open_storage(filename)
+    with storage.lock():
+        storage.save(storage.load())
+
+
+def migrate_inventory(source, target):
+    """
+    Copies an inventory from one storage backend to another.
+
+    Args:
+     - source (str): The name of the inventory to read.
+     - target (str): The name of the inventory to write.
+    """
+    source_storage = open_storage(source)
+    target_storage = open_storage(target)
+    with source_storage.lock(), target_storage.lock():
+        target_storage.save(source_storage.load())
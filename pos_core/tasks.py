@@ -0,0 +1,181 @@
+"""
+Usage: run register operations on worker threads and hand the results back to
+the GUI thread, plus a monitor for how long the GUI event loop stalls
+"""
+
+# Imports
+import queue
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskRunner:
+    """
+    Runs blocking operations on a thread pool and delivers their results on
+    the GUI thread.
+
+    Finished tasks are put on a queue that the GUI thread drains from an
+    after() callback, so callbacks may touch widgets. Tasks submitted with the
+    same key run one after another in submission order; tasks with different
+    keys run in parallel. A task that fails without an on_error callback, or
+    a callback that fails, is reported and the other tasks are still
+    delivered.
+
+    Attributes:
+     - widget: Any widget with an after() method, usually the main frame.
+     - poll_interval (int): Milliseconds between checks for finished tasks.
+
+    Methods:
+        submit(self, function, *args, on_done=None, on_error=None, key=None):
+            Runs a function on a worker thread.
+
+        shutdown(self):
+            Waits for running tasks and stops the worker threads.
+    """
+
+    def __init__(self, widget, max_workers=4, poll_interval=10):
+        self.widget = widget
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.finished = queue.Queue()
+        self.waiting = {}
+        self.in_flight = 0
+        self.polling = False
+
+    def submit(self, function, *args, on_done=None, on_error=None, key=None):
+        """
+        Runs a function on a worker thread. Call from the GUI thread.
+
+        Args:
+         - function (callable): The blocking operation.
+         - args: The arguments for the function.
+         - on_done (callable): Called on the GUI thread with the result.
+         - on_error (callable): Called on the GUI thread with the exception.
+         - key (hashable): Tasks with the same key run one at a time, in order.
+        """
+        task = (function, args, on_done, on_error, key)
+        self.in_flight += 1
+        if key is not None and key in self.waiting:
+            self.waiting[key].append(task)
+        else:
+            if key is not None:
+                self.waiting[key] = deque()
+            self.start(task)
+        if not self.polling:
+            self.polling = True
+            self.widget.after(self.poll_interval, self.poll)
+
+    def start(self, task):
+        function, args, _, _, _ = task
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(lambda future: self.finished.put((task, future)))
+
+    def poll(self):
+        """
+        Delivers finished tasks on the GUI thread and starts the next task of
+        each key.
+        """
+        try:
+            while True:
+                try:
+                    task, future = self.finished.get_nowait()
+                except queue.Empty:
+                    break
+                _, _, on_done, on_error, key = task
+                self.in_flight -= 1
+                if key is not None:
+                    if self.waiting[key]:
+                        self.start(self.waiting[key].popleft())
+                    else:
+                        del self.waiting[key]
+
+                error = future.exception()
+                try:
+                    if error is None:
+                        if on_done is not None:
+                            on_done(future.result())
+                    elif on_error is not None:
+                        on_error(error)
+                    else:
+                        report_error(error)
+                except Exception as failure:
+                    report_error(failure)
+        finally:
+            if self.in_flight:
+                self.widget.after(self.poll_interval, self.poll)
+            else:
+                self.polling = False
+
+    def shutdown(self):
+        """
+        Waits for running tasks and stops the worker threads.
+        """
+        self.executor.shutdown(wait=True)
+
+
+def report_error(error):
+    """
+    Prints an error of a background task that nothing else reports.
+
+    Args:
+     - error (Exception): The error.
+    """
+    print(f"\nWarning: background task failed: {error!r}\n")
+    traceback.print_exception(type(error), error, error.__traceback__)
+
+
+class StallMonitor:
+    """
+    Measures how late the GUI event loop runs a timer, which is how long the
+    GUI was frozen by work on its own thread.
+
+    Attributes:
+     - widget: Any widget with an after() method.
+     - interval (int): Milliseconds between timer ticks.
+     - worst (float): The longest stall seen, in milliseconds.
+     - stalls (list): Every stall longer than the interval, in milliseconds.
+
+    Methods:
+        start(self):
+            Starts ticking.
+
+        report(self):
+            Returns the worst stall and the number of long stalls.
+    """
+
+    def __init__(self, widget, interval=10):
+        self.widget = widget
+        self.interval = interval
+        self.worst = 0.0
+        self.stalls = []
+        self.expected = None
+
+    def start(self):
+        """
+        Starts ticking.
+        """
+        self.expected = time.perf_counter() + self.interval / 1000
+        self.widget.after(self.interval, self.tick)
+
+    def tick(self):
+        now = time.perf_counter()
+        stall = (now - self.expected) * 1000
+        self.worst = max(self.worst, stall)
+        if stall > self.interval:
+            self.stalls.append(stall)
+        self.expected = now + self.interval / 1000
+        self.widget.after(self.interval, self.tick)
+
+    def report(self):
+        """
+        Returns the worst stall and the number of long stalls.
+
+        Returns:
+         - str: A one-line summary.
+        """
+        return (
+            f"Worst event loop stall: {self.worst:.1f} ms, "
+            f"{len(self.stalls)} stalls over {self.interval} ms"
+        )
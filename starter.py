@@ -5,7 +5,16 @@ Date: 12-12-2023
 """
 
 # Imports
+import os
+import time
+
+# Startup is measured from here, before the GUI toolkit is imported
+STARTED = time.perf_counter()
+
 from main_code import *
+from pos_core.constants import METRICS_FILE, METRICS_FLUSH_SECONDS
+from pos_core.metrics import metrics
+from pos_core.tasks import StallMonitor
 
 
 class App(ctk.CTk):
@@ -34,8 +43,30 @@ class App(ctk.CTk):
         )
         self.main = Main(self, bg_color="#2D313C")
 
+        # Set POS_MEASURE_STALLS=1 to print how long the GUI froze
+        monitor = StallMonitor(self)
+        if os.environ.get("POS_MEASURE_STALLS"):
+            monitor.start()
+
+        # Set POS_METRICS_FILE to a .prom file to export the metrics
+        if METRICS_FILE:
+            flushing = metrics.start_flushing(METRICS_FILE, METRICS_FLUSH_SECONDS)
+
+        # The first frame takes input once the pending events are handled
+        self.update()
+        startup = time.perf_counter() - STARTED
+        metrics.observe("startup", startup)
+        # Set POS_MEASURE_STARTUP=1 to print how long the GUI took to start
+        if os.environ.get("POS_MEASURE_STARTUP"):
+            print(f"Startup: {startup * 1000:.0f} ms", flush=True)
+
         # Run
         self.mainloop()
+        self.main.tasks.shutdown()
+        if METRICS_FILE:
+            flushing.set()
+        if os.environ.get("POS_MEASURE_STALLS"):
+            print(monitor.report())
 
     def switch_frame(self, frame_name):
         """
@@ -0,0 +1,63 @@
+"""
+Usage: pytest fixtures giving every test its own inventory, receipt journal,
+receipt index, members database and promotions in a temporary folder
+"""
+
+# Imports
+from types import SimpleNamespace
+
+import pytest
+
+from pos_core import receipts, register
+from pos_core.inventory import InventoryCache
+from pos_core.members import MemberStore
+from pos_core.promotions import Promotions
+from pos_core.receipt_index import ReceiptIndex
+from pos_core.receipts import ReceiptJournal
+from pos_core.storage import open_storage
+
+INVENTORY = "Milk,1001,12.5,10\nJuice,1002,20.0,5\nBurger,2001,45.0,3\n"
+
+
+@pytest.fixture
+def inventory_file(tmp_path):
+    """
+    The name of an inventory file holding the INVENTORY products.
+    """
+    path = tmp_path / "inventory.txt"
+    path.write_text(INVENTORY)
+    return str(path)
+
+
+@pytest.fixture
+def cache(inventory_file):
+    """
+    An inventory cache over the inventory file.
+    """
+    return InventoryCache(open_storage(inventory_file))
+
+
+@pytest.fixture
+def shop(tmp_path, monkeypatch, cache):
+    """
+    Points the register at the inventory cache and at a receipt journal,
+    receipt index, members database and promotions of its own.
+
+    Returns:
+     - SimpleNamespace: The cache, journal, index, members and promotions.
+    """
+    folder = tmp_path / "receipts"
+    shop = SimpleNamespace(
+        cache=cache,
+        journal=ReceiptJournal(str(folder)),
+        index=ReceiptIndex(str(folder / "index.db")),
+        members=MemberStore(str(tmp_path / "members.db"), source=None),
+        promotions=Promotions(),
+    )
+    for module in (receipts, register):
+        monkeypatch.setattr(module, "receipt_journal", shop.journal)
+        monkeypatch.setattr(module, "receipt_index", shop.index)
+    monkeypatch.setattr(register, "inventory_cache", cache)
+    monkeypatch.setattr(register, "member_store", shop.members)
+    monkeypatch.setattr(register, "promotions", shop.promotions)
+    return shop
@@ -0,0 +1,91 @@
+"""
+Usage: python -m pytest tests/test_analytics.py
+"""
+
+# Imports
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pos_core import analytics
+from pos_core.analytics import SECONDS_PER_DAY, SalesHistory
+from pos_core.products import Product
+from pos_core.receipt_index import ReceiptIndex
+from pos_core.receipts import ReceiptBuilder
+
+
+@pytest.fixture
+def stockholm():
+    """
+    Runs the test in a time zone with daylight saving time.
+    """
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "Europe/Stockholm"
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
+
+
+def add(index, number, kind, moment, lines):
+    builder = ReceiptBuilder()
+    for product_id, price, quantity in lines:
+        builder.set_line(Product(f"Product {product_id}", product_id, price, quantity))
+    index.add(number, kind, moment.timestamp(), builder.render(kind == "return"))
+
+
+def test_items_are_loaded_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_CHUNK_ROWS", 2)
+    index = ReceiptIndex(str(tmp_path / "index.db"))
+    moment = datetime(2024, 5, 2, 12)
+    add(index, 1, "purchase", moment, [("1001", 12.5, 2), ("1002", 20.0, 1)])
+    add(index, 2, "purchase", moment, [("1001", 12.5, 4), ("2001", 45.0, 1)])
+    add(index, 3, "return", moment, [("1001", 12.5, 1)])
+
+    history = SalesHistory.from_index(index)
+
+    assert len(history) == 5
+    report = history.per_product()
+    volume = dict(zip(history.product_ids, report["volume"]))
+    assert volume == {"1001": 5, "1002": 1, "2001": 1}
+    assert history.top_sellers(1, by="revenue")[0] == ("1001", 62.5)
+    assert history.is_return.sum() == 1
+
+
+def test_empty_index_loads(tmp_path):
+    history = SalesHistory.from_index(ReceiptIndex(str(tmp_path / "index.db")))
+
+    assert len(history) == 0
+    assert history.top_sellers() == []
+
+
+def test_hours_stay_right_across_daylight_saving_time(tmp_path, stockholm):
+    index = ReceiptIndex(str(tmp_path / "index.db"))
+    # Summer time starts at 02:00 on 31 March 2024
+    add(index, 1, "purchase", datetime(2024, 3, 30, 12, 15), [("1001", 10.0, 1)])
+    add(index, 2, "purchase", datetime(2024, 3, 31, 1, 59), [("1001", 10.0, 2)])
+    add(index, 3, "purchase", datetime(2024, 3, 31, 3, 0), [("1001", 10.0, 4)])
+    add(index, 4, "purchase", datetime(2024, 4, 2, 12, 45), [("1001", 10.0, 8)])
+
+    history = SalesHistory.from_index(index)
+
+    volume, _ = history.hour_of_day()
+    assert {hour: volume[hour] for hour in np.flatnonzero(volume)} == {
+        1: 2,
+        3: 4,
+        12: 9,
+    }
+    starts, volume, _ = history.per_period(SECONDS_PER_DAY)
+    days = [time.strftime("%Y-%m-%d", time.gmtime(start)) for start in starts]
+    assert dict(zip(days, volume)) == {
+        "2024-03-30": 1,
+        "2024-03-31": 6,
+        "2024-04-02": 8,
+    }
@@ -0,0 +1,113 @@
+"""
+Usage: python -m pytest tests/test_checkout.py
+"""
+
+# Imports
+import pytest
+
+from pos_core.errors import (
+    EmptyCartError,
+    InsufficientStockError,
+    ProductNotFoundError,
+    ReceiptSaveError,
+)
+from pos_core.inventory import InventoryCache
+from pos_core.register import ShoppingCart, checkout_many, checkout_snapshot
+from pos_core.storage import open_storage
+
+
+def quantities(cache):
+    return {product_id: product.quantity for product_id, product in cache.get().items()}
+
+
+def fail_to_save(shop, monkeypatch):
+    def append_many(entries):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(shop.journal, "append_many", append_many)
+
+
+def test_carts_are_checked_against_the_stock_left_by_earlier_carts(shop):
+    results = checkout_many(
+        [{"1001": 6}, {"1001": 6, "1002": 1}, {"1001": 4}, {"1002": "2"}], shop.cache
+    )
+
+    assert [result.accepted for result in results] == [True, False, True, True]
+    assert [result.receipt_number for result in results] == [1, None, 2, 3]
+    assert isinstance(results[1].error, InsufficientStockError)
+    assert results[1].error.available == 4
+    assert quantities(shop.cache) == {"1001": 0, "1002": 3, "2001": 3}
+    assert len(shop.journal) == 3
+    assert shop.journal.fetch(2).receipt == results[2].receipt
+    assert "Total price: 50 kr" in results[2].receipt
+
+
+def test_rejected_carts_keep_their_errors(shop):
+    results = checkout_many([{}, {"9999": 1}, {"2001": 1}], shop.cache)
+
+    assert isinstance(results[0].error, EmptyCartError)
+    assert isinstance(results[1].error, ProductNotFoundError)
+    assert results[2].accepted
+    assert quantities(shop.cache)["2001"] == 2
+
+
+def test_only_accepted_carts_are_emptied(shop):
+    first = ShoppingCart(shop.cache)
+    first.add_item("2001", 2)
+    second = ShoppingCart(shop.cache)
+    second.add_item("2001", 2)
+
+    results = checkout_many([first, second], shop.cache)
+
+    assert [result.accepted for result in results] == [True, False]
+    assert len(first) == 0
+    assert second.items["2001"].quantity == 2
+
+
+def test_members_earn_the_points_of_their_carts(shop):
+    shop.members.add_member("55", "Ada")
+
+    with shop.cache.transaction() as inventory:
+        results = checkout_snapshot(
+            [{"1002": 2}, {"2001": 1}], inventory, shop.cache, members=["55", None]
+        )
+
+    assert shop.members.get("55").points == 40
+    assert shop.members.points_of_receipt(results[0].receipt_number)[0] == "55"
+    assert shop.members.points_of_receipt(results[1].receipt_number) is None
+
+
+def test_failed_save_puts_the_stock_back_and_keeps_the_carts(
+    shop, inventory_file, monkeypatch
+):
+    cart = ShoppingCart(shop.cache)
+    cart.add_item("1001", 3)
+    fail_to_save(shop, monkeypatch)
+
+    with pytest.raises(ReceiptSaveError):
+        checkout_many([cart, {"1002": 1}], shop.cache)
+
+    assert quantities(shop.cache) == {"1001": 10, "1002": 5, "2001": 3}
+    assert quantities(InventoryCache(open_storage(inventory_file)))["1001"] == 10
+    assert cart.items["1001"].quantity == 3
+    assert len(shop.journal) == 0
+
+
+def test_cart_checkout_saves_one_receipt(shop, monkeypatch):
+    cart = ShoppingCart(shop.cache)
+    cart.add_item("1001", 2)
+    cart.add_item("1002", 1)
+
+    receipt = cart.checkout()
+
+    assert shop.journal.fetch(1).receipt == receipt
+    assert "Total price: 45 kr" in receipt
+    assert len(cart) == 0
+    assert quantities(shop.cache)["1001"] == 8
+
+    cart.add_item("1001", 1)
+    fail_to_save(shop, monkeypatch)
+    with pytest.raises(ReceiptSaveError):
+        cart.checkout()
+    assert quantities(shop.cache)["1001"] == 8
+    assert len(cart) == 1
@@ -0,0 +1,64 @@
+"""
+Usage: python -m pytest tests/test_inventory.py
+"""
+
+# Imports
+import os
+
+from pos_core.inventory import InventoryCache
+from pos_core.products import Product
+from pos_core.storage import open_storage
+
+
+def test_lookups_are_served_from_the_cache(cache):
+    first = cache.get()
+    second = cache.get()
+
+    assert second is first
+    assert cache.stats() == {"hits": 1, "misses": 1, "reloads": 0}
+    assert first["1001"].name == "Milk"
+    assert first["1001"].quantity == 10
+
+
+def test_replaced_file_is_loaded_again(cache, inventory_file):
+    cache.get()
+    with open(inventory_file, "w") as file:
+        file.write("Milk,1001,14.0,2\n")
+    # Make sure the change shows even on a coarse mtime
+    os.utime(inventory_file, ns=(0, 0))
+
+    inventory = cache.get()
+
+    assert cache.stats()["reloads"] == 1
+    assert list(inventory) == ["1001"]
+    assert inventory["1001"].quantity == 2
+
+
+def test_writes_are_seen_without_reloading(cache, inventory_file):
+    cache.adjust_quantities({"1001": -3})
+    cache.put_product(Product("Bread", "3001", 25.0, 4))
+    cache.delete_product("2001")
+
+    inventory = cache.get()
+    assert inventory["1001"].quantity == 7
+    assert inventory["3001"].name == "Bread"
+    assert "2001" not in inventory
+    assert cache.stats()["reloads"] == 0
+
+    other = InventoryCache(open_storage(inventory_file)).get()
+    assert other["1001"].quantity == 7
+    assert "3001" in other
+    assert "2001" not in other
+
+
+def test_listeners_get_the_records_of_other_registers(inventory_file):
+    here = InventoryCache(open_storage(inventory_file))
+    there = InventoryCache(open_storage(inventory_file))
+    here.get()
+    changes = []
+    here.subscribe(changes.append)
+
+    there.adjust_quantities({"1002": -1})
+
+    assert here.get()["1002"].quantity == 4
+    assert changes == [[["delta", "1002", "-1"]]]
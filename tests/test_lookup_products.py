@@ -0,0 +1,58 @@
+"""
+Usage: python -m pytest tests/test_lookup_products.py
+"""
+
+# Imports
+import os
+import sys
+
+import pytest
+
+from pos_core import lookup_products
+from pos_core.products import Product
+from pos_core.storage import TextStorage
+
+
+def looked_up(monkeypatch, capsys, inventory_file, *product_ids):
+    monkeypatch.setattr(
+        sys, "argv", ["lookup_products", *product_ids, "--inventory", inventory_file]
+    )
+    lookup_products.main()
+    return capsys.readouterr().out.splitlines()
+
+
+def test_journaled_changes_are_shown(cache, inventory_file, monkeypatch, capsys):
+    cache.get()
+    cache.adjust_quantities({"1001": -3})
+    cache.put_product(Product("Bread", "3001", 25.0, 4))
+    cache.delete_product("2001")
+
+    def load(self):
+        pytest.fail("the inventory was loaded")
+
+    monkeypatch.setattr(TextStorage, "load", load)
+    assert looked_up(monkeypatch, capsys, inventory_file, "1001", "3001", "2001") == [
+        "Milk (1001): 12.5 kr, 7 st",
+        "Bread (3001): 25.0 kr, 4 st",
+        "2001 not found",
+    ]
+    assert looked_up(monkeypatch, capsys, inventory_file) == [
+        f"3 products in {inventory_file}.bin"
+    ]
+
+
+def test_snapshot_is_made_again_for_a_replaced_inventory(
+    inventory_file, monkeypatch, capsys
+):
+    assert looked_up(monkeypatch, capsys, inventory_file, "1002") == [
+        "Juice (1002): 20.0 kr, 5 st"
+    ]
+    with open(inventory_file, "w") as file:
+        file.write("Juice,1002,22.0,9\n")
+    stat = os.stat(inventory_file + ".bin")
+    os.utime(inventory_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    assert looked_up(monkeypatch, capsys, inventory_file, "1002", "1001") == [
+        "Juice (1002): 22.0 kr, 9 st",
+        "1001 not found",
+    ]
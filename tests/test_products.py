@@ -0,0 +1,65 @@
+"""
+Usage: python -m pytest tests/test_products.py
+"""
+
+# Imports
+from pos_core.binary_snapshot import load_binary_snapshot, write_binary_snapshot
+from pos_core.products import Product, ProductStore
+from pos_core.storage import parse_inventory
+
+
+def contents(store):
+    """
+    Returns the products of a store as plain tuples keyed by product ID.
+    """
+    return {
+        product_id: (product.name, product.price, product.quantity)
+        for product_id, product in store.items()
+    }
+
+
+def test_store_works_like_a_dictionary_of_products():
+    store = ProductStore()
+    for number in range(100):
+        store.put(f"Product {number}", str(number), number / 2, number)
+    store["7"].remove_quantity(3)
+    store["8"] = Product("Renamed", "8", 1.5, 2)
+
+    assert len(store) == 100
+    assert "99" in store and "100" not in store
+    assert store["7"].quantity == 4
+    assert (store["8"].name, store["8"].product_id) == ("Renamed", "8")
+    assert list(store)[:3] == ["0", "1", "2"]
+
+
+def test_deleted_products_are_squeezed_out():
+    store = ProductStore(Product(f"Product {n}", str(n), 1.0, n) for n in range(10))
+    for number in range(6):
+        del store[str(number)]
+
+    assert store.squeezes == 1
+    assert store.row_count == len(store) == 4
+    assert list(store) == ["6", "7", "8", "9"]
+    assert store["9"].quantity == 9
+    store.put("Back", "0", 2.0, 1)
+    assert store["0"].name == "Back"
+
+
+def test_store_survives_a_binary_snapshot(tmp_path):
+    store = parse_inventory("Mjölk,1001,12.5,10\nJuice,1002,20.0,5\n")
+    path = str(tmp_path / "inventory.bin")
+    write_binary_snapshot(path, store, 1, 2)
+
+    loaded = load_binary_snapshot(path, 1, 2)
+
+    assert contents(loaded) == contents(store)
+    assert loaded.row_of("1002") == 1
+
+
+def test_repeated_ids_keep_the_last_line():
+    store = parse_inventory("Milk,1001,12.5,10\nJuice,1002,20.0,5\nOat,1001,9.0,1\n")
+
+    assert contents(store) == {
+        "1001": ("Oat", 9.0, 1),
+        "1002": ("Juice", 20.0, 5),
+    }
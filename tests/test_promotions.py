@@ -0,0 +1,220 @@
+"""
+Usage: python -m pytest tests/test_promotions.py
+"""
+
+# Imports
+import json
+import random
+from datetime import datetime
+
+import pytest
+
+from pos_core import register
+from pos_core.products import Product
+from pos_core.promotions import (
+    Bundle,
+    CartPricing,
+    MultiBuy,
+    PercentOff,
+    Promotion,
+    Promotions,
+    load_promotions,
+    split_amount,
+)
+from pos_core.receipts import ReceiptBuilder
+
+# A Wednesday
+NOON = datetime(2024, 3, 6, 12, 0)
+PRICES = {"1001": 12.0, "1002": 20.0, "2001": 45.0, "3001": 100.0}
+
+
+class Cart:
+    """
+    Cart lines priced incrementally, the way ShoppingCart prices them.
+    """
+
+    def __init__(self, rules, moment=NOON):
+        self.items = {}
+        self.receipt = ReceiptBuilder()
+        self.pricing = CartPricing(Promotions(rules), self.receipt)
+        self.moment = moment
+
+    def set(self, product_id, quantity):
+        if quantity:
+            self.items[product_id] = Product(
+                f"Product {product_id}", product_id, PRICES[product_id], quantity
+            )
+            self.receipt.set_line(self.items[product_id])
+        elif product_id in self.items:
+            del self.items[product_id]
+            self.receipt.remove_line(product_id)
+        self.pricing.update(self.items, product_id, self.moment)
+        return self
+
+    def discounts(self):
+        return {key[1]: -amount for key, (_, amount) in self.receipt.discounts.items()}
+
+
+def test_multibuy_groups_the_most_expensive_items_first():
+    rule = MultiBuy("three", "3 for 40 kr", ["1001", "1002"], 3, 40)
+
+    cart = Cart([rule]).set("1001", 2)
+    assert cart.discounts() == {}
+    cart.set("1002", 2)
+    assert cart.discounts() == {"three": 12}
+    cart.set("1001", 4)
+    # Two groups: 20 + 20 + 12 and 12 + 12 + 12 kr for 80 kr
+    assert cart.discounts() == {"three": 8}
+    assert cart.receipt.total == 80
+
+
+def test_bundle_needs_one_of_each_product():
+    rule = Bundle("lunch", "Lunch deal", ["2001", "1002"], 55)
+
+    cart = Cart([rule]).set("2001", 2)
+    assert cart.discounts() == {}
+    cart.set("1002", 3)
+    assert cart.discounts() == {"lunch": 20}
+    cart.set("2001", 0)
+    assert cart.discounts() == {}
+    assert cart.receipt.total == 60
+
+
+def test_percent_off_only_in_its_hours_and_days():
+    rule = PercentOff(
+        "happy", "Happy hour", ["1002"], 20, start="15:00", end="17:00", days=[2]
+    )
+
+    assert rule.active(datetime(2024, 3, 6, 15, 0))
+    assert not rule.active(datetime(2024, 3, 6, 17, 0))
+    assert not rule.active(datetime(2024, 3, 7, 16, 0))
+    late = PercentOff("late", "Late", ["1002"], 20, start="22:00", end="02:00")
+    assert late.active(datetime(2024, 3, 6, 1, 59))
+    assert not late.active(datetime(2024, 3, 6, 12, 0))
+
+    cart = Cart([rule], moment=datetime(2024, 3, 6, 16, 0)).set("1002", 2)
+    assert cart.discounts() == {"happy": 8}
+    assert "Happy hour: -8 kr" in cart.receipt.render()
+
+    cart.pricing.refresh(cart.items, datetime(2024, 3, 6, 17, 30))
+    assert cart.discounts() == {}
+    assert cart.receipt.total == 40
+
+
+def test_stacked_discounts_never_take_more_than_the_price():
+    rules = [
+        PercentOff("a", "A", ["3001"], 60),
+        PercentOff("b", "B", ["3001"], 60),
+        MultiBuy("c", "C", ["3001", "1001"], 2, 1),
+    ]
+
+    cart = Cart(rules).set("3001", 1)
+    assert cart.discounts() == {"a": 50, "b": 50}
+    assert cart.receipt.total == 0
+
+    cart.set("1001", 1)
+    assert sum(cart.discounts().values()) <= 112
+    assert cart.receipt.total >= 0
+
+    cart.set("3001", 0)
+    assert cart.discounts() == {}
+    assert cart.receipt.total == 12
+
+
+def test_incremental_pricing_matches_pricing_from_scratch():
+    rules = [
+        MultiBuy("m1", "M1", ["1001", "1002"], 3, 30),
+        MultiBuy("m2", "M2", ["1002", "2001", "3001"], 2, 50),
+        Bundle("b1", "B1", ["1001", "2001"], 40),
+        Bundle("b2", "B2", ["1002", "3001"], 90),
+        PercentOff("p1", "P1", ["2001", "3001"], 35),
+        PercentOff("p2", "P2", ["1001", "3001"], 50),
+    ]
+    cart = Cart(rules)
+    rng = random.Random(7)
+
+    for _ in range(300):
+        cart.set(rng.choice(list(PRICES)), rng.choice([0, 1, 1, 2, 3, 5]))
+        scratch = Cart(rules)
+        scratch.items = dict(cart.items)
+        for line in scratch.items.values():
+            scratch.receipt.set_line(line)
+        scratch.pricing.price(scratch.items, NOON)
+
+        assert cart.discounts() == scratch.discounts()
+        assert cart.receipt.total == scratch.receipt.total >= 0
+
+
+def test_split_amount_adds_up():
+    assert split_amount(10, {"a": 1, "b": 1, "c": 1}) == {"a": 4, "b": 3, "c": 3}
+    assert split_amount(7, {"a": 0, "b": 0}) == {"a": 4, "b": 3}
+    assert split_amount(5, {"a": 3}) == {"a": 5}
+
+
+def test_promotion_kinds_must_price_a_discount():
+    class Free(Promotion):
+        pass
+
+    with pytest.raises(TypeError):
+        Promotion("x", "X", ["1001"])
+    with pytest.raises(TypeError):
+        Free("x", "X", ["1001"])
+
+
+def test_promotions_are_loaded_from_json(tmp_path):
+    path = tmp_path / "promotions.json"
+    path.write_text(
+        json.dumps(
+            [
+                {
+                    "id": "milk",
+                    "name": "3 milk for 30 kr",
+                    "type": "multibuy",
+                    "products": ["1001"],
+                    "quantity": 3,
+                    "price": 30,
+                },
+                {
+                    "id": "happy",
+                    "name": "Happy hour",
+                    "type": "percent",
+                    "products": ["1001", "1002"],
+                    "percent": 20,
+                    "start": "15:00",
+                    "end": "17:00",
+                },
+            ]
+        )
+    )
+
+    promotions = load_promotions(str(path))
+    assert len(promotions) == 2
+    assert [rule.promotion_id for rule in promotions.affected("1001")] == [
+        "milk",
+        "happy",
+    ]
+    assert promotions.affected("9999") == ()
+    assert len(load_promotions(str(tmp_path / "missing.json"))) == 0
+
+    path.write_text(json.dumps([{"id": "bad", "type": "unknown"}]))
+    with pytest.raises(ValueError):
+        load_promotions(str(path))
+    with pytest.raises(ValueError):
+        Promotions([PercentOff("a", "A", ["1"], 5), PercentOff("a", "A", ["2"], 5)])
+
+
+def test_checkout_prints_the_discounts(shop, monkeypatch):
+    monkeypatch.setattr(
+        register,
+        "promotions",
+        Promotions([MultiBuy("milk", "3 milk for 30 kr", ["1001"], 3, 30)]),
+    )
+    cart = register.ShoppingCart(shop.cache)
+    cart.add_item("1001", 4)
+    assert cart.total == 42
+
+    receipt = cart.checkout()
+
+    assert "3 milk for 30 kr: -8 kr" in receipt
+    assert "Total price: 42 kr" in receipt
+    assert shop.index.by_total(42, 42)[0].number == 1
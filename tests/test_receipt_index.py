@@ -0,0 +1,157 @@
+"""
+Usage: python -m pytest tests/test_receipt_index.py
+"""
+
+# Imports
+from datetime import datetime
+
+import pytest
+
+from pos_core.products import Product
+from pos_core.receipt_index import ReceiptIndex, parse_receipt
+from pos_core.receipts import ReceiptBuilder, ReceiptJournal
+
+DAY = 86400
+START = datetime(2024, 3, 1).timestamp()
+
+
+def make_receipt(lines, original=None):
+    """
+    Returns a receipt of (product_id, price, quantity) lines, a return
+    receipt if it has the number of the purchase it was returned from.
+    """
+    builder = ReceiptBuilder()
+    for product_id, price, quantity in lines:
+        builder.set_line(Product(f"Product {product_id}", product_id, price, quantity))
+    if original is None:
+        return builder.render()
+    return builder.render(return_receipt=True) + f"\nOriginal receipt: {original}"
+
+
+@pytest.fixture
+def index(tmp_path):
+    """
+    An index of three purchases on three days and a return on the fourth.
+    """
+    index = ReceiptIndex(str(tmp_path / "index.db"))
+    index.add_many(
+        [
+            (1, "purchase", START, make_receipt([("1001", 12.5, 2)]), None),
+            (
+                2,
+                "purchase",
+                START + DAY,
+                make_receipt([("1001", 12.5, 4), ("1002", 20.0, 3)]),
+                None,
+            ),
+            (3, "purchase", START + 2 * DAY, make_receipt([("2001", 45.0, 1)]), None),
+            (
+                4,
+                "return",
+                START + 3 * DAY,
+                make_receipt([("1001", 12.5, 1)], original=2),
+                None,
+            ),
+        ]
+    )
+    return index
+
+
+def numbers(receipts):
+    return [receipt.number for receipt in receipts]
+
+
+def test_receipt_text_is_parsed_back():
+    parsed = parse_receipt(make_receipt([("1001", 12.5, 3)], original=7))
+
+    assert parsed.kind == "return"
+    assert parsed.total == 38
+    assert parsed.original == 7
+    assert [tuple(item) for item in parsed.items] == [("Product 1001", "1001", 12.5, 3)]
+
+
+def test_between_takes_the_start_but_not_the_end(index):
+    assert numbers(index.between(START, START + 2 * DAY)) == [1, 2]
+    assert numbers(index.between(datetime(2024, 3, 2), datetime(2024, 3, 10))) == [
+        2,
+        3,
+        4,
+    ]
+    assert numbers(index.between(START, START + 10 * DAY, kind="return")) == [4]
+
+
+def test_receipts_with_a_product(index):
+    assert numbers(index.with_product("1001")) == [1, 2, 4]
+    assert numbers(index.with_product("1001", start=START + DAY)) == [2, 4]
+    assert numbers(index.with_product("1001", end=START + DAY)) == [1]
+    assert index.with_product("9999") == []
+
+
+def test_receipts_by_total(index):
+    assert numbers(index.by_total(minimum=45)) == [2, 3]
+    assert numbers(index.by_total(maximum=25)) == [1, 4]
+    assert numbers(index.by_total(45, 45)) == [3]
+
+
+def test_items_of_a_receipt(index):
+    (receipt,) = index.between(START + DAY, START + 2 * DAY)
+
+    assert receipt.total == 110
+    assert [item.product_id for item in index.items(receipt.receipt_id)] == [
+        "1001",
+        "1002",
+    ]
+
+
+def test_returned_quantities_add_up_every_return(index):
+    index.add(5, "return", START + 4 * DAY, make_receipt([("1001", 12.5, 2)], 2))
+
+    assert index.returned_quantities(2) == {"1001": 3}
+    assert index.returned_quantities(1) == {}
+
+
+def test_indexed_receipts_are_skipped(index):
+    index.add(1, "purchase", START, make_receipt([("1001", 12.5, 2)]))
+
+    assert numbers(index.with_product("1001")) == [1, 2, 4]
+    (receipt,) = index.by_total(25, 25)
+    assert len(index.items(receipt.receipt_id)) == 1
+
+
+def test_backfill_fills_gaps_between_indexed_receipts(tmp_path):
+    journal = ReceiptJournal(str(tmp_path))
+    entries = [
+        ("purchase", make_receipt([("1001", 12.5, quantity)]), START + quantity)
+        for quantity in range(1, 6)
+    ]
+    journal.append_many(entries)
+    index = ReceiptIndex(str(tmp_path / "index.db"))
+    for number in (1, 3):
+        kind, receipt, timestamp = entries[number - 1]
+        index.add(number, kind, timestamp, receipt)
+
+    assert index.missing_numbers(len(journal)) == [2, 4, 5]
+    assert index.backfill(str(tmp_path), journal) == 3
+    assert numbers(index.by_total()) == [1, 2, 3, 4, 5]
+    assert index.backfill(str(tmp_path), journal) == 0
+
+
+def test_backfill_indexes_text_receipts_and_the_journal(tmp_path):
+    folder = tmp_path / "receipts"
+    folder.mkdir()
+    (folder / "purchase_2023-12-24_15-30-00.txt").write_text(
+        make_receipt([("1002", 20.0, 1)])
+    )
+    journal = ReceiptJournal(str(folder))
+    journal.append_many([("purchase", make_receipt([("2001", 45.0, 2)]), START)])
+    index = ReceiptIndex(str(folder / "index.db"))
+
+    assert index.backfill(str(folder), journal) == 2
+    assert index.backfill(str(folder), journal) == 1
+    receipts = index.by_total()
+    assert [receipt.source for receipt in receipts] == [
+        "purchase_2023-12-24_15-30-00.txt",
+        None,
+    ]
+    assert receipts[0].timestamp == datetime(2023, 12, 24, 15, 30).timestamp()
+    assert numbers(receipts) == [None, 1]
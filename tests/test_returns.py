@@ -0,0 +1,190 @@
+"""
+Usage: python -m pytest tests/test_returns.py
+"""
+
+# Imports
+import sqlite3
+
+import pytest
+
+from pos_core import register
+from pos_core.errors import (
+    EmptyCartError,
+    NotReturnableError,
+    ReceiptNotFoundError,
+    ReceiptSaveError,
+)
+from pos_core.promotions import MultiBuy, Promotions
+from pos_core.receipt_index import parse_receipt
+from pos_core.register import (
+    ReturnSession,
+    ShoppingCart,
+    purchase_of,
+    return_receipt,
+)
+
+
+def buy(shop, quantities, card_number=None):
+    """
+    Checks out a cart of the quantities, keyed by product ID, and returns
+    the number of its receipt.
+    """
+    cart = ShoppingCart(shop.cache)
+    if card_number is not None:
+        cart.attach_member(card_number)
+    for product_id, quantity in quantities.items():
+        cart.add_item(product_id, quantity)
+    cart.checkout()
+    return len(shop.journal)
+
+
+def test_session_takes_only_what_was_bought_and_not_returned(shop):
+    number = buy(shop, {"1001": 2, "1002": 2})
+    session = ReturnSession(str(number))
+
+    assert session.returnable("1002") == 2
+    with pytest.raises(NotReturnableError) as error:
+        session.add_item("1002", 3)
+    assert error.value.returnable == 2
+    with pytest.raises(NotReturnableError):
+        session.add_item("2001", 1)
+
+    session.add_item("1002", 1)
+    assert session.returnable("1002") == 1
+    receipt = session.finish()
+
+    assert len(session) == 0
+    assert parse_receipt(receipt).total == 20
+    assert receipt.endswith(f"Original receipt: {number}")
+    assert shop.cache.get()["1002"].quantity == 4
+    assert purchase_of(number).returned == {"1002": 1}
+    assert ReturnSession(number).returnable("1002") == 1
+
+
+def test_return_beyond_what_is_left_is_refused(shop):
+    number = buy(shop, {"1002": 2})
+    return_receipt(number, {"1002": 1})
+
+    with pytest.raises(NotReturnableError) as error:
+        return_receipt(number, {"1002": 2})
+    assert error.value.returnable == 1
+
+    return_receipt(number, {"1002": 1})
+    with pytest.raises(NotReturnableError):
+        return_receipt(number, {"1002": 1})
+    assert shop.cache.get()["1002"].quantity == 5
+    assert len(shop.journal) == 3
+
+
+def test_last_item_is_returned_only_once(shop):
+    number = buy(shop, {"2001": 1})
+    first = ReturnSession(number)
+    second = ReturnSession(number)
+    first.add_item("2001", 1)
+    second.add_item("2001", 1)
+
+    first.finish()
+    with pytest.raises(NotReturnableError):
+        second.finish()
+    assert shop.cache.get()["2001"].quantity == 3
+
+
+@pytest.mark.parametrize("receipt_number", ["2", "99", "abc", ""])
+def test_only_purchases_can_be_returned_from(shop, receipt_number):
+    number = buy(shop, {"1001": 1})
+    return_receipt(number, {"1001": 1})
+
+    with pytest.raises(ReceiptNotFoundError):
+        ReturnSession(receipt_number)
+    with pytest.raises(ReceiptNotFoundError):
+        return_receipt(receipt_number, {"1001": 1})
+
+
+def test_nothing_returned_is_an_error(shop):
+    number = buy(shop, {"1001": 1})
+
+    with pytest.raises(EmptyCartError):
+        return_receipt(number, {"1001": 0})
+    with pytest.raises(EmptyCartError):
+        ReturnSession(number).finish()
+    assert len(shop.journal) == 1
+
+
+def test_returns_pay_back_the_price_after_the_discounts(shop, monkeypatch):
+    monkeypatch.setattr(
+        register,
+        "promotions",
+        Promotions([MultiBuy("juice", "3 juice for 45 kr", ["1002"], 3, 45)]),
+    )
+    number = buy(shop, {"1002": 3})
+    assert purchase_of(number).total == 45
+
+    refunds = [
+        parse_receipt(return_receipt(number, {"1002": 1})).total for _ in range(3)
+    ]
+
+    assert sum(refunds) == 45
+    assert all(refund < 20 for refund in refunds)
+
+
+def test_returns_take_back_the_points(shop):
+    shop.members.add_member("55", "Ada")
+    number = buy(shop, {"1002": 2}, card_number="55")
+    assert shop.members.get("55").points == 40
+
+    return_receipt(number, {"1002": 1})
+
+    assert shop.members.get("55").points == 20
+
+
+def fail_to_index(shop, monkeypatch, times=1):
+    """
+    Makes the next index writes fail, as a locked or full disk would.
+    """
+    add_many = shop.index.add_many
+    failures = [times]
+
+    def failing(entries):
+        if failures[0]:
+            failures[0] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        add_many(entries)
+
+    monkeypatch.setattr(shop.index, "add_many", failing)
+
+
+def test_return_the_index_missed_is_not_refunded_twice(shop, monkeypatch):
+    number = buy(shop, {"1002": 2})
+    fail_to_index(shop, monkeypatch)
+    return_receipt(number, {"1002": 2})
+    assert shop.index.returned_quantities(number) == {}
+
+    with pytest.raises(NotReturnableError):
+        return_receipt(number, {"1002": 1})
+    assert shop.index.returned_quantities(number) == {"1002": 2}
+    assert len(shop.journal) == 2
+
+
+def test_receipts_the_index_missed_are_indexed_with_the_next(shop, monkeypatch):
+    fail_to_index(shop, monkeypatch)
+    first = buy(shop, {"1001": 1})
+    second = buy(shop, {"1002": 1})
+
+    assert shop.index.missing_numbers(len(shop.journal)) == []
+    assert [receipt.number for receipt in shop.index.by_total()] == [first, second]
+
+
+def test_return_fails_while_the_index_is_unavailable(shop, monkeypatch):
+    number = buy(shop, {"1002": 2})
+    fail_to_index(shop, monkeypatch, times=3)
+    return_receipt(number, {"1002": 1})
+
+    with pytest.raises(ReceiptSaveError):
+        return_receipt(number, {"1002": 1})
+    assert len(shop.journal) == 2
+    assert shop.cache.get()["1002"].quantity == 4
+    with pytest.raises(ReceiptSaveError):
+        ReturnSession(number)
+    assert return_receipt(number, {"1002": 1})
+    with pytest.raises(NotReturnableError):
+        return_receipt(number, {"1002": 1})
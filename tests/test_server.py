@@ -0,0 +1,201 @@
+"""
+Usage: python -m pytest tests/test_server.py
+"""
+
+# Imports
+import asyncio
+import json
+import threading
+
+import pytest
+
+from pos_core.client import RegisterClient
+from pos_core.errors import (
+    InsufficientStockError,
+    ProductNotFoundError,
+    ReceiptSaveError,
+    RemoteError,
+)
+from pos_core.server import RegisterServer
+
+
+@pytest.fixture
+def server(shop):
+    server = RegisterServer(shop.cache)
+    yield server
+    server.executor.shutdown(wait=True)
+    server.readers.shutdown(wait=True)
+
+
+def committed(server, writes):
+    """
+    Commits (kind, args) writes as one batch and returns their
+    (result, error) pairs.
+    """
+    results = []
+    server.commit([(kind, args, None) for kind, args in writes], results)
+    return results
+
+
+def test_batch_gives_every_write_its_own_result(server, shop):
+    results = committed(
+        server,
+        [
+            ("checkout", ({"1001": 4}, None)),
+            ("checkout", ({"1001": 4}, None)),
+            ("checkout", ({"1001": 4}, None)),
+            ("update_product", ("1002", 22.0, 8)),
+            ("delete_product", ("9999",)),
+            ("checkout", ({"1002": 1}, None)),
+        ],
+    )
+
+    (first, _), (second, _), (_, short), (product, _), (_, missing), (last, _) = results
+    assert [first[0], second[0], last[0]] == [1, 2, 3]
+    assert isinstance(short, InsufficientStockError)
+    assert product == ["Juice", "1002", 22.0, 8]
+    assert isinstance(missing, ProductNotFoundError)
+    assert "Juice (1002): 22.0 kr, 1 st" in last[1]
+    inventory = shop.cache.get()
+    assert inventory["1001"].quantity == 2
+    assert inventory["1002"].quantity == 7
+    assert server.stats() == {"batches": 1, "committed": 6}
+
+
+def test_failed_checkout_group_fails_only_its_writes(server, shop, monkeypatch):
+    def append_many(entries):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(shop.journal, "append_many", append_many)
+
+    results = committed(
+        server,
+        [
+            ("checkout", ({"1001": 1}, None)),
+            ("checkout", ({"1002": 1}, None)),
+            ("update_product", ("2001", 50.0, 3)),
+        ],
+    )
+
+    assert [type(error) for _, error in results[:2]] == [ReceiptSaveError] * 2
+    assert results[2] == (["Burger", "2001", 50.0, 3], None)
+    inventory = shop.cache.get()
+    assert inventory["1001"].quantity == 10
+    assert inventory["1002"].quantity == 5
+
+
+def test_writes_that_arrive_together_share_a_batch(server, shop):
+    async def run():
+        server.wakeup = asyncio.Event()
+        committer = asyncio.create_task(server.commit_loop())
+        try:
+            return await asyncio.gather(
+                server.checkout({"1001": 1}),
+                server.checkout({"1001": 2}),
+                server.write("update_product", "2001", 45.0, 9),
+            )
+        finally:
+            committer.cancel()
+
+    first, second, product = asyncio.run(run())
+
+    assert [first[0], second[0]] == [1, 2]
+    assert product == ["Burger", "2001", 45.0, 9]
+    assert server.stats() == {"batches": 1, "committed": 3}
+    assert shop.cache.get()["1001"].quantity == 7
+
+
+def test_committer_survives_a_commit_that_exits(server, shop, monkeypatch):
+    apply = server.apply
+
+    def exiting(kind, *args):
+        if kind == "delete_product":
+            raise SystemExit(1)
+        return apply(kind, *args)
+
+    monkeypatch.setattr(server, "apply", exiting)
+
+    async def run():
+        server.wakeup = asyncio.Event()
+        committer = asyncio.create_task(server.commit_loop())
+        try:
+            first = await asyncio.gather(
+                server.write("update_product", "1001", 12.5, 20),
+                server.write("delete_product", "1002"),
+                server.checkout({"1001": 1}),
+                return_exceptions=True,
+            )
+            second = await server.checkout({"1001": 1})
+            return first, second
+        finally:
+            committer.cancel()
+
+    (updated, deleted, checked), second = asyncio.run(run())
+
+    assert updated == ["Milk", "1001", 12.5, 20]
+    assert isinstance(deleted, RemoteError)
+    assert isinstance(checked, RemoteError)
+    assert second[0] == 1
+    assert shop.cache.get()["1001"].quantity == 19
+
+
+def test_registers_talk_to_the_server_over_a_socket(server, shop, tmp_path):
+    path = str(tmp_path / "server.sock")
+    listening = threading.Event()
+    loop = asyncio.new_event_loop()
+    serving = loop.create_task(server.serve(path=path, ready=lambda _: listening.set()))
+
+    def run():
+        try:
+            loop.run_until_complete(serving)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    client = RegisterClient(path)
+    try:
+        assert listening.wait(10)
+        cart = client.ShoppingCart()
+        cart.add_item("1002", 2)
+        receipt = cart.checkout()
+        with pytest.raises(ProductNotFoundError):
+            client.request("get_product", "9999")
+    finally:
+        client.close()
+        loop.call_soon_threadsafe(serving.cancel)
+        thread.join(10)
+        loop.close()
+
+    assert "Total price: 40 kr" in receipt
+    assert len(shop.journal) == 1
+    assert shop.cache.get()["1002"].quantity == 3
+
+
+def test_returns_go_through_the_purchase_receipt(server, shop):
+    async def run():
+        server.wakeup = asyncio.Event()
+        committer = asyncio.create_task(server.commit_loop())
+        try:
+            unchecked = await server.respond(
+                json.dumps({"id": 1, "op": "return_item", "args": ["1001", 5, []]})
+            )
+            receipt_number, _ = await server.checkout({"1001": 2})
+            returned = await server.respond(
+                json.dumps(
+                    {
+                        "id": 2,
+                        "op": "return_receipt",
+                        "args": [receipt_number, {"1001": 3}],
+                    }
+                )
+            )
+            return unchecked, returned
+        finally:
+            committer.cancel()
+
+    unchecked, returned = asyncio.run(run())
+
+    assert unchecked["error"] == "ValueError"
+    assert returned["error"] == "NotReturnableError"
+    assert shop.cache.get()["1001"].quantity == 8
@@ -0,0 +1,123 @@
+"""
+Usage: python -m pytest tests/test_storage.py
+"""
+
+# Imports
+import os
+import zlib
+
+from pos_core import storage
+from pos_core.constants import JOURNAL_SUFFIX
+from pos_core.inventory import InventoryCache
+from pos_core.metrics import metrics
+from pos_core.products import Product
+from pos_core.storage import open_storage
+
+from conftest import INVENTORY
+
+
+def reopened(inventory_file):
+    """
+    Returns the inventory as a register starting now would load it.
+    """
+    return InventoryCache(open_storage(inventory_file)).get()
+
+
+def snapshot_line(inventory_file, product_id):
+    """
+    Returns the line of a product in the snapshot, without the journal.
+    """
+    with open(inventory_file) as file:
+        for line in file:
+            if line.split(",")[1] == product_id:
+                return line.strip()
+
+
+def test_changes_go_to_the_journal_and_are_replayed(cache, inventory_file):
+    cache.adjust_quantities({"1001": -4, "1002": 2})
+    cache.put_product(Product("Bread", "3001", 25.0, 4))
+    cache.delete_product("2001")
+
+    with open(inventory_file) as file:
+        assert file.read() == INVENTORY
+    with open(inventory_file + JOURNAL_SUFFIX) as file:
+        lines = file.read().splitlines()
+    assert lines[0] == f"base,{zlib.crc32(INVENTORY.encode())}"
+    assert lines[1:] == [
+        "delta,1001,-4",
+        "delta,1002,2",
+        "set,Bread,3001,25.0,4",
+        "delete,2001",
+    ]
+
+    inventory = reopened(inventory_file)
+    assert inventory["1001"].quantity == 6
+    assert inventory["1002"].quantity == 7
+    assert inventory["3001"].price == 25.0
+    assert "2001" not in inventory
+
+
+def test_torn_last_line_is_ignored_and_cut_off(cache, inventory_file):
+    cache.adjust_quantities({"1001": -1})
+    with open(inventory_file + JOURNAL_SUFFIX, "a") as file:
+        file.write("delta,1001,-")
+
+    assert reopened(inventory_file)["1001"].quantity == 9
+
+    cache.adjust_quantities({"1002": -1})
+    with open(inventory_file + JOURNAL_SUFFIX) as file:
+        assert file.read().splitlines()[1:] == ["delta,1001,-1", "delta,1002,-1"]
+    inventory = reopened(inventory_file)
+    assert inventory["1001"].quantity == 9
+    assert inventory["1002"].quantity == 4
+
+
+def test_journal_of_another_snapshot_is_dropped(inventory_file):
+    journal = inventory_file + JOURNAL_SUFFIX
+    with open(journal, "w") as file:
+        file.write("base,12345\ndelta,1001,-10\n")
+
+    assert reopened(inventory_file)["1001"].quantity == 10
+    assert not os.path.exists(journal)
+
+
+def test_journal_is_compacted_into_the_snapshot(cache, inventory_file, monkeypatch):
+    cache.adjust_quantities({"1001": -1})
+    assert os.path.exists(inventory_file + JOURNAL_SUFFIX)
+
+    monkeypatch.setattr(storage, "COMPACT_JOURNAL_BYTES", 1)
+    cache.adjust_quantities({"1001": -2})
+
+    assert not os.path.exists(inventory_file + JOURNAL_SUFFIX)
+    assert snapshot_line(inventory_file, "1001") == "Milk,1001,12.5,7"
+    assert reopened(inventory_file)["1001"].quantity == 7
+
+    monkeypatch.setattr(storage, "COMPACT_JOURNAL_BYTES", 256 * 1024)
+    cache.adjust_quantities({"1001": -3})
+    assert snapshot_line(inventory_file, "1001") == "Milk,1001,12.5,7"
+    assert reopened(inventory_file)["1001"].quantity == 4
+
+
+def test_other_registers_apply_only_the_new_records(inventory_file):
+    here = InventoryCache(open_storage(inventory_file))
+    there = InventoryCache(open_storage(inventory_file))
+    here.get()
+
+    there.adjust_quantities({"1001": -1})
+    there.adjust_quantities({"1001": -1})
+    assert here.get()["1001"].quantity == 8
+
+    there.adjust_quantities({"1001": -1})
+    assert here.get()["1001"].quantity == 7
+    assert here.stats()["misses"] == 1
+
+
+def test_lock_hold_times_are_recorded(cache, inventory_file):
+    metrics.reset()
+
+    cache.adjust_quantities({"1001": -1})
+
+    with metrics.lock:
+        metrics.collect()
+        held = metrics.latencies["lock_" + os.path.basename(inventory_file)]
+    assert held.count == 1
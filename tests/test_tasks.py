@@ -0,0 +1,67 @@
+"""
+Usage: python -m pytest tests/test_tasks.py
+"""
+
+# Imports
+import time
+
+from pos_core.tasks import TaskRunner
+
+
+class Widget:
+    """
+    Stands in for the main frame, running after() callbacks when told to.
+    """
+
+    def __init__(self):
+        self.timers = []
+
+    def after(self, interval, callback):
+        self.timers.append(callback)
+
+    def run(self, runner, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.timers and time.monotonic() < deadline:
+            callback = self.timers.pop(0)
+            if runner.finished.empty():
+                time.sleep(0.001)
+            callback()
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def test_results_are_delivered_after_failures(capsys):
+    widget = Widget()
+    runner = TaskRunner(widget)
+    delivered = []
+
+    def broken(result):
+        raise RuntimeError("callback failed")
+
+    runner.submit(fail, "no handler", key="lane")
+    runner.submit(str.upper, "a", on_done=broken, key="lane")
+    runner.submit(str.upper, "b", on_done=delivered.append, key="lane")
+    widget.run(runner)
+    runner.submit(str.upper, "c", on_done=delivered.append)
+    widget.run(runner)
+    runner.shutdown()
+
+    assert delivered == ["B", "C"]
+    assert not runner.polling
+    output = capsys.readouterr()
+    assert "ValueError('no handler')" in output.out
+    assert "RuntimeError('callback failed')" in output.out
+
+
+def test_errors_go_to_the_error_callback():
+    widget = Widget()
+    runner = TaskRunner(widget)
+    errors = []
+
+    runner.submit(fail, "bad", on_error=errors.append)
+    widget.run(runner)
+    runner.shutdown()
+
+    assert [str(error) for error in errors] == ["bad"]